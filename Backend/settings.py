@@ -160,14 +160,41 @@ FILE_UPLOAD_TYPE = 'csv'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # REDIS related settings
-REDIS_HOST = 'localhost'
-REDIS_PORT = '6379'
-BROKER_URL = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
+# The broker of the Celery worker running the predictions (the worker process of the Procfile,
+# the worker service of docker-compose.yml or the one started by init.sh). REDIS_URL, as set by
+# the Heroku Redis add-on, takes precedence over REDIS_HOST and REDIS_PORT.
+REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
+REDIS_PORT = os.environ.get('REDIS_PORT', '6379')
+BROKER_URL = os.environ.get('REDIS_URL', 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0')
 BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600}
-CELERY_RESULT_BACKEND = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
+CELERY_RESULT_BACKEND = BROKER_URL
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Classification models ('ICMC', 'SpeakUp') built when a Celery worker process starts,
+# instead of on the first prediction
+WARM_CLASSIFICATION_MODELS = []
+
+# Complaints fed to the classification graphs per session run, and whether the next batch
+# is preprocessed on a thread while the current one runs
+CLASSIFICATION_BATCH_SIZE = 512
+CLASSIFICATION_OVERLAP_PREPROCESSING = True
+
+# Precision of the word embeddings held by the workers: 'float32' (full precision),
+# 'float16' or 'int8' (per-row scaled). See Venter/ML_model/benchmarks/quantization.py
+# for the category assignment agreement of the reduced precisions.
+WORD_EMBEDDING_PRECISION = 'float32'
+ICMC_EMBEDDING_PRECISION = 'float32'
+
+# Whether a CIVIS file reuses the categorized responses of the latest file predicted by the
+# same model (and proposal), only scoring the responses appended since
+INCREMENTAL_PREDICTION = True
+
+# Worker processes categorizing the domains of a CIVIS file in parallel, 1 running them
+# one after the other and 0 using every core. They are started by every prediction of the
+# Celery worker, see Venter/ML_model/benchmarks/domainpool.py
+CATEGORIZATION_WORKERS = 0
+
 # LOGGING = {
 #     'version': 1,
 #     'disable_existing_loggers': False,
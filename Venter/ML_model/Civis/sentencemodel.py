@@ -1,6 +1,5 @@
 from sklearn.feature_extraction.text import TfidfVectorizer
 from nltk.corpus import wordnet as wn
-from nltk.corpus import stopwords
 from gensim.models import KeyedVectors
 from threading import Semaphore
 import os, json
@@ -8,6 +7,8 @@ import warnings
 import time
 import numpy as np
 
+from .. import textnormalizer
+
 def similarityIndex(s1, s2, wordmodel):
     '''
     To compare the two sentences for their similarity using the gensim wordmodel
@@ -16,21 +17,8 @@ def similarityIndex(s1, s2, wordmodel):
     if s1 == s2:
         return 1.0
 
-    s1words = s1.split()
-    s2words = s2.split()
-
-    s1words = set(s1words)
-    for word in s1words.copy():
-        if word in stopwords.words('english'):
-            s1words.remove(word)
-
-    s2words = set(s2words)
-    for word in s2words.copy():
-        if word in stopwords.words('english'):
-            s2words.remove(word)
-
-    s1words = list(s1words)
-    s2words = list(s2words)
+    s1words = list(textnormalizer.tokenize(s1))
+    s2words = list(textnormalizer.tokenize(s2))
 
     s1set = set(s1words)
     s2set = set(s2words)
@@ -1,9 +1,10 @@
 import os
 
-import numpy as np
 import pandas as pd
 from django.conf import settings
 
+from Venter.ML_model import batchinference
+from Venter.ML_model.topcategories import TopCategories
 from .ImportGraph import ImportGraph
 
 class ClassificationService:
@@ -27,26 +28,27 @@ class ClassificationService:
             model = self.g0
 
         data = model.process_query(data, flag)
-        print('DATA SHAPE', data.shape)
         return model.run(data)
 
-    def get_top_3_cats_with_prob(self, data):
-        prob1 = self.get_probs_graph(0, data, flag=1)
-
-        result_list = []
-        for x in range(prob1.shape[0]):
-            final_prob = prob1[x]
-            final_sorted = np.argsort(final_prob)
-
-            final_categories = []
-            final_probabilities = []
-
-            for i in range(3):
-                final_categories.append(self.index_complaint_title_map[final_sorted[-3:][2-i]])
-                final_probabilities.append(int(float(final_prob[final_sorted[-3:][2-i]])*100))
-            result = {}
-            for c, p in zip(final_categories, final_probabilities):
-                result[c] = p
-            result_list.append(result)
-
-        return result_list
+    def top_3_cats_with_prob(self, prob1):
+        """
+        Returns the compact TopCategories of the 3 most probable categories of every row of prob1
+        """
+        return TopCategories.from_probabilities(prob1, self.index_complaint_title_map, k=3)
+
+    def iter_top_3_cats_with_prob(self, data, batch_size=batchinference.DEFAULT_BATCH_SIZE, overlap=False):
+        """
+        Yields (number of complaints done, TopCategories of the batch) for every mini-batch of data
+        """
+        preprocess = lambda rows: self.g0.process_query(rows, 1)
+        for start, prob1 in batchinference.predict_batches(self.g0, data, preprocess, batch_size, overlap):
+            yield start + prob1.shape[0], self.top_3_cats_with_prob(prob1)
+
+    def join_results(self, batches):
+        return TopCategories.concatenate(batches, self.index_complaint_title_map, k=3)
+
+    def get_top_3_cats_with_prob(self, data, batch_size=batchinference.DEFAULT_BATCH_SIZE, overlap=False):
+        """
+        Returns the TopCategories of data; iterating it yields the {category: percentage} dict of every row
+        """
+        return self.join_results([results for done, results in self.iter_top_3_cats_with_prob(data, batch_size, overlap)])
@@ -1,20 +1,24 @@
-import pickle
-from .dos2unix import Dos2Unix
-import numpy as np
+import logging
+import threading
+from .artifacts import load_artifacts, load_quantized_embedding
+from .preprocessing import encode_queries
 import tensorflow as tf
 from django.conf import settings
-from nltk.tokenize import TweetTokenizer
-from numpy import linalg as la
+
+logger = logging.getLogger(__name__)
 
 class ImportGraph:
     instance = None
+    instance_lock = threading.Lock()
 
     @staticmethod
     def get_instance():
+        # built once per process, the session being shared by every thread
         if ImportGraph.instance is None:
-            return ImportGraph(settings.BASE_DIR + "/Venter/ML_model/ICMC/model/" + 'model.ckpt')
-        else:
-            return ImportGraph.instance
+            with ImportGraph.instance_lock:
+                if ImportGraph.instance is None:
+                    ImportGraph.instance = ImportGraph(settings.BASE_DIR + "/Venter/ML_model/ICMC/model/" + 'model.ckpt')
+        return ImportGraph.instance
 
     def init_weight(self, shape, name):
         initial = tf.truncated_normal(shape, stddev=0.1, name=name, dtype=tf.float32)
@@ -25,31 +29,21 @@ class ImportGraph:
         return tf.Variable(initial)
 
     def __init__(self, path_to_model):
-        global word_vectors
         g = tf.Graph()
         with g.as_default():
             train_attention = True
             initialize_random = False
             train_we = True
 
-            #encode dos 2 unix for the pre-trained word embedding for cross-platform functionality
-            Dos2Unix.unixencode()
-
-            with open(settings.BASE_DIR + str(
-                    "/Venter/ML_model/ICMC/dataset/dataset_mcgm_clean/word_index_map_icmc_.pickle"), "rb") as myFile:
-                self.word_index_map = pickle.load(myFile, encoding='latin1')
-
-            if not initialize_random:
+            # float32 keeps the embedding in the graph; float16/int8 keep a reduced precision
+            # copy of the trained embedding outside of it, gathered and fed batch by batch
+            self.precision = settings.ICMC_EMBEDDING_PRECISION
+            self.embedding = None
 
-                # load pre-trained word embedding.
-                with open(settings.BASE_DIR + "/Venter/ML_model/ICMC/dataset/dataset_mcgm_clean/word_vectors_icmc_.pickle",
-                          "rb") as myFile:
-                    word_vectors = pickle.load(myFile, encoding='latin1')
-
-                word_vectors = np.asarray(word_vectors).astype(np.float32)
-
-                for i in range(len(word_vectors) - 1):
-                    word_vectors[i] /= (la.norm((word_vectors[i])))
+            # word index map and normalized pre-trained word embedding, compiled by
+            # "python manage.py compile_model_artifacts", or on the first load without it.
+            # The pre-trained embedding only initializes the float32 graph
+            self.word_index_map, word_vectors = load_artifacts(embedding=self.precision == 'float32')
 
             vocab_size = 10093
             embedding_dim = 300
@@ -69,7 +63,12 @@ class ImportGraph:
                 initial = tf.truncated_normal(shape=shape, stddev=0.1, name=name, dtype=tf.float32)
                 return tf.Variable(initial)
 
-            if initialize_random:
+            if self.precision != 'float32':
+
+                # saved by "python manage.py compile_model_artifacts"
+                self.embedding = load_quantized_embedding(self.precision)
+
+            elif initialize_random:
 
                 # Initial embedding initialized randomly
                 embedding_init = tf.Variable(
@@ -86,8 +85,16 @@ class ImportGraph:
             # It will hold tensor of size [batch_size, max_padded_sentence_length]
             self.X = tf.placeholder(tf.int32, [None, self.max_padded_sentence_length])
 
-            # Word embedding lookup
-            word_embeddings = tf.nn.embedding_lookup(embedding_init, self.X)
+            if self.embedding is None:
+
+                # Word embedding lookup
+                word_embeddings = tf.nn.embedding_lookup(embedding_init, self.X)
+
+            else:
+
+                # Word embeddings gathered from the reduced precision copy by run()
+                word_embeddings = tf.placeholder(tf.float32, [None, self.max_padded_sentence_length, embedding_dim])
+                self.word_embeddings = word_embeddings
 
             if train_attention:
 
@@ -95,7 +102,7 @@ class ImportGraph:
 
                 reshaped_w_e = tf.reshape(word_embeddings, [in_size * self.max_padded_sentence_length, embedding_dim])
 
-                print(reshaped_w_e)
+                logger.debug(reshaped_w_e)
 
                 no_of_nurons_h1 = 512
                 Wa = init_weight([embedding_dim, no_of_nurons_h1], 'Wa')
@@ -169,34 +176,11 @@ class ImportGraph:
     def run(self, data):
         """ Running the activation operation previously imported """
         # The 'x' corresponds to name of input placeholder
-        print(')()()()()()()()()()()()()(')
-        print({self.X: data.shape})
+        logger.debug('Running the ICMC graph on %s', data.shape)
+        if self.embedding is not None:
+            return self.sess.run(self.probs, feed_dict={self.word_embeddings: self.embedding.take(data)})
         return self.sess.run(self.probs, feed_dict={self.X: data})
 
     def process_query(self, data, flag):
-        print('**************PROCESS QUERY START*****************')
-        processes_data = []
-        for line in data:
-            if flag == 1:
-                tokens = TweetTokenizer().tokenize(str(line).strip())
-            else:
-                tokens = line.strip().split()
-            indices = []
-            clean_words = []
-            for token in tokens:
-                if token.strip() in self.word_index_map.keys():
-                    indices.append(self.word_index_map[token.strip()])
-                    clean_words.append(token.strip())
-            print(indices)
-            if len(indices) < 100:
-                indices += [self.last_index] * \
-                    (self.max_padded_sentence_length - len(indices))
-            
-            if len(indices) > 35:
-                indices = indices[:35]
-            print(indices)
-            processes_data.append(indices)
-            print(np.asarray(processes_data).shape)
-            print('***')
-        print('**************PROCESS QUERY END*****************')
-        return np.array(processes_data)
+        """ Converts the complaints to the padded [N, 35] int32 word index matrix of the graph """
+        return encode_queries(data, flag, self.word_index_map, self.max_padded_sentence_length, self.last_index)
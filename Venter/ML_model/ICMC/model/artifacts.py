@@ -0,0 +1,208 @@
+"""
+Compiled artifacts of the ICMC model inputs.
+
+The word index map and word vector pickles were rewritten by Dos2Unix and unpickled on
+every ImportGraph construction, the vectors being normalized row by row afterwards.
+compile_artifacts() does this work once, offline (python manage.py compile_model_artifacts):
+    1) word_vectors_icmc.npy: the normalized float32 embedding, memory-mapped at load
+    2) word_index_map_icmc.vocab: one 'token<TAB>index' line per word
+    3) icmc_artifacts.json: the sha256 checksums, size and modification time stamps,
+       shape and vocabulary size of both files
+compile_quantized_embeddings() saves the float16 and int8 copies of the trained embedding
+of the checkpoint (word_embedding_icmc.float16.npy, word_embedding_icmc.int8.npy and its
+scales), served by load_quantized_embedding() to the ImportGraph of a reduced
+ICMC_EMBEDDING_PRECISION, which then never maps the float32 embedding.
+The Docker image runs the command at build time. load_artifacts() only reads these files,
+after checking their size and modification time against the manifest: the checksums are
+computed once, at compile time, rather than hashing the whole embedding on every load.
+When the files are missing or changed, as on the deploys without a build step (Heroku,
+uWSGI), the first load compiles them, one process at a time.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from Venter.ML_model.quantization import PRECISIONS, QuantizedMatrix
+
+DATASET_DIR = os.path.join(settings.BASE_DIR, 'Venter/ML_model/ICMC/dataset/dataset_mcgm_clean')
+WORD_INDEX_MAP_PICKLE_NAME = 'word_index_map_icmc.pickle'
+WORD_VECTORS_PICKLE_NAME = 'word_vectors_icmc.pickle'
+EMBEDDING_FILE_NAME = 'word_vectors_icmc.npy'
+VOCAB_FILE_NAME = 'word_index_map_icmc.vocab'
+MANIFEST_FILE_NAME = 'icmc_artifacts.json'
+LOCK_FILE_NAME = 'icmc_artifacts.lock'
+# saved as word_embedding_icmc.float16.npy, word_embedding_icmc.int8.npy and word_embedding_icmc.int8.scales.npy
+QUANTIZED_EMBEDDING_NAME = 'word_embedding_icmc'
+CHECKPOINT = os.path.join(settings.BASE_DIR, 'Venter/ML_model/ICMC/model/model.ckpt')
+WORD_INDEX_MAP_PICKLE = os.path.join(DATASET_DIR, WORD_INDEX_MAP_PICKLE_NAME)
+WORD_VECTORS_PICKLE = os.path.join(DATASET_DIR, WORD_VECTORS_PICKLE_NAME)
+EMBEDDING_FILE = os.path.join(DATASET_DIR, EMBEDDING_FILE_NAME)
+VOCAB_FILE = os.path.join(DATASET_DIR, VOCAB_FILE_NAME)
+MANIFEST_FILE = os.path.join(DATASET_DIR, MANIFEST_FILE_NAME)
+CHECKSUM_CHUNK = 1 << 20
+
+
+def _read_pickle(path):
+    '''
+    Unpickles a pickle saved with dos line endings, converting them in memory
+    the way Dos2Unix.unixencode did on disk
+    '''
+    with open(path, 'rb') as infile:
+        content = infile.read()
+    content = b''.join(line + b'\n' for line in content.splitlines())
+    return pickle.loads(content, encoding='latin1')
+
+
+def normalize_vectors(word_vectors):
+    '''
+    Scales every vector to unit length, except the last one (the padding vector)
+    which the graph always used as is
+    '''
+    word_vectors = np.asarray(word_vectors).astype(np.float32)
+    norms = np.linalg.norm(word_vectors[:-1], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        word_vectors[:-1] /= norms[:, np.newaxis]
+    return word_vectors
+
+
+def checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(CHECKSUM_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stamp(path):
+    # size and modification time, compared on load instead of the checksum
+    stat = os.stat(path)
+    return {'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def compile_artifacts(dataset_dir=DATASET_DIR):
+    '''
+    Writes the embedding, vocabulary and manifest files of dataset_dir from its original pickles
+    '''
+    embedding_file = os.path.join(dataset_dir, EMBEDDING_FILE_NAME)
+    vocab_file = os.path.join(dataset_dir, VOCAB_FILE_NAME)
+    manifest_file = os.path.join(dataset_dir, MANIFEST_FILE_NAME)
+    word_index_map = _read_pickle(os.path.join(dataset_dir, WORD_INDEX_MAP_PICKLE_NAME))
+    word_vectors = normalize_vectors(_read_pickle(os.path.join(dataset_dir, WORD_VECTORS_PICKLE_NAME)))
+
+    np.save(embedding_file, word_vectors)
+    with open(vocab_file, 'w', encoding='utf-8') as vocab:
+        for token, index in sorted(word_index_map.items(), key=lambda item: item[1]):
+            vocab.write('%s\t%d\n' % (token, index))
+
+    manifest = {
+        'embedding': dict(_stamp(embedding_file), file=EMBEDDING_FILE_NAME, sha256=checksum(embedding_file),
+                          shape=list(word_vectors.shape), dtype=str(word_vectors.dtype)),
+        'vocab': dict(_stamp(vocab_file), file=VOCAB_FILE_NAME, sha256=checksum(vocab_file),
+                      size=len(word_index_map)),
+    }
+    # replaced at once, so that a concurrent load never reads a partial manifest
+    with open(manifest_file + '.tmp', 'w') as temp:
+        json.dump(manifest, temp, indent=2)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    return embedding_file, vocab_file, manifest_file
+
+
+def _verified(path, expected):
+    # the file as compiled, judged from its size and modification time
+    return os.path.exists(path) and _stamp(path) == {'bytes': expected['bytes'], 'mtime_ns': expected['mtime_ns']}
+
+
+def _read_artifacts(dataset_dir, embedding=True):
+    # the word index map and embedding (None unless embedding), None when they are missing or changed since compiled
+    try:
+        with open(os.path.join(dataset_dir, MANIFEST_FILE_NAME), 'r') as temp:
+            manifest = json.load(temp)
+    except (OSError, ValueError):
+        return None
+    vocab_file = os.path.join(dataset_dir, VOCAB_FILE_NAME)
+    embedding_file = os.path.join(dataset_dir, EMBEDDING_FILE_NAME)
+    if not (_verified(vocab_file, manifest['vocab']) and _verified(embedding_file, manifest['embedding'])):
+        return None
+
+    word_index_map = {}
+    with open(vocab_file, 'r', encoding='utf-8') as vocab:
+        for line in vocab:
+            token, index = line.rstrip('\n').rsplit('\t', 1)
+            word_index_map[token] = int(index)
+
+    if len(word_index_map) != manifest['vocab']['size']:
+        return None
+    if not embedding:
+        return word_index_map, None
+    word_vectors = np.load(embedding_file, mmap_mode='r')
+    if list(word_vectors.shape) != manifest['embedding']['shape']:
+        return None
+    return word_index_map, word_vectors
+
+
+@contextmanager
+def _compile_lock(dataset_dir):
+    with open(os.path.join(dataset_dir, LOCK_FILE_NAME), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_artifacts(dataset_dir=DATASET_DIR, embedding=True):
+    '''
+    Returns the word index map and the read-only, memory-mapped normalized embedding of dataset_dir
+    (None unless embedding), compiling them first when they are missing or changed
+    '''
+    artifacts = _read_artifacts(dataset_dir, embedding)
+    if artifacts is not None:
+        return artifacts
+
+    with _compile_lock(dataset_dir):
+        # unless another process compiled them while this one waited
+        artifacts = _read_artifacts(dataset_dir, embedding)
+        if artifacts is None:
+            try:
+                compile_artifacts(dataset_dir)
+            except FileNotFoundError as error:
+                raise ImproperlyConfigured('The ICMC artifacts cannot be compiled: %s' % error)
+            artifacts = _read_artifacts(dataset_dir, embedding)
+    if artifacts is None:
+        raise ImproperlyConfigured('The ICMC artifacts compiled in %s cannot be loaded.' % dataset_dir)
+    return artifacts
+
+
+def compile_quantized_embeddings(checkpoint=CHECKPOINT, dataset_dir=DATASET_DIR):
+    '''
+    Saves the float16 and int8 copies of the trained embedding of the checkpoint in dataset_dir
+    '''
+    # imported here so that loading the compiled artifacts does not need tensorflow
+    import tensorflow as tf
+
+    trained = tf.train.load_variable(checkpoint, 'word_embedding')
+    paths = []
+    for precision in PRECISIONS:
+        if precision != 'float32':
+            path = os.path.join(dataset_dir, '%s.%s' % (QUANTIZED_EMBEDDING_NAME, precision))
+            QuantizedMatrix.from_array(trained, precision).save(path)
+            paths.append(path + '.npy')
+    return paths
+
+
+def load_quantized_embedding(precision, dataset_dir=DATASET_DIR):
+    '''
+    Returns the memory-mapped float16 or int8 copy of the trained embedding saved by compile_quantized_embeddings
+    '''
+    path = os.path.join(dataset_dir, '%s.%s' % (QUANTIZED_EMBEDDING_NAME, precision))
+    if not os.path.exists(path + '.npy'):
+        raise ImproperlyConfigured(
+            'The %s ICMC embedding is missing, run "python manage.py compile_model_artifacts".' % precision)
+    return QuantizedMatrix.load(path)
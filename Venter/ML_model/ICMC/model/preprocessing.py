@@ -0,0 +1,54 @@
+"""
+Batched conversion of complaint texts to the padded word index matrix fed to the ICMC graph.
+
+All the complaints of a batch are tokenized with one shared TweetTokenizer, every distinct
+token is looked up in the word index map once, and the indices are scattered into a single
+preallocated int32 [N, max_length] array, pre-filled with the padding index.
+"""
+import logging
+
+import numpy as np
+from nltk.tokenize import TweetTokenizer
+
+logger = logging.getLogger(__name__)
+
+_tokenizer = TweetTokenizer()
+
+
+def tokenize_queries(data, flag):
+    '''
+    Tokenizes every complaint, with the TweetTokenizer when flag is 1, on whitespace otherwise
+    '''
+    if flag == 1:
+        return [_tokenizer.tokenize(str(line).strip()) for line in data]
+    return [line.strip().split() for line in data]
+
+
+def encode_queries(data, flag, word_index_map, max_length, pad_index):
+    '''
+    Returns the [N, max_length] int32 array of the word indices of the first max_length
+    known tokens of every complaint, padded with pad_index
+    '''
+    token_lists = tokenize_queries(data, flag)
+    processed = np.full((len(token_lists), max_length), pad_index, dtype=np.int32)
+
+    #one word index map lookup per distinct token of the batch
+    token_codes = {}
+    codes = [token_codes.setdefault(token, len(token_codes)) for tokens in token_lists for token in tokens]
+    code_indices = np.fromiter(
+        (word_index_map.get(token.strip(), -1) for token in token_codes), dtype=np.int64, count=len(token_codes))
+    indices = code_indices[np.asarray(codes, dtype=np.int64)]
+    rows = np.repeat(np.arange(len(token_lists)), [len(tokens) for tokens in token_lists])
+
+    #position of every known token within its complaint, the tokens past max_length being dropped
+    known = indices >= 0
+    indices = indices[known]
+    rows = rows[known]
+    counts = np.bincount(rows, minlength=len(token_lists))
+    positions = np.arange(len(indices)) - np.repeat(np.cumsum(counts) - counts, counts)
+    kept = positions < max_length
+    processed[rows[kept], positions[kept]] = indices[kept]
+
+    logger.debug('Encoded %d complaints (%d tokens, %d distinct, %d known) into %s',
+                 len(token_lists), len(codes), len(token_codes), len(indices), processed.shape)
+    return processed
@@ -3,6 +3,7 @@ import pickle
 import numpy as np
 from django.conf import settings
 
+from Venter.ML_model import batchinference
 from .SpeakupImportGraph import ImportGraph
 
 
@@ -22,10 +23,22 @@ class ClassificationService_speakup:
         data = model.process_query(data)
         return model.run(data)
 
-    def get_top_3_cats_with_prob(self, data):
-        # This will return np array of size [batch_size,no_class]
-        prob1 = self.get_probs_graph(0, data)
-        final_sorted = np.argsort(prob1)[::-1]
-	    # Returns list of size [batch_size] where each list member is dict with 3 key-value pair
+    def top_3_cats_with_prob(self, prob1):
+        final_sorted = np.argsort(prob1, axis=1)[:, ::-1]
+        # Returns list of size [batch_size] where each list member is dict with 3 key-value pair
         return [{self.index_complaint_title_map[x]: float(prob1[i, x]) for x in final_sorted[i, :3]} for i in
                 range(len(final_sorted))]
+
+    def iter_top_3_cats_with_prob(self, data, batch_size=batchinference.DEFAULT_BATCH_SIZE, overlap=False):
+        """
+        Yields (number of complaints done, top 3 categories of the batch) for every mini-batch of data
+        """
+        for start, prob1 in batchinference.predict_batches(self.g0, data, self.g0.process_query, batch_size, overlap):
+            yield start + prob1.shape[0], self.top_3_cats_with_prob(prob1)
+
+    def join_results(self, batches):
+        return [result for results in batches for result in results]
+
+    def get_top_3_cats_with_prob(self, data, batch_size=batchinference.DEFAULT_BATCH_SIZE, overlap=False):
+        # This will return list of size [batch_size] of dicts of the 3 most probable categories
+        return self.join_results([results for done, results in self.iter_top_3_cats_with_prob(data, batch_size, overlap)])
@@ -1,4 +1,5 @@
 import os
+import threading
 
 import gensim
 import numpy as np
@@ -9,13 +10,16 @@ from nltk.tokenize import TweetTokenizer
 
 class ImportGraph():
     instance = None
+    instance_lock = threading.Lock()
 
     @staticmethod
     def get_instance():
+        # built once per process, the session being shared by every thread
         if ImportGraph.instance is None:
-            return ImportGraph(settings.BASE_DIR + "/Venter/ML_model/SpeakUp/Model/model.ckpt")
-        else:
-            return ImportGraph.instance
+            with ImportGraph.instance_lock:
+                if ImportGraph.instance is None:
+                    ImportGraph.instance = ImportGraph(settings.BASE_DIR + "/Venter/ML_model/SpeakUp/Model/model.ckpt")
+        return ImportGraph.instance
 
     def __init__(self, path_to_model):
         g = tf.Graph()
@@ -84,3 +88,11 @@ class ImportGraph():
                 complaint_text_tokens.append(token.strip())
         return complaint_text_tokens
 
+    def process_query(self, data):
+        """ Averages the word vectors of the known words of every complaint into a [N, 300] float32 array """
+        processed = np.zeros((len(data), self.vecs.vector_size), dtype=np.float32)
+        for row, complaint_text in enumerate(data):
+            words = self.get_clean_complaint_text_words(str(complaint_text))
+            if words:
+                processed[row] = np.mean([self.vecs[word] for word in words], axis=0)
+        return processed
@@ -0,0 +1,44 @@
+"""
+Mini-batched inference for the TensorFlow classification graphs (ICMC, SpeakUp).
+
+The complaints are fed to the session batch_size rows at a time, so the memory of the
+attention and dense layers is bounded by the batch size instead of the size of the csv.
+With overlap=True the next batch is preprocessed on a worker thread while the session
+runs the current one (sess.run releases the GIL). Results are yielded batch by batch
+so that callers can report progress.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BATCH_SIZE = 512
+
+
+def iter_batches(data, batch_size):
+    '''
+    Yields (start, rows) slices of batch_size rows of data
+    '''
+    if batch_size < 1:
+        raise ValueError('batch_size must be positive, got %r' % batch_size)
+    for start in range(0, len(data), batch_size):
+        yield start, data[start:start + batch_size]
+
+
+def predict_batches(graph, data, preprocess, batch_size=DEFAULT_BATCH_SIZE, overlap=False):
+    '''
+    Yields (start, probabilities) for every batch of data, in order, where probabilities
+    are the graph.run outputs of preprocess(rows)
+    '''
+    batches = iter_batches(data, batch_size)
+    if not overlap:
+        for start, rows in batches:
+            yield start, graph.run(preprocess(rows))
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for start, rows in batches:
+            future = executor.submit(preprocess, rows)
+            if pending is not None:
+                yield pending[0], graph.run(pending[1].result())
+            pending = (start, future)
+        if pending is not None:
+            yield pending[0], graph.run(pending[1].result())
@@ -0,0 +1,47 @@
+"""
+Scaling benchmark of the domain-parallel sentence model.
+
+The 13 domains of the sample Civis workbook are categorized with 1 to N worker
+processes (N defaulting to the number of cores), and the wall time, speedup over a
+single process and agreement of the outputs with the single process ones are printed.
+The category embedding cache is warmed first so that every run does the same work.
+Run wordembedding.convert_to_native() beforehand to measure the memory-mapped embedding.
+
+Usage: python -m Venter.ML_model.benchmarks.domainpool [max workers]
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from ..sentence_model import csvparser, sentencemodel  # noqa: E402
+
+SAMPLE_WORKBOOK = os.path.join(settings.BASE_DIR, 'Venter/ML_model/Civis/Responses_All About the RMP2031.xlsx')
+
+
+def main(max_workers):
+    domain_responses = csvparser.parse(SAMPLE_WORKBOOK)
+    print('%d responses in %d domains, %d cores' % (
+        sum(len(responses) for responses in domain_responses.values()), len(domain_responses), multiprocessing.cpu_count()))
+    reference = sentencemodel.categorizer(domain_responses, workers=1)
+
+    timings = []
+    for workers in range(1, max_workers + 1):
+        st = time.time()
+        results = sentencemodel.categorizer(domain_responses, workers=workers)
+        timings.append((workers, time.time() - st, results == reference))
+
+    print('workers      secs  speedup  identical')
+    for workers, secs, identical in timings:
+        print('%7d  %8.3f  %7.2f  %s' % (workers, secs, timings[0][1] / secs, identical))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else multiprocessing.cpu_count())
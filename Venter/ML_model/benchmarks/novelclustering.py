@@ -0,0 +1,56 @@
+"""
+Benchmark of the Novel sub-clustering neighbour search, exact against LSH.
+
+Builds a synthetic set of clustered response embeddings (with responses of the same
+cluster sharing a token), then reports the time of both searches and the recall of
+the LSH search, i.e. how often it finds a neighbour scoring as high as the exact one.
+
+Usage: python -m Venter.ML_model.benchmarks.novelclustering [responses] [tables] [bits]
+"""
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+from ..sentence_model import novelclustering
+
+
+def synthetic_responses(n, dim=300, clusters=None, seed=0):
+    random_state = np.random.RandomState(seed)
+    clusters = clusters or max(n // 20, 1)
+    labels = random_state.randint(clusters, size=n)
+    centres = random_state.randn(clusters, dim).astype(np.float32)
+    vectors = centres[labels] + 0.5 * random_state.randn(n, dim).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1)[:, np.newaxis]
+    incidence = sparse.csr_matrix((np.ones(n, dtype=np.float32), (np.arange(n), labels)), shape=(n, clusters))
+    return vectors, incidence
+
+
+def run(n=20000, tables=novelclustering.LSH_TABLES, bits=novelclustering.LSH_BITS):
+    vectors, incidence = synthetic_responses(n)
+
+    st = time.time()
+    exact = novelclustering.exact_best_neighbours(vectors, incidence)
+    exact_time = time.time() - st
+
+    st = time.time()
+    approximate = novelclustering.lsh_best_neighbours(vectors, incidence, tables=tables, bits=bits)
+    lsh_time = time.time() - st
+
+    rows = np.flatnonzero(exact >= 0)
+    exact_scores = np.einsum('ij,ij->i', vectors[rows], vectors[exact[rows]])
+    found = approximate[rows] >= 0
+    lsh_scores = np.zeros(len(rows), dtype=np.float32)
+    lsh_scores[found] = np.einsum('ij,ij->i', vectors[rows[found]], vectors[approximate[rows[found]]])
+
+    print('%d responses, LSH with %d tables of %d bits' % (n, tables, bits))
+    print('exact search : %8.3f secs' % exact_time)
+    print('LSH search   : %8.3f secs' % lsh_time)
+    print('recall@1     : %8.3f' % np.mean(lsh_scores >= exact_scores - 1e-6))
+    print('mean score   : %8.3f exact, %8.3f LSH' % (exact_scores.mean(), lsh_scores.mean()))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,78 @@
+"""
+Benchmark of the ICMC complaint preprocessing (ImportGraph.process_query).
+
+Compares the former per-row loop, which built a TweetTokenizer and scanned
+word_index_map.keys() for every token, with the batched preprocessing.encode_queries.
+Synthetic complaints are drawn from the ICMC word index map, with some unknown words,
+and both outputs are checked to be identical.
+
+Usage: python -m Venter.ML_model.benchmarks.preprocessing [complaints]
+"""
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+from nltk.tokenize import TweetTokenizer
+
+from Backend.settings import BASE_DIR
+
+from ..ICMC.model import preprocessing
+
+WORD_INDEX_MAP_FILE = os.path.join(BASE_DIR, 'Venter/ML_model/ICMC/dataset/dataset_mcgm_clean/word_index_map_icmc_.pickle')
+MAX_PADDED_SENTENCE_LENGTH = 35
+LAST_INDEX = 10092
+
+
+def legacy_process_query(data, flag, word_index_map):
+    '''
+    The preprocessing previously done by ImportGraph.process_query, without its prints
+    '''
+    processes_data = []
+    for line in data:
+        if flag == 1:
+            tokens = TweetTokenizer().tokenize(str(line).strip())
+        else:
+            tokens = line.strip().split()
+        indices = []
+        for token in tokens:
+            if token.strip() in word_index_map.keys():
+                indices.append(word_index_map[token.strip()])
+        if len(indices) < 100:
+            indices += [LAST_INDEX] * (MAX_PADDED_SENTENCE_LENGTH - len(indices))
+        if len(indices) > 35:
+            indices = indices[:35]
+        processes_data.append(indices)
+    return np.array(processes_data)
+
+
+def make_complaints(word_index_map, n, seed=0):
+    random_state = np.random.RandomState(seed)
+    words = np.array(list(word_index_map) + ['unknownword%d' % i for i in range(len(word_index_map) // 10)])
+    lengths = random_state.randint(3, 60, size=n)
+    return [' '.join(words[random_state.randint(len(words), size=length)]) + ' !' for length in lengths]
+
+
+def run(n=100000):
+    with open(WORD_INDEX_MAP_FILE, 'rb') as temp:
+        word_index_map = pickle.load(temp, encoding='latin1')
+    complaints = make_complaints(word_index_map, n)
+
+    st = time.time()
+    legacy = legacy_process_query(complaints, 1, word_index_map)
+    legacy_secs = time.time() - st
+
+    st = time.time()
+    batched = preprocessing.encode_queries(complaints, 1, word_index_map, MAX_PADDED_SENTENCE_LENGTH, LAST_INDEX)
+    batched_secs = time.time() - st
+
+    print('%d complaints, %d words in the index map' % (n, len(word_index_map)))
+    print('per-row process_query : %10.3f secs (%8.3f us/complaint)' % (legacy_secs, legacy_secs / n * 1e6))
+    print('batched encode_queries: %10.3f secs (%8.3f us/complaint)' % (batched_secs, batched_secs / n * 1e6))
+    print('speed-up              : %10.1fx' % (legacy_secs / batched_secs if batched_secs else float('inf')))
+    print('identical output      : %s' % np.array_equal(legacy, batched))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,109 @@
+"""
+Accuracy regression harness of the reduced precision embeddings.
+
+Sentence model: the responses of the sample Civis workbook are scored against the
+category sentences of their domain with the float32, float16 and int8 word vectors,
+and the category assignments (Novel when no category scores above 0) of the reduced
+precisions are compared with the float32 ones.
+
+ICMC model (when a complaint csv is given): the top category of every complaint_description
+is compared between the float32 graph and the float16 / int8 embedding lookups.
+
+The float16 and int8 word vectors are those saved by "python manage.py convert_word_embedding",
+the ICMC embeddings those saved by "python manage.py compile_model_artifacts".
+
+Usage: python -m Venter.ML_model.benchmarks.quantization [icmc complaint csv]
+"""
+import os
+import sys
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from .. import wordembedding, xlsxreader  # noqa: E402
+from ..quantization import PRECISIONS  # noqa: E402
+from ..sentence_model import similarityengine  # noqa: E402
+
+SAMPLE_WORKBOOK = os.path.join(settings.BASE_DIR, 'Venter/ML_model/Civis/Responses_All About the RMP2031.xlsx')
+SENTENCE_PATH = os.path.join(settings.BASE_DIR, 'Venter/ML_model/sentence_model/data/sentences/')
+ICMC_CHECKPOINT = os.path.join(settings.BASE_DIR, 'Venter/ML_model/ICMC/model/model.ckpt')
+
+
+def load_domains():
+    '''
+    Returns [(responses, category sentences)] of the sample domains, paired as the sentence model does
+    '''
+    domain_responses = {}
+    for domain, response in xlsxreader.iter_domain_responses(SAMPLE_WORKBOOK):
+        responses = domain_responses.setdefault(domain, [])
+        if response is not None:
+            responses.append(response.lstrip().replace('\n', ' '))
+
+    domains = []
+    for domain, filename in zip(sorted(domain_responses, key=lambda domain: domain + '.txt'), sorted(os.listdir(SENTENCE_PATH))):
+        with open(os.path.join(SENTENCE_PATH, filename), 'r', encoding='utf-8-sig') as temp:
+            categories = [line.split('\n')[0] for line in temp.readlines()]
+        domains.append((domain_responses[domain], categories))
+    return domains
+
+
+def assignments(scores):
+    '''
+    The assigned category of every response, -1 standing for Novel
+    '''
+    assigned = scores.argmax(axis=1) if scores.shape[1] else np.zeros(scores.shape[0], dtype=np.int64)
+    assigned[scores.sum(axis=1) <= 0] = -1
+    return assigned
+
+
+def compare_sentence_model():
+    wordmodel = wordembedding.get_wordmodel()
+    domains = load_domains()
+    reference = None
+    print('sentence model, %d responses in %d domains' % (sum(len(responses) for responses, _ in domains), len(domains)))
+    for precision in PRECISIONS:
+        matrix = wordembedding.get_embedding_matrix(precision)
+        st = time.time()
+        assigned = np.concatenate([
+            assignments(similarityengine.similarity_matrix(responses, categories, wordmodel, matrix))
+            for responses, categories in domains])
+        secs = time.time() - st
+        if reference is None:
+            reference = assigned
+        print('%-8s: %12d bytes, %8.3f secs, %6.2f%% assignments unchanged (%d differ)' % (
+            precision, matrix.nbytes, secs, 100.0 * np.mean(assigned == reference) if len(reference) else 100.0,
+            np.count_nonzero(assigned != reference)))
+
+
+def compare_icmc_model(csv_path):
+    import pandas as pd
+    from ..ICMC.model.ImportGraph import ImportGraph
+
+    complaints = list(pd.read_csv(csv_path, sep=',', header=0, encoding='utf-8-sig')['complaint_description'])
+    reference = None
+    print('ICMC model, %d complaints' % len(complaints))
+    for precision in PRECISIONS:
+        with override_settings(ICMC_EMBEDDING_PRECISION=precision):
+            graph = ImportGraph(ICMC_CHECKPOINT)
+        st = time.time()
+        top = graph.run(graph.process_query(complaints, 1)).argmax(axis=1)
+        secs = time.time() - st
+        if reference is None:
+            reference = top
+        embedding_bytes = graph.embedding.nbytes if graph.embedding is not None else 10093 * 300 * 4
+        print('%-8s: %12d bytes, %8.3f secs, %6.2f%% top categories unchanged (%d differ)' % (
+            precision, embedding_bytes, secs, 100.0 * np.mean(top == reference) if len(reference) else 100.0,
+            np.count_nonzero(top != reference)))
+
+
+if __name__ == '__main__':
+    compare_sentence_model()
+    if len(sys.argv) > 1:
+        compare_icmc_model(sys.argv[1])
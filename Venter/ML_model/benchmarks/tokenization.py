@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of the per-pair text preprocessing cost of the similarity scorers.
+
+Compares the former per-pair tokenization of similarityIndex / wmd_similarity,
+which consulted stopwords.words('english') for every word, with the cached
+textnormalizer pipeline, where each distinct sentence is tokenized once.
+The category sentences of the sentence model serve as sample data.
+
+Usage: python -m Venter.ML_model.benchmarks.tokenization [repeat]
+"""
+import os
+import sys
+import time
+
+from nltk.corpus import stopwords
+
+from Backend.settings import BASE_DIR
+
+from .. import textnormalizer
+
+SENTENCE_PATH = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/data/sentences/')
+
+
+def legacy_pair_tokens(s1, s2):
+    '''
+    The tokenization previously repeated inside similarityIndex for every pair
+    '''
+    s1words = set(s1.split())
+    for word in s1words.copy():
+        if word in stopwords.words('english'):
+            s1words.remove(word)
+    s2words = set(s2.split())
+    for word in s2words.copy():
+        if word in stopwords.words('english'):
+            s2words.remove(word)
+    return len(s1words & s2words)
+
+
+def load_sentences():
+    sentences = []
+    for filename in sorted(os.listdir(SENTENCE_PATH)):
+        with open(os.path.join(SENTENCE_PATH, filename), 'r', encoding='utf-8-sig') as temp:
+            sentences.extend(line.strip() for line in temp if line.strip())
+    return sentences
+
+
+def run(repeat=1):
+    sentences = load_sentences() * repeat
+    categories = sentences[:10]
+    pairs = len(sentences) * len(categories)
+
+    st = time.time()
+    for s1 in sentences:
+        for s2 in categories:
+            legacy_pair_tokens(s1, s2)
+    legacy = time.time() - st
+
+    textnormalizer.tokenize.cache_clear()
+    st = time.time()
+    response_tokens = textnormalizer.tokenize_all(sentences)
+    category_tokens = textnormalizer.tokenize_all(categories)
+    category_sets = [set(tokens) for tokens in category_tokens]
+    for tokens in response_tokens:
+        tokens = set(tokens)
+        for category_set in category_sets:
+            len(tokens & category_set)
+    cached = time.time() - st
+
+    print('%d pairs (%d sentences x %d categories)' % (pairs, len(sentences), len(categories)))
+    print('per-pair tokenization : %10.3f us/pair' % (legacy / pairs * 1e6))
+    print('cached textnormalizer : %10.3f us/pair' % (cached / pairs * 1e6))
+    print('speed-up              : %10.1fx' % (legacy / cached if cached else float('inf')))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
@@ -0,0 +1,56 @@
+"""
+Process pool running the per-domain categorization of the sentence and keyword models.
+
+Domains are independent, so with CATEGORIZATION_WORKERS > 1 they are categorized by a
+pool of worker processes instead of one after the other. Only the responses of a domain
+and its output travel between the processes. The word embedding is never pickled: the
+workers are forked after the parent process has loaded it, and get_wordmodel() memory-maps
+the native copies saved by wordembedding.convert_to_native(), so the parent and the
+workers read the same page-cached vectors.
+
+Predictions run in the daemonic prefork children of the Celery worker, which the standard
+multiprocessing module does not let start processes of their own. The pool is therefore
+Celery's billiard one, which does. The forked workers only run the numpy / gensim
+categorization of their domains, never the TensorFlow graphs warmed up in the parent.
+"""
+import multiprocessing
+
+import billiard
+from django.conf import settings
+
+
+def get_workers(workers=None):
+    '''
+    Number of worker processes, the CATEGORIZATION_WORKERS setting by default, 0 standing for every core
+    '''
+    if workers is None:
+        workers = settings.CATEGORIZATION_WORKERS
+    if workers == 0:
+        workers = multiprocessing.cpu_count()
+    return max(workers, 1)
+
+
+def _context():
+    # fork shares the already loaded word embedding; the other start methods
+    # have every worker memory-map it again on its first domain
+    if 'fork' in billiard.get_all_start_methods():
+        return billiard.get_context('fork')
+    return billiard.get_context()
+
+
+def map_domains(function, arguments, workers=None):
+    '''
+    Returns [function(*args) for args in arguments], in order, computed by get_workers(workers)
+    processes. A single worker, or a single domain, runs in the calling process.
+    '''
+    workers = min(get_workers(workers), len(arguments))
+    if workers <= 1:
+        return [function(*args) for args in arguments]
+
+    pool = _context().Pool(processes=workers)
+    try:
+        # one domain at a time, as their sizes differ widely
+        return pool.starmap(function, arguments, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
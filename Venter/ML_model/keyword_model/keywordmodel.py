@@ -6,14 +6,13 @@
 # # """
 
 import json
-import os
 import time
+from collections import Counter
 
 import numpy as np
-from gensim.models import KeyedVectors
-from nltk.corpus import stopwords
 
-from Backend.settings import BASE_DIR
+from .. import domainpool, textnormalizer, wordembedding
+from . import wmdengine
 
 
 def similarityIndex(s1, s2, wordmodel):
@@ -24,154 +23,123 @@ def similarityIndex(s1, s2, wordmodel):
     if s1 == s2:
         return 1.0
 
-    s1words = s1.split()
-    s2words = s2.split()
+    s1set = set(textnormalizer.tokenize(s1))
+    s2set = set(textnormalizer.tokenize(s2))
 
-    s1words = set(s1words)
-    for word in s1words.copy():
-        if word in stopwords.words('english'):
-            s1words.remove(word)
-    
-    s2words = set(s2words)
-    for word in s2words.copy():
-        if word in stopwords.words('english'):
-            s2words.remove(word)
-
-    s1words = list(s1words)
-    s2words = list(s2words)
-
-    s1set = set(s1words)
-    s2set = set(s2words)
-
-    vocab = wordmodel.vocab
-    
     if len(s1set & s2set) == 0:
         return 0.0
-    for word in s1set.copy():
-        if (word not in vocab):
-            s1words.remove(word)
-    for word in s2set.copy():
-        if (word not in vocab):
-            s2words.remove(word)
+
+    s1words = textnormalizer.vocab_filter(s1set, wordmodel)
+    s2words = textnormalizer.vocab_filter(s2set, wordmodel)
     
     return wordmodel.n_similarity(s1words, s2words)
 
 
-def wmd_similarity(single_comment, single_keyword, wordmodel):
-    
-    cwords = single_comment.split()
-    cwords = set(cwords)
-    for word in cwords.copy():
-        if word in stopwords.words('english'):
-            cwords.remove(word)
-        
-    cwords = list(cwords)
-
-    swords = single_keyword.split()
-    swords = set(swords)
-    for word in swords.copy():
-        if word in stopwords.words('english'):
-            swords.remove(word)
-
-    swords = list(swords)
-    
-    return wordmodel.wmdistance(cwords, swords)
+def categorize_domain(domain, responses, keyword_tokens, previous_domain=None):
+
+    #maps the responses of one domain to their nearest keyword of the {keyword: tokens} dict,
+    #returns the {keyword: responses} output of the domain and the lines of its stats.
+    #Domains being independent, it runs in the worker processes of the parallel mode.
+    #previous_domain, the former output of the domain, switches to the incremental mode:
+    #responses already mapped to a keyword there keep it and only the new ones are scored
+
+    stats = []
+    wordmodel = wordembedding.get_wordmodel(normalized=True)
+    result = {}
+
+    print('Categorizing %s domain...' % domain)
+
+    responses = [response for response in responses if response!='\n']
+    categories=list(keyword_tokens)
+
+    kept = {}
+    if previous_domain is not None:
+        #responses without a row number may repeat, so they are matched by count
+        unmatched = Counter(responses)
+        for category in categories:
+            kept[category] = []
+            for entry in previous_domain.get(category, []):
+                if unmatched[entry['response']] > 0:
+                    unmatched[entry['response']] -= 1
+                    kept[category].append(entry)
+        known = Counter(entry['response'] for entries in kept.values() for entry in entries)
+        new_responses = []
+        for response in responses:
+            if known[response] > 0:
+                known[response] -= 1
+            else:
+                new_responses.append(response)
+        s = '%d responses of %s domain already mapped, %d new.' % (len(responses) - len(new_responses), domain, len(new_responses))
+        responses = new_responses
+        print(s)
+        stats.append(s)
 
-def categorizer(keywords):
+    #nearest keyword of every response by pruned, batched word mover's distance
+    st = time.time()
+    response_tokens = textnormalizer.tokenize_all(responses, wordmodel)
+    category_tokens = [textnormalizer.vocab_filter(tokens, wordmodel) for tokens in keyword_tokens.values()]
+    nearest, distances, report = wmdengine.nearest_keywords(response_tokens, category_tokens, wordmodel)
+    et = time.time()
+    s = 'Nearest keywords of %d responses among %d keywords found in %f secs ' \
+        '(lower bounds %f secs, %d exact WMD calls for %d pairs in %f secs).' % (
+            report['responses'], report['keywords'], (et-st),
+            report['bounds_secs'], report['exact_calls'], report['pairs'], report['exact_secs'])
+    print(s)
+    stats.append(s)
+
+    print('Initializing json output...')
+    for catName in categories:
+        result[catName] = list(kept.get(catName, []))
+
+    print('Populating category files...')
+
+    for min_sim_index, temp_score, response in zip(nearest, distances, responses):
+        if min_sim_index < 0:
+            continue
+        temp = {}
+        temp['response'] = response
+        if temp_score==np.inf:
+            temp_score=10.0
+        temp['score'] = float(temp_score)
+        result[categories[min_sim_index]].append(temp)
+    print('Completed.\n')
+
+    #sorting the categorised responses of the domain based on scores
+    for category in result:
+        temp = result[category]
+        if len(temp)==0 or category=='Novel':
+            continue
+        result[category] = sorted(temp, key=lambda k: k['score'], reverse=False)
+    return result, stats
+
+
+def categorizer(keywords, domain_responses, previous_results=None, workers=None):
     
-    #driver function,
-    #returns model output mapped on the input corpora as a dict object
+    #driver function, takes the {domain: {keyword: tokens}} dict and the {domain: response lines}
+    #dict returned by xlsxparser.parse,
+    #returns model output mapped on the input corpora as a dict object.
+    #previous_results, the output of an earlier prediction, is passed on to categorize_domain.
+    #The domains are categorized by workers processes (CATEGORIZATION_WORKERS by default)
     
     stats = open('stats.txt', 'w', encoding='utf-8')
 
+    #loaded before the worker processes start, which share the memory-mapped vectors
     st = time.time()
-    
-    wordmodelfile = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/MAX.bin')
-    wordmodel = KeyedVectors.load_word2vec_format(wordmodelfile, binary = True, limit=200000)
-    wordmodel.init_sims(replace=True)
+    wordembedding.get_wordmodel(normalized=True)
     et = time.time()
     s = 'Word embedding loaded in %f secs.' % (et-st)
     print(s)
     stats.write(s + '\n')
 
-    responsePath = os.path.join(BASE_DIR, 'Venter/ML_model/keyword_model/data/keyword data/')
-    responseDomains = os.listdir(responsePath)
-    #responseDomains.sort()
-    
+    arguments = []
+    for domain, responses in domain_responses.items():
+        previous_domain = previous_results.get(domain) if previous_results else None
+        arguments.append((domain, responses, keywords[domain], previous_domain))
+
     #dictionary for populating the json output
     results = {}
-    for responseDomain in zip(responseDomains):
-        #instantiating the key for the domain
-        responseDomain =str(responseDomain)
-        domain =responseDomain[2:-7]
-        domain =domain.lower()
-        responseDomain =responseDomain[2:-3]
-        results[domain] = {}
-
-        print('Categorizing %s domain...' % domain)
-
-        responses = open(os.path.join(responsePath, responseDomain), 'r', encoding='unicode-escape').readlines()
-        rows=0
-        for response in responses:
-            num=0
-            if response=='\n':
-                num+=1
-            rows+=(len(response)-num)
-            
-        categories=keywords[domain]
-        columns = len(categories)
-
-        #categories = category
-        #saving the scores in a similarity matrix
-        #initializing the matrix with -1 to catch dump/false entries
-        st = time.time()
-        similarity_matrix = [[-1 for c in range(columns)] for r in range(rows)]
-        et = time.time()
-        s = 'Similarity matrix initialized in %f secs.' % (et-st)
-        print(s)
-        stats.write(s + '\n')
-
-        row = 0
-        st = time.time()
-        for response in responses:
-            if response=='\n':
-                    continue
-            else:
-                column = 0
-                for category in categories:
-                    similarity_matrix[row][column] = wmd_similarity(response, category, wordmodel)
-                    column += 1
-            row += 1
-        et = time.time()
-        s = 'Similarity matrix populated in %f secs. ' % (et-st)
-        print(s)
-        stats.write(s + '\n')
-
-        print('Initializing json output...')
-        for catName in categories:
-            results[domain][catName] = []
-
-        print('Populating category files...')
-        
-        for score_row, response in zip(similarity_matrix, responses):
-            if response!='\n':
-                min_sim_index=len(categories)-1
-                min_sim_index = np.array(score_row).argmin()
-                temp = {}
-                temp['response'] = response
-                temp_score = np.array(score_row).min()
-                if temp_score==np.float64(np.inf):
-                    temp_score=10.0
-                temp['score'] = temp_score
-                results[domain][categories[min_sim_index]].append(temp)
-        print('Completed.\n')
-        
-
-        #sorting domain wise categorised responses based on scores
-        for domain in results:
-            for category in results[domain]:                                                                                                                                 
-                temp = results[domain][category]
-                if len(temp)==0 or category=='Novel':
-                    continue
-                results[domain][category] = sorted(temp, key=lambda k: k['score'], reverse=False)
+    for (domain, _, _, _), (result, domain_stats) in zip(arguments, domainpool.map_domains(categorize_domain, arguments, workers)):
+        results[domain] = result
+        for s in domain_stats:
+            stats.write(s + '\n')
     return results
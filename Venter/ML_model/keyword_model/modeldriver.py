@@ -4,26 +4,21 @@ class KeywordSimilarityMapping:
     '''
     This class consumes the model and sequences the flow of execution for the given input
     '''
-    def __init__(self, path, domain_present, domain_keyword_dict):
+    def __init__(self, path, domain_present, domain_keyword_dict, previous_results=None):
         self.filepath = path
         self.domain_present = domain_present
         self.domain_keyword_dict = domain_keyword_dict
+        # output of an earlier prediction of the same proposal, whose mapped responses are reused
+        self.previous_results = previous_results
 
     def driver(self):
         #parsing the input file for having sampled input to the model
         self.domain_keyword_dict = {k.lower(): v for k, v in self.domain_keyword_dict.items()}
         print(self.domain_keyword_dict.keys())
-        domain_keys = xlsxparser.parse(self.filepath, self.domain_present, self.domain_keyword_dict.keys())
+        domain_responses = xlsxparser.parse(self.filepath, self.domain_present, self.domain_keyword_dict.keys())
 
-        # final_dict = final_domain_keyword_dict(domain_keys)
-        temp_dict = {}
-        temp_dict = dict(self.domain_keyword_dict)
-        for domain in domain_keys:
-            if domain not in temp_dict.keys():
-                del temp_dict[domain]
-        final_dict = temp_dict
+        #keywords of the parsed domains only
+        final_dict = {domain: self.domain_keyword_dict[domain] for domain in domain_responses}
 
-        results = keywordmodel.categorizer(final_dict)
+        results = keywordmodel.categorizer(final_dict, domain_responses, self.previous_results)
         return results
-
-
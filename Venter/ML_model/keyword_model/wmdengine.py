@@ -0,0 +1,135 @@
+"""
+Batched, pruned Word Mover's Distance search for the keyword model.
+
+Two lower bounds of the WMD are first computed for every (response, keyword) pair
+with matrix operations: the word centroid distance (WCD) and the relaxed WMD (RWMD).
+Keywords are then visited per response in increasing lower bound order: the TOP_K
+first ones always get an exact wmdistance call, the following ones only while
+their lower bound does not exceed the best exact distance found so far.
+Since no skipped keyword can reach that distance, the nearest keyword (ties going
+to the lowest keyword index, as with numpy argmin) is the one of the full matrix.
+"""
+import time
+
+import numpy as np
+from scipy import sparse
+
+TOP_K = 3
+# absorbs float rounding between the bounds and the exact distances
+LOWER_BOUND_TOLERANCE = 1e-6
+RESPONSE_CHUNK = 2048
+
+
+def _weighted_incidence(token_lists, token_index):
+    '''
+    Sparse (documents x tokens) matrix of bag-of-words weights, each row summing to 1
+    '''
+    indptr = [0]
+    indices = []
+    data = []
+    for tokens in token_lists:
+        tokens = set(tokens)
+        indices.extend(token_index[token] for token in tokens)
+        data.extend([1.0 / len(tokens)] * len(tokens))
+        indptr.append(len(indices))
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(token_lists), len(token_index)))
+
+
+def _embedding(token_index, wordmodel):
+    vocab = wordmodel.vocab
+    rows = [vocab[token].index for token in token_index]
+    return np.asarray(wordmodel.vectors[rows], dtype=np.float64).reshape(len(rows), -1)
+
+
+def _euclidean(a, b):
+    squared = (a * a).sum(axis=1)[:, np.newaxis] + (b * b).sum(axis=1)[np.newaxis, :] - 2 * a.dot(b.T)
+    return np.sqrt(np.maximum(squared, 0))
+
+
+def lower_bounds(response_tokens, keyword_tokens, wordmodel):
+    '''
+    Returns the (responses x keywords) matrix max(WCD, RWMD) of WMD lower bounds.
+    All tokens must be in the wordmodel vocabulary; empty documents get an infinite bound.
+    '''
+    bounds = np.full((len(response_tokens), len(keyword_tokens)), np.inf)
+    rows = [r for r, tokens in enumerate(response_tokens) if tokens]
+    columns = [c for c, tokens in enumerate(keyword_tokens) if tokens]
+    if not rows or not columns:
+        return bounds
+    responses = [response_tokens[r] for r in rows]
+    keywords = [keyword_tokens[c] for c in columns]
+
+    response_index = {}
+    for tokens in responses:
+        for token in tokens:
+            response_index.setdefault(token, len(response_index))
+    keyword_index = {}
+    for tokens in keywords:
+        for token in tokens:
+            keyword_index.setdefault(token, len(keyword_index))
+
+    response_weights = _weighted_incidence(responses, response_index)
+    keyword_weights = _weighted_incidence(keywords, keyword_index)
+    response_vectors = _embedding(response_index, wordmodel)
+    keyword_vectors = _embedding(keyword_index, wordmodel)
+
+    #word centroid distance
+    wcd = _euclidean(response_weights.dot(response_vectors), keyword_weights.dot(keyword_vectors))
+
+    #relaxed WMD, moving every word of one side to its nearest word on the other side
+    distances = _euclidean(response_vectors, keyword_vectors)
+    nearest_in_keyword = np.empty((len(response_index), len(keywords)))
+    for k, tokens in enumerate(keywords):
+        nearest_in_keyword[:, k] = distances[:, [keyword_index[token] for token in set(tokens)]].min(axis=1)
+    response_side = np.asarray(response_weights.dot(nearest_in_keyword))
+
+    keyword_side = np.empty((len(responses), len(keywords)))
+    for start in range(0, len(responses), RESPONSE_CHUNK):
+        chunk = responses[start:start + RESPONSE_CHUNK]
+        flat = [response_index[token] for tokens in chunk for token in set(tokens)]
+        offsets = np.cumsum([0] + [len(set(tokens)) for tokens in chunk[:-1]])
+        nearest_in_response = np.minimum.reduceat(distances[flat], offsets, axis=0)
+        keyword_side[start:start + len(chunk)] = np.asarray(keyword_weights.dot(nearest_in_response.T)).T
+
+    bounds[np.ix_(rows, columns)] = np.maximum(wcd, np.maximum(response_side, keyword_side))
+    return bounds
+
+
+def nearest_keywords(response_tokens, keyword_tokens, wordmodel, top_k=TOP_K):
+    '''
+    Returns, for every response, the index of the keyword at the smallest
+    wordmodel.wmdistance and that distance, as two arrays, plus a timing report dict.
+    Responses are assigned keyword 0 at an infinite distance when nothing is comparable,
+    and -1 when there are no keywords at all.
+    '''
+    report = {'responses': len(response_tokens), 'keywords': len(keyword_tokens)}
+    nearest = np.full(len(response_tokens), -1 if not keyword_tokens else 0, dtype=np.int64)
+    distances = np.full(len(response_tokens), np.inf)
+
+    st = time.time()
+    bounds = lower_bounds(response_tokens, keyword_tokens, wordmodel)
+    report['bounds_secs'] = time.time() - st
+
+    st = time.time()
+    exact_calls = 0
+    for r, tokens in enumerate(response_tokens):
+        if not tokens or not keyword_tokens:
+            continue
+        order = np.argsort(bounds[r], kind='mergesort')
+        best, best_distance = order[0], np.inf
+        for rank, k in enumerate(order):
+            if rank >= top_k and bounds[r, k] - LOWER_BOUND_TOLERANCE > best_distance:
+                break
+            if not keyword_tokens[k]:
+                continue
+            distance = wordmodel.wmdistance(tokens, keyword_tokens[k])
+            exact_calls += 1
+            if distance < best_distance or (distance == best_distance and k < best):
+                best, best_distance = k, distance
+        #like argmin over a row of infinite distances
+        nearest[r] = 0 if best_distance == np.inf else best
+        distances[r] = best_distance
+    report['exact_secs'] = time.time() - st
+    report['exact_calls'] = exact_calls
+    report['pairs'] = len(response_tokens) * len(keyword_tokens)
+    return nearest, distances, report
@@ -5,62 +5,41 @@ Created on Tue June 25 2019
 @author: Anushri Arora
 """
 
-import os
 import re
 
-import numpy as np
-import pandas as pd
 from nltk.tokenize import sent_tokenize, word_tokenize
 
-from Backend.settings import BASE_DIR
+from .. import xlsxreader
 
 
 def parse(filepath, domain_present, domain_keyword_dict_keys):
     '''
-    This function parses the fed xlsx file and saves them separately,
+    This function parses the fed xlsx file and returns the responses of every domain,
     segregating the categories
     Args(1) - xlsx filepath
+    Returns a dict of lowercased domain name -> list of '\\n' terminated response lines
     '''
-    final_domain_names = []
+    domain_responses = {}
+    report = {}
 
     if domain_present:
-        xls = pd.ExcelFile(filepath)
-        df = pd.read_excel(xls, 'Form responses 1', header=[0, 1])
-
-        headers = df.keys()[1:]
-        headers = headers[:len(headers)-3]
-        
-        for h in headers[1::2]:
-            filename = str(h).split(',')[0].split('\'')[1] + '.txt'
-            domain_name = filename[:-4]
+        for domain_name, sentence in xlsxreader.iter_domain_responses(filepath, report):
             domain_name = domain_name.lower()
-            
-            if domain_name in domain_keyword_dict_keys:
-                file = open(os.path.join(BASE_DIR, 'Venter/ML_model/keyword_model/data/keyword data/') + filename, 'w', encoding='utf-8')
-                index = 1
-                print("Parsing " + filename + '...')
-                for sentence in df[h]:
-                    if type(sentence) == str:
-                        file.write(str(index) + '- ' + sentence.lstrip().replace('\n', ' ') + '\n')
-                        index += 1
-                final_domain_names.append(domain_name)
+            if domain_name not in domain_keyword_dict_keys:
+                continue
+            responses = domain_responses.setdefault(domain_name, [])
+            if sentence is not None:
+                responses.append(str(len(responses) + 1) + '- ' + sentence.lstrip().replace('\n', ' ') + '\n')
     else:
         domain_keyword_dict_keys = list(domain_keyword_dict_keys)
         domain_name=domain_keyword_dict_keys[0]
-        final_domain_names.append(domain_name)
 
-        raw_data = pd.read_excel(filepath, skiprows=1)
-        response = raw_data['Feedback']
-        response=response.dropna()
-        tokenized_text=[]
-        for item in response:
-            tokenized_text+=sent_tokenize(item)
-        name = domain_name+'.txt'
-        path = 'Venter/ML_model/keyword_model/data/keyword data/'+name
-        file1 = open(path,'w')
-        for sent in tokenized_text:
-            file1.write(sent)
-            file1.write('\n')
-        file1.close()
+        responses = []
+        for item in xlsxreader.iter_column(filepath, 'Feedback', report):
+            for sent in sent_tokenize(item):
+                responses.append(sent.replace('\n', ' ') + '\n')
+        domain_responses[domain_name] = responses
 
-    return final_domain_names
+    print("Parsed %d responses of %d domains from %d rows of the '%s' sheet in %f secs." % (
+        report['responses'], len(domain_responses), report['rows'], report['sheet'], report['secs']))
+    return domain_responses
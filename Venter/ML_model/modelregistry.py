@@ -0,0 +1,101 @@
+"""
+Process-wide registry of the complaint classification models (ICMC, SpeakUp).
+
+Each model builds its TensorFlow graph, restores its checkpoint and reads its
+pickles once per process, on first use or when warmed at worker start, and is then
+shared by every thread of the process. Load time and per-call latency are recorded
+for every model and returned by get_metrics().
+"""
+import threading
+import time
+
+from django.conf import settings
+
+MODEL_NAMES = ('ICMC', 'SpeakUp')
+
+_models = {}
+_metrics = {}
+_lock = threading.RLock()
+
+
+def _build(name):
+    # imported lazily so that only the models actually used pull in tensorflow
+    if name == 'ICMC':
+        from .ICMC.model.ClassificationService import ClassificationService
+        return ClassificationService()
+    if name == 'SpeakUp':
+        from .SpeakUp.Model.SpeakupClassificationService import ClassificationService_speakup
+        return ClassificationService_speakup()
+    raise KeyError('Unknown classification model: %s' % name)
+
+
+def get_model(name):
+    '''
+    Returns the classification service of the name model for this process, building it on first use.
+    The returned object is shared between threads and must be treated as read-only.
+    '''
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                st = time.time()
+                model = _build(name)
+                et = time.time()
+                print('%s model loaded in %f secs.' % (name, et-st))
+                _metrics[name] = {'load_secs': et-st, 'calls': 0, 'rows': 0, 'total_secs': 0.0, 'max_secs': 0.0}
+                _models[name] = model
+    return model
+
+
+def warm(names=MODEL_NAMES):
+    '''
+    Builds the given models ahead of the first prediction, eg: at worker start
+    '''
+    for name in names:
+        get_model(name)
+
+
+def iter_top_3_cats_with_prob(name, data, batch_size=None, overlap=None):
+    '''
+    Yields (number of rows done, top 3 categories of the batch) for every mini-batch of data
+    run through the name model, recording the latency of the whole call.
+    batch_size and overlap default to the CLASSIFICATION_BATCH_SIZE and
+    CLASSIFICATION_OVERLAP_PREPROCESSING settings.
+    '''
+    if batch_size is None:
+        batch_size = settings.CLASSIFICATION_BATCH_SIZE
+    if overlap is None:
+        overlap = settings.CLASSIFICATION_OVERLAP_PREPROCESSING
+    model = get_model(name)
+    st = time.time()
+    for done, results in model.iter_top_3_cats_with_prob(data, batch_size, overlap):
+        yield done, results
+    secs = time.time() - st
+    with _lock:
+        metrics = _metrics[name]
+        metrics['calls'] += 1
+        metrics['rows'] += len(data)
+        metrics['total_secs'] += secs
+        metrics['max_secs'] = max(metrics['max_secs'], secs)
+    print('%s model categorized %d rows in %f secs.' % (name, len(data), secs))
+
+
+def get_top_3_cats_with_prob(name, data, batch_size=None, overlap=None):
+    '''
+    Returns the top 3 categories of every row of data by the name model, see iter_top_3_cats_with_prob
+    '''
+    batches = [results for done, results in iter_top_3_cats_with_prob(name, data, batch_size, overlap)]
+    return get_model(name).join_results(batches)
+
+
+def get_metrics():
+    '''
+    Returns {model name: {load_secs, calls, rows, total_secs, max_secs, mean_secs}}
+    for the models loaded in this process
+    '''
+    with _lock:
+        metrics = {name: dict(values) for name, values in _metrics.items()}
+    for values in metrics.values():
+        values['mean_secs'] = values['total_secs'] / values['calls'] if values['calls'] else None
+    return metrics
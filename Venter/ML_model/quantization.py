@@ -0,0 +1,72 @@
+"""
+Reduced precision storage of word embedding matrices.
+
+An embedding is kept as float32 (full precision), float16, or int8 codes with one
+float32 scale per row (the row's largest absolute value / 127). Rows are only turned
+back into float32 when gathered with take(), so a worker holds 1/2 (float16) or about
+1/4 (int8) of the float32 embedding.
+"""
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+class QuantizedMatrix:
+    '''
+    A (rows x dim) matrix stored at a given precision
+    '''
+    def __init__(self, data, scales=None):
+        self.data = data
+        self.scales = scales
+
+    @property
+    def precision(self):
+        return str(self.data.dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def from_array(cls, array, precision='float32'):
+        '''
+        Stores array at the given precision, one of PRECISIONS
+        '''
+        if precision not in PRECISIONS:
+            raise ValueError('Unknown embedding precision %r, expected one of %s' % (precision, ', '.join(PRECISIONS)))
+        if precision != 'int8':
+            return cls(np.asarray(array, dtype=precision))
+
+        array = np.asarray(array, dtype=np.float32)
+        scales = np.abs(array).max(axis=1) / 127 if array.size else np.ones(array.shape[0], dtype=np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.rint(array / scales[:, np.newaxis]).astype(np.int8)
+        return cls(codes, scales.astype(np.float32))
+
+    def take(self, rows):
+        '''
+        Returns the given rows as a float32 array
+        '''
+        values = np.asarray(self.data[rows], dtype=np.float32)
+        if self.scales is not None:
+            values *= self.scales[rows].reshape(values.shape[:-1] + (1,))
+        return values
+
+    def save(self, path):
+        '''
+        Saves the matrix as path.npy, with the int8 scales as path.scales.npy
+        '''
+        np.save(path + '.npy', self.data)
+        if self.scales is not None:
+            np.save(path + '.scales.npy', self.scales)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        scales_path = path + '.scales.npy'
+        data = np.load(path + '.npy', mmap_mode=mmap_mode)
+        scales = np.load(scales_path) if data.dtype == np.int8 else None
+        return cls(data, scales)
@@ -0,0 +1,84 @@
+"""
+Persistent cache of the category sentence embeddings of every domain.
+
+The category sentences of a domain (data/sentences/<domain>_c.txt) are tokenized and
+embedded once, and saved under data/cache/ as <domain>_c.<key>.npz, the key hashing
+the content of the category file together with wordembedding.embedding_version().
+A changed category file or word embedding gives a new key, so the entry is rebuilt
+on the next prediction and the stale ones removed. Loaded entries are also kept in memory.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from Backend.settings import BASE_DIR
+
+from .. import wordembedding
+from . import similarityengine
+
+CACHE_PATH = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/data/cache/')
+
+_embeddings = {}
+_lock = threading.Lock()
+
+
+def read_categories(content):
+    '''
+    The category sentences of a category file, one per line, whatever its line endings
+    '''
+    return content.decode('utf-8-sig').splitlines()
+
+
+def cache_key(content, version):
+    digest = hashlib.sha256(content)
+    digest.update(version.encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def _save(path, tokens, vectors):
+    temp_path = path + '.%d.tmp' % os.getpid()
+    with open(temp_path, 'wb') as temp:
+        np.savez(temp, vectors=vectors, tokens=np.array(json.dumps(tokens)))
+    os.replace(temp_path, path)
+
+
+def _load(path):
+    with np.load(path) as data:
+        tokens = [tuple(sentence_tokens) for sentence_tokens in json.loads(str(data['tokens']))]
+        return tokens, data['vectors']
+
+
+def _remove_stale(stem, path):
+    for filename in os.listdir(CACHE_PATH):
+        if filename.startswith(stem + '.') and filename.endswith('.npz') and os.path.join(CACHE_PATH, filename) != path:
+            os.remove(os.path.join(CACHE_PATH, filename))
+
+
+def load_categories(category_file, wordmodel, matrix=None, precision=None):
+    '''
+    Returns the category sentences of category_file and their category_embedding
+    (token tuples, normalized mean vectors), from the cache when it is up to date
+    '''
+    with open(category_file, 'rb') as temp:
+        content = temp.read()
+    categories = read_categories(content)
+
+    stem = os.path.splitext(os.path.basename(category_file))[0]
+    path = os.path.join(CACHE_PATH, '%s.%s.npz' % (stem, cache_key(content, wordembedding.embedding_version(precision))))
+    embedded = _embeddings.get(path)
+    if embedded is None:
+        with _lock:
+            embedded = _embeddings.get(path)
+            if embedded is None:
+                if os.path.exists(path):
+                    embedded = _load(path)
+                else:
+                    embedded = similarityengine.category_embedding(categories, wordmodel, matrix)
+                    os.makedirs(CACHE_PATH, exist_ok=True)
+                    _save(path, embedded[0], embedded[1])
+                    _remove_stale(stem, path)
+                _embeddings[path] = embedded
+    return categories, embedded
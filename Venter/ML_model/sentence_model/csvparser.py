@@ -5,32 +5,24 @@ Created on Mon Feb 25 17:15:22 2019
 @author: Chintan Maniyar
 """
 
-import os
 import re
 
-import pandas as pd
-
-from Backend.settings import BASE_DIR
+from .. import xlsxreader
 
 
 def parse(filepath):
     '''
-    This function parses the fed csv file and saves them separately,
+    This function parses the fed csv file and returns the responses of every domain,
     segregating the categories
     Args(1) - csv filepath
+    Returns a dict of domain name -> list of numbered '<index>- <response>\\n' lines
     '''
-    xls = pd.ExcelFile(filepath)
-    df = pd.read_excel(xls, 'Form responses 1', header=[0, 1])
-
-    headers = df.keys()[1:]
-    headers = headers[:len(headers)-3]
-    for h in headers[1::2]:
-        filename = str(h).split(',')[0].split('\'')[1] + '.txt'
-
-        file = open(os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/data/comments/') + filename, 'w', encoding='utf-8')
-        index = 1
-        print("Parsing " + filename + '...')
-        for sentence in df[h]:
-            if type(sentence) == str:
-                file.write(str(index) + '- ' + sentence.lstrip().replace('\n', ' ') + '\n')
-                index += 1
+    domain_responses = {}
+    report = {}
+    for domain, sentence in xlsxreader.iter_domain_responses(filepath, report):
+        responses = domain_responses.setdefault(domain, [])
+        if sentence is not None:
+            responses.append(str(len(responses) + 1) + '- ' + sentence.lstrip().replace('\n', ' ') + '\n')
+    print("Parsed %d responses of %d domains from %d rows of the '%s' sheet in %f secs." % (
+        report['responses'], len(domain_responses), report['rows'], report['sheet'], report['secs']))
+    return domain_responses
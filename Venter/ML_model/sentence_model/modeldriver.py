@@ -4,11 +4,13 @@ class SimilarityMapping:
     '''
     This class consumes the model and sequences the flow of execution for the given input
     '''
-    def __init__(self, path):
+    def __init__(self, path, previous_results=None):
         self.filepath = path
+        # output of an earlier prediction, whose categorized responses are reused
+        self.previous_results = previous_results
 
     def driver(self):
         #parsing the input file for having sampled input to the model
-        csvparser.parse(self.filepath)
-        results = sentencemodel.categorizer()
+        domain_responses = csvparser.parse(self.filepath)
+        results = sentencemodel.categorizer(domain_responses, self.previous_results)
         return results
@@ -0,0 +1,125 @@
+"""
+Sub-categorization of the Novel responses of a domain.
+
+Every Novel response is linked to its most similar other Novel response and the
+connected components of these links become the Novel sub categories. The best
+neighbours are found on the normalized mean word vectors of the responses, with
+the same rule as similarityIndex that responses without a shared token score 0.0.
+
+Small domains are searched exactly. Larger ones go through a random-projection
+LSH index, which only scores responses falling in the same hash bucket of at
+least one table, so the cost grows with N x LSH_TABLES x LSH_BUCKET_SIZE instead of N^2.
+More tables (or fewer bits) raise the recall, at the cost of scoring more candidates.
+
+When Novel responses are added to an already clustered domain, only the new responses
+are linked, exactly, to their best neighbour (exact_best_neighbours_of), at a cost of
+new x N; the links of the former responses are kept through their sub categories.
+"""
+import numpy as np
+
+EXACT_SEARCH_LIMIT = 2000
+LSH_TABLES = 8
+LSH_BITS = 14
+LSH_BUCKET_SIZE = 16
+BLOCK_SIZE = 1024
+PAIR_CHUNK = 65536
+
+
+def _gated_pair_scores(vectors, incidence, first, second):
+    '''
+    Cosine scores of the (first[k], second[k]) pairs, zeroed when the pair has no common token
+    '''
+    scores = np.einsum('ij,ij->i', vectors[first], vectors[second])
+    shared = np.asarray(incidence[first].multiply(incidence[second]).sum(axis=1)).ravel()
+    scores[shared == 0] = 0.0
+    return scores
+
+
+def exact_best_neighbours_of(vectors, incidence, rows):
+    '''
+    Returns, for every response of rows, the index of its best scoring other response
+    among all the responses, or -1 when no other response scores above 0.
+    Scores are computed block by block so that memory stays at BLOCK_SIZE x N.
+    '''
+    rows = np.asarray(rows, dtype=np.int64)
+    best = np.full(rows.size, -1, dtype=np.int64)
+    for start in range(0, rows.size, BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        scores = vectors[block].dot(vectors.T)
+        shared = incidence[block].dot(incidence.T).toarray() > 0
+        scores[~shared] = 0.0
+        scores[np.arange(block.size), block] = 0.0
+        best_columns = scores.argmax(axis=1)
+        found = scores[np.arange(block.size), best_columns] > 0
+        best[start:start + block.size][found] = best_columns[found]
+    return best
+
+
+def exact_best_neighbours(vectors, incidence):
+    '''
+    Returns, for every response, the index of its best scoring other response,
+    or -1 when no other response scores above 0
+    '''
+    return exact_best_neighbours_of(vectors, incidence, np.arange(vectors.shape[0]))
+
+
+def _bucket_pairs(codes, order_key, bucket_size):
+    '''
+    Candidate pairs of one LSH table: members of a bucket are paired with each other;
+    oversized buckets are ordered along order_key and only neighbours within a window of
+    bucket_size are paired, keeping the number of candidates linear in N
+    '''
+    order = np.lexsort((order_key, codes))
+    sorted_codes = codes[order]
+    firsts = []
+    seconds = []
+    for offset in range(1, bucket_size):
+        same_bucket = sorted_codes[offset:] == sorted_codes[:-offset]
+        if not same_bucket.any():
+            break
+        firsts.append(order[:-offset][same_bucket])
+        seconds.append(order[offset:][same_bucket])
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def lsh_best_neighbours(vectors, incidence, tables=LSH_TABLES, bits=LSH_BITS, bucket_size=LSH_BUCKET_SIZE, seed=0):
+    '''
+    Approximate exact_best_neighbours with a random-projection LSH index.
+    Returns the same -1 convention for responses without a positive scoring candidate.
+    '''
+    n, dim = vectors.shape
+    random_state = np.random.RandomState(seed)
+    weights = 1 << np.arange(bits, dtype=np.int64)
+
+    best = np.full(n, -1, dtype=np.int64)
+    best_scores = np.zeros(n, dtype=np.float32)
+    for _ in range(tables):
+        planes = random_state.randn(dim, bits + 1).astype(np.float32)
+        projections = vectors.dot(planes)
+        codes = (projections[:, :bits] > 0).dot(weights)
+        first, second = _bucket_pairs(codes, projections[:, bits], bucket_size)
+        first, second = np.concatenate((first, second)), np.concatenate((second, first))
+
+        # scoring in chunks keeps the gathered vectors at PAIR_CHUNK x dim
+        for start in range(0, first.size, PAIR_CHUNK):
+            chunk_first = first[start:start + PAIR_CHUNK]
+            chunk_second = second[start:start + PAIR_CHUNK]
+            scores = _gated_pair_scores(vectors, incidence, chunk_first, chunk_second)
+            order = np.lexsort((-scores, chunk_first))
+            rows, positions = np.unique(chunk_first[order], return_index=True)
+            chunk_best = scores[order][positions]
+            better = chunk_best > best_scores[rows]
+            best_scores[rows[better]] = chunk_best[better]
+            best[rows[better]] = chunk_second[order][positions][better]
+    return best
+
+
+def best_neighbours(vectors, incidence):
+    '''
+    Exact search for small domains, LSH search beyond EXACT_SEARCH_LIMIT responses
+    '''
+    if vectors.shape[0] <= EXACT_SEARCH_LIMIT:
+        return exact_best_neighbours(vectors, incidence)
+    return lsh_best_neighbours(vectors, incidence)
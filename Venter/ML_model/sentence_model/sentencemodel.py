@@ -3,14 +3,15 @@ import time
 
 import networkx
 import numpy as np
-from gensim.models import KeyedVectors
 from networkx.algorithms.components.connected import connected_components
-from nltk.corpus import stopwords
 from nltk.corpus import wordnet as wn
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 from Backend.settings import BASE_DIR
 
+from .. import domainpool, textnormalizer, wordembedding
+from . import categorycache, novelclustering, similarityengine
+
 THRESHOLD_SCORE = 0.4
 
 def toGraph(l):
@@ -35,6 +36,21 @@ def toEdges(l):
         yield last, current
         last = current 
 
+def tokenSimilarityIndex(s1tokens, s2tokens, wordmodel):
+    '''
+    similarityIndex for sentences already split and stopword-filtered by textnormalizer,
+    returns 0.0 when they share no token or when either has no word in the vocabulary
+    '''
+    if len(set(s1tokens) & set(s2tokens)) == 0:
+        return 0.0
+
+    s1words = textnormalizer.vocab_filter(s1tokens, wordmodel)
+    s2words = textnormalizer.vocab_filter(s2tokens, wordmodel)
+    if len(s1words) == 0 or len(s2words) == 0:
+        return 0.0
+
+    return wordmodel.n_similarity(s1words, s2words)
+
 def similarityIndex(s1, s2, wordmodel):
     '''
     To compare the two sentences for their similarity using the gensim wordmodel 
@@ -43,174 +59,163 @@ def similarityIndex(s1, s2, wordmodel):
     if s1 == s2:
         return 1.0
 
-    s1words = s1.split()
-    s2words = s2.split()
+    return tokenSimilarityIndex(textnormalizer.tokenize(s1), textnormalizer.tokenize(s2), wordmodel)
 
-    s1words = set(s1words)
-    for word in s1words.copy():
-        if word in stopwords.words('english'):
-            s1words.remove(word)
-    
-    s2words = set(s2words)
-    for word in s2words.copy():
-        if word in stopwords.words('english'):
-            s2words.remove(word)
+def split_previous(previous_domain, categories, responses):
+    '''
+    Splits the responses of a domain into the ones already categorized in previous_domain,
+    the former output of the domain, and the new ones.
+    Returns ({category: kept entries}, kept Novel sub categories, new responses)
+    '''
+    current = set(responses)
+    known = set()
+    kept = {}
+    for category in categories:
+        kept[category] = [entry for entry in previous_domain.get(category, []) if entry['response'] in current]
+        known.update(entry['response'] for entry in kept[category])
+    novel_groups = []
+    for group in previous_domain.get('Novel', {}).values():
+        group = [response for response in group if response in current]
+        if group:
+            novel_groups.append(group)
+            known.update(group)
+    return kept, novel_groups, [response for response in responses if response not in known]
+
+def categorize_domain(domain, responses, category_file, previous_domain=None):
+    '''
+    Categorizes the responses of one domain against the category sentences of category_file,
+    returns the {category: responses} output of the domain and the lines of its stats.
+    Domains being independent, it runs in the worker processes of the parallel mode.
+    previous_domain, the former output of the domain, switches to the incremental mode:
+    responses already categorized there keep their category and only the new ones are scored
+    '''
+    stats = []
+    wordmodel = wordembedding.get_wordmodel()
+    matrix = wordembedding.get_embedding_matrix()
+    result = {}
+
+    print('Categorizing %s domain...' % domain)
+
+    #category sentences with their embeddings, cached across predictions
+    categories, embedded = categorycache.load_categories(category_file, wordmodel, matrix)
+    columns = len(categories)
+
+    kept, novel_groups = {}, []
+    if previous_domain is not None:
+        kept, novel_groups, new_responses = split_previous(previous_domain, categories, responses)
+        s = '%d responses of %s domain already categorized, %d new.' % (
+            len(responses) - len(new_responses), domain, len(new_responses))
+        print(s)
+        stats.append(s)
+        responses = new_responses
+    rows = len(responses)
+    categories.append('Novel')
 
-    s1words = list(s1words)
-    s2words = list(s2words)
+    #scoring every response against every category in one batched pass
+    st = time.time()
+    response_texts = [response.split('-')[1].lstrip() for response in responses]
+    similarity_matrix = similarityengine.similarity_matrix(response_texts, categories[:-1], wordmodel, matrix, embedded_b=embedded)
+    et = time.time()
+    s = 'Similarity matrix of %d x %d computed in %f secs. ' % (rows, columns, (et-st))
+    print(s)
+    stats.append(s)
+
+    print('Initializing json output...')
+    for catName in categories:
+        result[catName] = list(kept.get(catName, []))
+
+    print('Populating category files...')
+    for score_row, response in zip(similarity_matrix, responses):
+        max_sim_index = len(categories)-1
+        if score_row.sum() > 0:
+            max_sim_index = score_row.argmax()
+            temp = {}
+            temp['response'] = response
+            temp['score'] = int(score_row.max()*100)
+        else:
+            temp = response
+        result[categories[max_sim_index]].append(temp)
+    print('Completed.\n')
+
+    #sorting the categorised responses of the domain based on scores
+    for category in result:
+        temp = result[category]
+        if len(temp)==0 or category=='Novel':
+            continue
+        result[category] = sorted(temp, key=lambda k: k['score'], reverse=True)
+
+    #linking every novel response to its best matching novel response,
+    #only the new ones when the former sub categories are kept
+    first_new = sum(len(group) for group in novel_groups)
+    novel_responses = [response for group in novel_groups for response in group] + result['Novel']
+    st = time.time()
+    novel_texts = [response.split('-')[1].lstrip() for response in novel_responses]
+    vectors, incidence = similarityengine.embed(novel_texts, wordmodel, matrix)
+    if novel_groups:
+        neighbours = novelclustering.exact_best_neighbours_of(vectors, incidence, np.arange(first_new, len(novel_responses)))
+    else:
+        neighbours = novelclustering.best_neighbours(vectors, incidence)
+    et = time.time()
+    s = 'Best matches of %d novel responses for %s domain found in %f secs.' % (len(novel_responses) - first_new, domain, (et-st))
+    print(s)
+    stats.append(s)
 
-    s1set = set(s1words)
-    s2set = set(s2words)
+    setlist = list(novel_groups)
+    for index, response in enumerate(novel_responses[first_new:], first_new):
+        max_sim_index = index
+        if neighbours[index - first_new] >= 0:
+            max_sim_index = neighbours[index - first_new]
+        setlist.append([response, novel_responses[max_sim_index]])
 
-    vocab = wordmodel.vocab
-    
-    if len(s1set & s2set) == 0:
-        return 0.0
-    for word in s1set.copy():
-        if (word not in vocab):
-            s1words.remove(word)
-    for word in s2set.copy():
-        if (word not in vocab):
-            s2words.remove(word)
-    
-    return wordmodel.n_similarity(s1words, s2words)
+    G = toGraph(setlist)
+    setlist = list(connected_components(G))
+
+    novel_sub_categories = {}
+    index = 0
+    for category in setlist:
+        novel_sub_categories[index] = list(category)
+        index += 1
+
+    result['Novel'] = novel_sub_categories
 
-def categorizer():
+    print('***********************************************************')
+    return result, stats
+
+def categorizer(domain_responses, previous_results=None, workers=None):
     '''
     driver function,
-    returns model output mapped on the input corpora as a dict object
+    takes the {domain: response lines} dict returned by csvparser.parse and
+    returns model output mapped on the input corpora as a dict object.
+    previous_results, the output of an earlier prediction, is passed on to categorize_domain.
+    The domains are categorized by workers processes (CATEGORIZATION_WORKERS by default)
     '''
     stats = open('stats.txt', 'w', encoding='utf-8')
 
+    #loaded before the worker processes start, which share the memory-mapped vectors
     st = time.time()
-    wordmodelfile = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/MAX.bin')
-    wordmodel = KeyedVectors.load_word2vec_format(wordmodelfile, binary=True, limit=200000)
+    wordembedding.get_wordmodel()
+    wordembedding.get_embedding_matrix()
     et = time.time()
     s = 'Word embedding loaded in %f secs.' % (et-st)
     print(s)
     stats.write(s + '\n')
 
     #filepaths
-    responsePath = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/data/comments/')
     categoryPath = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/data/sentences/')
-    responseDomains = os.listdir(responsePath)
-    responseDomains.sort()
+    #same order as the former '<domain>.txt' response files, zipped with the category files
+    responseDomains = sorted(domain_responses, key=lambda domain: domain + '.txt')
     categoryDomains = os.listdir(categoryPath)
     categoryDomains.sort()
 
+    arguments = []
+    for responseDomain, categoryDomain in zip(responseDomains, categoryDomains):
+        previous_domain = previous_results.get(responseDomain) if previous_results else None
+        arguments.append((responseDomain, domain_responses[responseDomain], os.path.join(categoryPath, categoryDomain), previous_domain))
+
     #dictionary for populating the json output
     results = {}
-    for responseDomain, categoryDomain in zip(responseDomains, categoryDomains):
-        #instantiating the key for the domain
-        domain = responseDomain[:-4]
-        results[domain] = {}
-
-        print('Categorizing %s domain...' % domain)
-
-        temp = open(os.path.join(responsePath, responseDomain), 'r', encoding='utf-8-sig')
-        responses = temp.readlines()
-        rows = len(responses)
-
-        temp = open(os.path.join(categoryPath, categoryDomain), 'r', encoding='utf-8-sig')
-        categories = temp.readlines()
-        temp_categories = []
-        for line in categories:
-            temp_categories.append(line.split('\n')[0])
-        categories = temp_categories
-        columns = len(categories)
-        categories.append('Novel')
-
-        #saving the scores in a similarity matrix
-        #initializing the matrix with -1 to catch dump/false entries
-        st = time.time()
-        similarity_matrix = [[-1 for c in range(columns)] for r in range(rows)]
-        et = time.time()
-        s = 'Similarity matrix initialized in %f secs.' % (et-st)
-        print(s)
-        stats.write(s + '\n')
-
-        row = 0
-        st = time.time()
-        for response in responses:
-            column = 0
-            for category in categories[:-1]:
-                similarity_matrix[row][column] = similarityIndex(response.split('-')[1].lstrip(), category, wordmodel)
-                column += 1
-            row += 1
-        et = time.time()
-        s = 'Similarity matrix populated in %f secs. ' % (et-st)
-        print(s)
-        stats.write(s + '\n')
-
-        print('Initializing json output...')
-        for catName in categories:
-            results[domain][catName] = []
-
-        print('Populating category files...')
-        for score_row, response in zip(similarity_matrix, responses):
-            max_sim_index = len(categories)-1
-            if np.array(score_row).sum() > 0:
-                max_sim_index = np.array(score_row).argmax()
-                temp = {}
-                temp['response'] = response
-                temp['score'] = int((np.array(score_row).max())*100)
-            else:
-                temp = response
-            results[domain][categories[max_sim_index]].append(temp)
-        print('Completed.\n')
-
-        #sorting domain wise categorised responses based on scores
-        for domain in results:
-            for category in results[domain]:                                                                                                                                      
-                temp = results[domain][category]
-                if len(temp)==0 or category=='Novel':
-                    continue
-                #print(temp)
-                results[domain][category] = sorted(temp, key=lambda k: k['score'], reverse=True)
-        #newlist = sorted(list_to_be_sorted, key=lambda k: k['name']) --> to sort list of dictionaries
-
-        #initializing the matrix with -1 to catch dump/false entries for subcategorization of the novel responses
-        no_of_novel_responses = len(results[domain]['Novel'])
-        st = time.time()
-        similarity_matrix = [[-1 for c in range(no_of_novel_responses)] for r in range(no_of_novel_responses)]
-        et = time.time()
-        s = 'Similarity matrix for subcategorization of novel responses for %s domain initialized in %f secs.' % (domain, (et-st))
-        print(s)
-        stats.write(s + '\n')
-
-
-        #populating the matrix
-        row = 0
-        for response1 in results[domain]['Novel']:
-            column = 0
-            for response2 in results[domain]['Novel']:
-                if response1 == response2:
-                    column += 1
-                    continue
-                similarity_matrix[row][column] = similarityIndex(response1.split('-')[1].lstrip(), response2.split('-')[1].lstrip(), wordmodel)
-                column += 1
-            row += 1
-        
-        setlist = []
-        index = 0
-        for score_row, response in zip(similarity_matrix, results[domain]['Novel']):
-            max_sim_index = index
-            if np.array(score_row).sum() > 0:
-                max_sim_index = np.array(score_row).argmax()
-            if set([response, results[domain]['Novel'][max_sim_index]]) not in setlist:
-                setlist.append([response, results[domain]['Novel'][max_sim_index]])
-            index += 1
-    
-        G = toGraph(setlist)
-        setlist = list(connected_components(G))
-    
-        novel_sub_categories = {}
-        index = 0
-        for category in setlist:
-            novel_sub_categories[index] = list(category)
-            index += 1
-
-        results[domain]['Novel'] = novel_sub_categories
-
-        print('***********************************************************')    
-    return results
\ No newline at end of file
+    for (domain, _, _, _), (result, domain_stats) in zip(arguments, domainpool.map_domains(categorize_domain, arguments, workers)):
+        results[domain] = result
+        for s in domain_stats:
+            stats.write(s + '\n')
+    return results
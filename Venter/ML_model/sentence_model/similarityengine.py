@@ -0,0 +1,130 @@
+"""
+Batched similarity engine for the sentence model.
+
+Every response and every category sentence is reduced to one normalized mean
+word vector in a single pass, and the whole response x category score matrix
+is then obtained with one matrix multiply instead of one n_similarity call per pair.
+The word vectors can be read from a reduced precision QuantizedMatrix of the
+wordmodel vectors (see quantization), the scores being computed in float32.
+"""
+import numpy as np
+from scipy import sparse
+
+from .. import textnormalizer
+from ..quantization import QuantizedMatrix
+
+
+def build_token_index(*token_groups):
+    '''
+    Assigns a column number to every distinct token of the given token set lists
+    '''
+    token_index = {}
+    for token_sets in token_groups:
+        for tokens in token_sets:
+            for token in tokens:
+                if token not in token_index:
+                    token_index[token] = len(token_index)
+    return token_index
+
+
+def incidence_matrix(token_sets, token_index):
+    '''
+    Returns a sparse (sentences x tokens) 0/1 matrix marking the tokens of every sentence
+    '''
+    indptr = [0]
+    indices = []
+    for tokens in token_sets:
+        indices.extend(token_index[token] for token in tokens)
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(token_sets), len(token_index)))
+
+
+def overlap_mask(incidence_a, incidence_b):
+    '''
+    Returns a dense boolean matrix, True wherever two sentences share at least one token
+    '''
+    shared = incidence_a.dot(incidence_b.T)
+    return shared.toarray() > 0
+
+
+def sentence_vectors(incidence, token_index, wordmodel, matrix=None):
+    '''
+    Returns the unit-normalized mean word vector of every sentence as a float32 matrix.
+    Out of vocabulary tokens are skipped; sentences without any known token get a zero row.
+    The word vectors are read from matrix when given, from wordmodel.vectors otherwise.
+    '''
+    vocab = wordmodel.vocab
+    columns = []
+    rows = []
+    for token, column in token_index.items():
+        if token in vocab:
+            columns.append(column)
+            rows.append(vocab[token].index)
+
+    if matrix is None:
+        matrix = QuantizedMatrix(wordmodel.vectors)
+    embedding = matrix.take(rows)
+    vectors = np.asarray(incidence[:, columns].dot(embedding), dtype=np.float32)
+
+    # the mean and the sum point the same way, so normalizing the sum is enough
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    return vectors / norms[:, np.newaxis]
+
+
+def embed(sentences, wordmodel, matrix=None):
+    '''
+    Returns the normalized mean vectors of the sentences together with their
+    sparse token incidence matrix, used to apply the shared-token gate
+    '''
+    tokens = textnormalizer.tokenize_all(sentences)
+    token_index = build_token_index(tokens)
+    incidence = incidence_matrix(tokens, token_index)
+    return sentence_vectors(incidence, token_index, wordmodel, matrix), incidence
+
+
+def category_embedding(sentences, wordmodel, matrix=None):
+    '''
+    Returns the (token tuples, normalized mean vectors) of category sentences,
+    the precomputed form of sentences_b accepted by similarity_matrix
+    '''
+    tokens = textnormalizer.tokenize_all(sentences)
+    token_index = build_token_index(tokens)
+    incidence = incidence_matrix(tokens, token_index)
+    return tokens, sentence_vectors(incidence, token_index, wordmodel, matrix)
+
+
+def similarity_matrix(sentences_a, sentences_b, wordmodel, matrix=None, embedded_b=None):
+    '''
+    Scores every sentence of sentences_a against every sentence of sentences_b.
+    Follows the similarityIndex semantics: identical sentences score 1.0, pairs
+    without a shared non-stopword token score 0.0, the rest get the cosine similarity
+    of their mean word vectors. Returns a float32 array of shape (len(a), len(b)).
+    embedded_b, when given, is the category_embedding of sentences_b, which are then not re-embedded.
+    '''
+    tokens_a = textnormalizer.tokenize_all(sentences_a)
+    if embedded_b is None:
+        tokens_b = textnormalizer.tokenize_all(sentences_b)
+    else:
+        tokens_b, vectors_b = embedded_b
+    token_index = build_token_index(tokens_a, tokens_b)
+
+    incidence_a = incidence_matrix(tokens_a, token_index)
+    incidence_b = incidence_matrix(tokens_b, token_index)
+
+    vectors_a = sentence_vectors(incidence_a, token_index, wordmodel, matrix)
+    if embedded_b is None:
+        vectors_b = sentence_vectors(incidence_b, token_index, wordmodel, matrix)
+
+    scores = vectors_a.dot(vectors_b.T)
+    scores[~overlap_mask(incidence_a, incidence_b)] = 0.0
+
+    positions_b = {}
+    for column, sentence in enumerate(sentences_b):
+        positions_b.setdefault(sentence, []).append(column)
+    for row, sentence in enumerate(sentences_a):
+        if sentence in positions_b:
+            scores[row, positions_b[sentence]] = 1.0
+
+    return scores
@@ -0,0 +1,63 @@
+"""
+Shared text normalization for the word-vector based scorers.
+
+The english stopword list is read from the nltk corpus once and kept as a frozenset,
+and every distinct sentence is split and filtered exactly once. Scorers receive the
+resulting token tuples instead of raw strings. The word cloud stage, which needs the
+words in order for part-of-speech tagging, gets them from word_tokens, cached the same way.
+"""
+from functools import lru_cache
+
+import nltk
+from nltk.corpus import stopwords
+
+TOKEN_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=1)
+def get_stopwords():
+    '''
+    Returns the english stopwords as a frozenset, reading the nltk corpus only once
+    '''
+    return frozenset(stopwords.words('english'))
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def tokenize(sentence):
+    '''
+    Splits a sentence on whitespace and returns its distinct non-stopword tokens
+    as a sorted tuple (the scorers never relied on their order)
+    '''
+    stop = get_stopwords()
+    return tuple(sorted({word for word in sentence.split() if word not in stop}))
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def word_tokens(sentence):
+    '''
+    Returns the nltk.word_tokenize words of a sentence as a tuple, in order and stopwords kept
+    '''
+    return tuple(nltk.word_tokenize(sentence))
+
+
+def vocab_filter(tokens, wordmodel):
+    '''
+    Drops the tokens missing from the wordmodel vocabulary
+    '''
+    vocab = wordmodel.vocab
+    return tuple(token for token in tokens if token in vocab)
+
+
+def tokenize_all(sentences, wordmodel=None):
+    '''
+    Tokenizes a list of sentences, handling each distinct sentence once.
+    Returns one token tuple per sentence, vocabulary-filtered when a wordmodel is given.
+    '''
+    distinct = {}
+    for sentence in sentences:
+        if sentence not in distinct:
+            tokens = tokenize(sentence)
+            if wordmodel is not None:
+                tokens = vocab_filter(tokens, wordmodel)
+            distinct[sentence] = tokens
+    return [distinct[sentence] for sentence in sentences]
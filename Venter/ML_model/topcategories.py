@@ -0,0 +1,76 @@
+"""
+Compact top-k category predictions of the classification models.
+
+The k most probable categories of every row are selected on the whole probability
+matrix with np.argpartition, and kept as an int16 [N, k] category id array with a
+uint8 [N, k] array of percentages. Category names are only looked up when a row
+is rendered, eg: as the {category: percentage} dict of the results json.
+"""
+import numpy as np
+
+
+def top_k(probs, k):
+    '''
+    Returns the [N, k] column indices of the k largest values of every row of probs,
+    in decreasing order, and these values
+    '''
+    probs = np.asarray(probs)
+    k = min(k, probs.shape[1])
+    if k == 0 or probs.shape[0] == 0:
+        return np.empty((probs.shape[0], k), dtype=np.int64), np.empty((probs.shape[0], k), dtype=probs.dtype)
+    rows = np.arange(probs.shape[0])[:, np.newaxis]
+    candidates = np.argpartition(probs, -k, axis=1)[:, -k:]
+    order = np.argsort(-probs[rows, candidates], axis=1, kind='mergesort')
+    ids = candidates[rows, order]
+    return ids, probs[rows, ids]
+
+
+class TopCategories:
+    '''
+    The top k categories of N rows: ids (int16 [N, k]) and percentages (uint8 [N, k]),
+    names being the category name of every id
+    '''
+    def __init__(self, ids, percentages, names):
+        self.ids = ids
+        self.percentages = percentages
+        self.names = names
+
+    @classmethod
+    def from_probabilities(cls, probs, names, k=3):
+        '''
+        Keeps the k most probable categories of every row, their probability being
+        truncated to an integer percentage
+        '''
+        ids, top_probs = top_k(probs, k)
+        percentages = (top_probs.astype(np.float64) * 100).astype(np.uint8)
+        return cls(ids.astype(np.int16), percentages, names)
+
+    @classmethod
+    def concatenate(cls, parts, names, k=3):
+        if not parts:
+            return cls(np.empty((0, k), dtype=np.int16), np.empty((0, k), dtype=np.uint8), names)
+        return cls(np.concatenate([part.ids for part in parts]),
+                   np.concatenate([part.percentages for part in parts]), names)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def row(self, index):
+        '''
+        The {category name: percentage} dict of a row, most probable category first
+        '''
+        return {self.names[category_id]: int(percentage)
+                for category_id, percentage in zip(self.ids[index].tolist(), self.percentages[index].tolist())}
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def top_names(self):
+        '''
+        The name of the most probable category of every row
+        '''
+        return [self.names[category_id] for category_id in self.ids[:, 0].tolist()] if len(self) else []
+
+    def highest_percentages(self):
+        return self.percentages[:, 0] if self.percentages.shape[1] else np.zeros(len(self), dtype=np.uint8)
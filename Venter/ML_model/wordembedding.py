@@ -0,0 +1,159 @@
+"""
+Process-wide word embedding provider shared by the sentence and keyword models.
+
+The MAX.bin word2vec file is parsed at most once per worker process and model. When the
+native KeyedVectors copy produced by convert_to_native() is present, it is
+memory-mapped read-only instead, so every uWSGI process shares one page-cached
+copy of the vectors rather than holding a private one. Otherwise the unit-length
+vectors of the keyword model are normalized in place, a process holding both the
+raw and the normalized table only when it also runs the sentence model.
+
+get_embedding_matrix() serves the raw vectors at the WORD_EMBEDDING_PRECISION of the
+settings (float32, float16 or int8, see quantization) to the sentence model's
+similarity engine. The float16 and int8 copies are memory-mapped from the files saved by
+convert_to_native(), along with the native vocabulary, and are refused when missing:
+quantizing in the worker would hold the float32 vectors next to the reduced ones.
+"""
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from gensim.models import KeyedVectors
+
+from Backend.settings import BASE_DIR
+
+from .quantization import PRECISIONS, QuantizedMatrix
+
+WORD_MODEL_FILE = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/MAX.bin')
+NATIVE_MODEL_FILE = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/MAX.kv')
+NATIVE_NORM_MODEL_FILE = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/MAX_norm.kv')
+# saved as MAX.float16.npy, MAX.int8.npy and MAX.int8.scales.npy
+QUANTIZED_MODEL_PREFIX = os.path.join(BASE_DIR, 'Venter/ML_model/sentence_model/MAX')
+VOCAB_LIMIT = 200000
+
+_wordmodels = {}
+_matrices = {}
+_lock = threading.RLock()
+
+
+def _unit_norms(vectors):
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    return norms[:, np.newaxis]
+
+
+def _normalized_copy(wordmodel):
+    '''
+    Returns a shallow copy of the wordmodel sharing its vocabulary,
+    with every vector scaled to unit length
+    '''
+    normalized = copy.copy(wordmodel)
+    vectors = np.asarray(wordmodel.vectors, dtype=np.float32)
+    normalized.vectors = vectors / _unit_norms(vectors)
+    normalized.vectors_norm = None
+    return normalized
+
+
+def _normalize_in_place(wordmodel):
+    '''
+    Scales every vector of a privately loaded wordmodel to unit length without copying them,
+    as gensim's init_sims(replace=True)
+    '''
+    vectors = wordmodel.vectors
+    vectors /= _unit_norms(vectors)
+    wordmodel.vectors_norm = None
+    return wordmodel
+
+
+def _load(normalized):
+    native_file = NATIVE_NORM_MODEL_FILE if normalized else NATIVE_MODEL_FILE
+    if os.path.exists(native_file):
+        return KeyedVectors.load(native_file, mmap='r')
+    if normalized and _wordmodels.get(False) is not None:
+        # the sentence model of this process reads the raw vectors, both tables are needed
+        return _normalized_copy(_wordmodels[False])
+    wordmodel = KeyedVectors.load_word2vec_format(WORD_MODEL_FILE, binary=True, limit=VOCAB_LIMIT)
+    if normalized:
+        # nothing reads the raw vectors yet, so only the normalized table is kept
+        return _normalize_in_place(wordmodel)
+    return wordmodel
+
+
+def get_wordmodel(normalized=False):
+    '''
+    Returns the word embedding of this process, loading it on first use.
+    normalized=True serves the unit-length vectors expected by the keyword model (wmdistance).
+    The returned object is shared and must be treated as read-only.
+    '''
+    wordmodel = _wordmodels.get(normalized)
+    if wordmodel is None:
+        with _lock:
+            wordmodel = _wordmodels.get(normalized)
+            if wordmodel is None:
+                st = time.time()
+                wordmodel = _load(normalized)
+                et = time.time()
+                print('Word embedding (normalized=%s) loaded in %f secs.' % (normalized, et-st))
+                _wordmodels[normalized] = wordmodel
+    return wordmodel
+
+
+def get_embedding_matrix(precision=None):
+    '''
+    Returns the raw vectors of get_wordmodel() as a QuantizedMatrix, rows being those of
+    the wordmodel vocabulary indices. precision defaults to the WORD_EMBEDDING_PRECISION setting.
+    '''
+    if precision is None:
+        precision = settings.WORD_EMBEDDING_PRECISION
+    matrix = _matrices.get(precision)
+    if matrix is None:
+        with _lock:
+            matrix = _matrices.get(precision)
+            if matrix is None:
+                st = time.time()
+                quantized_file = '%s.%s' % (QUANTIZED_MODEL_PREFIX, precision)
+                if precision == 'float32':
+                    matrix = QuantizedMatrix(get_wordmodel().vectors)
+                elif os.path.exists(quantized_file + '.npy') and os.path.exists(NATIVE_MODEL_FILE):
+                    matrix = QuantizedMatrix.load(quantized_file)
+                else:
+                    raise ImproperlyConfigured(
+                        'The %s word embedding is missing, run "python manage.py convert_word_embedding".' % precision)
+                et = time.time()
+                print('Word embedding matrix (%s, %d bytes) loaded in %f secs.' % (precision, matrix.nbytes, et-st))
+                _matrices[precision] = matrix
+    return matrix
+
+
+def embedding_version(precision=None):
+    '''
+    Identifies the word vectors served by get_embedding_matrix(precision),
+    changing whenever the embedding file, the vocabulary limit or the precision does
+    '''
+    if precision is None:
+        precision = settings.WORD_EMBEDDING_PRECISION
+    source = NATIVE_MODEL_FILE if os.path.exists(NATIVE_MODEL_FILE) else WORD_MODEL_FILE
+    stat = os.stat(source)
+    return '%s:%d:%d:%d:%s' % (os.path.basename(source), stat.st_size, int(stat.st_mtime), VOCAB_LIMIT, precision)
+
+
+def convert_to_native():
+    '''
+    Saves the raw and the normalized vectors in gensim's native format,
+    keeping the arrays in separate .npy files so that they can be memory-mapped,
+    along with the float16 and int8 copies of the raw vectors
+    '''
+    wordmodel = KeyedVectors.load_word2vec_format(WORD_MODEL_FILE, binary=True, limit=VOCAB_LIMIT)
+    wordmodel.save(NATIVE_MODEL_FILE, sep_limit=0)
+    _normalized_copy(wordmodel).save(NATIVE_NORM_MODEL_FILE, sep_limit=0)
+    paths = [NATIVE_MODEL_FILE, NATIVE_NORM_MODEL_FILE]
+    for precision in PRECISIONS:
+        if precision != 'float32':
+            quantized_file = '%s.%s' % (QUANTIZED_MODEL_PREFIX, precision)
+            QuantizedMatrix.from_array(wordmodel.vectors, precision).save(quantized_file)
+            paths.append(quantized_file + '.npy')
+    return paths
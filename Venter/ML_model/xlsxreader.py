@@ -0,0 +1,114 @@
+"""
+Streaming reader of the Civis response workbooks.
+
+The sheets are walked row by row with a read-only openpyxl workbook, so memory stays
+flat whatever the number of rows, instead of loading the whole sheet in a DataFrame.
+
+'Form responses 1' sheets have two header rows: the domain names on the first one,
+over a (Your Satisfaction, Your Feedback) pair of columns per domain on the second one.
+The domain columns are preceded by the timestamp and domain choice columns, and followed
+by three contact columns.
+"""
+import time
+
+from openpyxl import load_workbook
+
+SHEET_NAME = 'Form responses 1'
+LEADING_COLUMNS = 2
+TRAILING_COLUMNS = 3
+
+
+def _width(row):
+    '''
+    Number of columns of a row up to its last non-empty cell
+    '''
+    width = 0
+    for column, value in enumerate(row):
+        if value not in (None, ''):
+            width = column + 1
+    return width
+
+
+def feedback_columns(domain_row, header_row):
+    '''
+    Returns the [(column, domain name)] of the feedback column of every domain,
+    the domain name spanning both columns of its pair as in a pandas MultiIndex header
+    '''
+    width = max(_width(domain_row), _width(header_row))
+    domains = []
+    domain = None
+    for column in range(LEADING_COLUMNS, width - TRAILING_COLUMNS):
+        if column < len(domain_row) and domain_row[column] not in (None, ''):
+            domain = str(domain_row[column])
+        if (column - LEADING_COLUMNS) % 2 == 1:
+            domains.append((column, domain))
+    return domains
+
+
+def _open_sheet(filepath, sheet_name):
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+    return workbook, sheet
+
+
+def iter_domain_responses(filepath, report=None, sheet_name=SHEET_NAME):
+    '''
+    Lazily yields the (domain name, response) pairs of a response workbook, row by row.
+    Only text cells are responses. The domain names are yielded first as (domain name, None)
+    pairs, in column order, so that domains without any response are known too.
+    Rows, responses and the parse time of the sheet are set on the report dict if given.
+    '''
+    st = time.time()
+    workbook, sheet = _open_sheet(filepath, sheet_name)
+    rows = sheet.iter_rows(values_only=True)
+    rows_read = 0
+    responses = 0
+    try:
+        domains = feedback_columns(next(rows, ()), next(rows, ()))
+        for column, domain in domains:
+            yield domain, None
+
+        for row in rows:
+            rows_read += 1
+            for column, domain in domains:
+                if column < len(row) and type(row[column]) == str:
+                    responses += 1
+                    yield domain, row[column]
+    finally:
+        workbook.close()
+        if report is not None:
+            report['sheet'] = sheet.title
+            report['rows'] = rows_read
+            report['responses'] = responses
+            report['secs'] = time.time() - st
+
+
+def iter_column(filepath, column_name, report=None, skip_rows=1):
+    '''
+    Lazily yields the text cells of the column_name column of the first sheet,
+    the header row coming after skip_rows rows.
+    Rows, responses and the parse time of the sheet are set on the report dict if given.
+    '''
+    st = time.time()
+    workbook, sheet = _open_sheet(filepath, None)
+    rows = sheet.iter_rows(values_only=True)
+    rows_read = 0
+    responses = 0
+    try:
+        for _ in range(skip_rows):
+            next(rows, None)
+        header = list(next(rows, ()))
+        column = header.index(column_name)
+
+        for row in rows:
+            rows_read += 1
+            if column < len(row) and type(row[column]) == str:
+                responses += 1
+                yield row[column]
+    finally:
+        workbook.close()
+        if report is not None:
+            report['sheet'] = sheet.title
+            report['rows'] = rows_read
+            report['responses'] = responses
+            report['secs'] = time.time() - st
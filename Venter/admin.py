@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from Venter.models import Category, File, Header, Organisation, Profile, Proposal, Domain, Keyword
+from Venter.models import Category, File, Header, Organisation, Profile, Proposal, Domain, Keyword, PredictionJob
 
 
 class HeaderAdmin(admin.ModelAdmin):
@@ -36,6 +36,11 @@ class KeywordAdmin(admin.ModelAdmin):
     list_filter = ['domain_name']
     verbose_name_plural = 'Keywords'
 
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ('file', 'state', 'progress', 'created_date', 'model_secs', 'materialize_secs', 'cache_hit')
+    list_filter = ['state', 'cache_hit']
+    verbose_name_plural = 'Prediction Jobs'
+
 
 admin.site.register(Header, HeaderAdmin)
 admin.site.register(Category, CategoryAdmin)
@@ -45,3 +50,4 @@ admin.site.register(Organisation, OrganisationAdmin)
 admin.site.register(Proposal, ProposalAdmin)
 admin.site.register(Domain, DomainAdmin)
 admin.site.register(Keyword, KeywordAdmin)
+admin.site.register(PredictionJob, PredictionJobAdmin)
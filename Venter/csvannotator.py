@@ -0,0 +1,137 @@
+"""
+Streaming annotation of the ICMC complaint csv files.
+
+The results__<file name>.csv output is the input csv with a Predicted_Category column
+prepended, written row by row while the input is read once. The categories set by the
+users on prediction_table.html are not written back into it: they are saved to the
+results__<file name>.corrections.json sidecar, holding the category names once and the
+ids of the categories of every corrected row,
+
+    {"categories": ["Garbage", "Roads"], "rows": {"12": [1], "40": [0, 1]}}
+
+so that a save only touches the changed rows. The corrections are applied to the csv
+while it is streamed to the user on download.
+"""
+import csv
+import json
+import os
+import tempfile
+
+CATEGORY_COLUMN = 'Predicted_Category'
+CORRECTIONS_EXTENSION = 'corrections.json'
+ENCODING = 'utf-8-sig'
+
+
+def format_categories(names):
+    """
+    Returns the Predicted_Category cell of a row, the list of its category names
+    as written by pandas and read back with literal_eval
+    """
+    return str(list(names))
+
+
+def _rows(infile):
+    # blank lines are skipped, as by pandas, the row indices being the ones of the .json output
+    for row in csv.reader(infile):
+        if row:
+            yield row
+
+
+def annotated_rows(input_path, categories):
+    """
+    Yields the rows of the input csv with their category cell prepended, categories holding
+    the cell of every row. A Predicted_Category column of the input is replaced.
+    """
+    with open(input_path, 'r', encoding=ENCODING, newline='') as infile:
+        rows = _rows(infile)
+        header = next(rows, None)
+        if header is None:
+            return
+        drop = header.index(CATEGORY_COLUMN) if CATEGORY_COLUMN in header else None
+        yield [CATEGORY_COLUMN] + [cell for column, cell in enumerate(header) if column != drop]
+        for row, category in zip(rows, categories):
+            yield [category] + [cell for column, cell in enumerate(row) if column != drop]
+
+
+def _write_atomic(path, write, encoding=ENCODING):
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'w', encoding=encoding, newline='') as temp:
+        write(temp)
+    # readable like the other outputs, mkstemp creating the file for its owner only
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+def write_annotated(input_path, output_path, top_names):
+    """
+    Writes the input csv at output_path with the most probable category of every row prepended
+    """
+    categories = (format_categories([name]) for name in top_names)
+    _write_atomic(output_path, lambda temp: csv.writer(temp, lineterminator='\n').writerows(
+        annotated_rows(input_path, categories)))
+
+
+def load_corrections(path):
+    """
+    Returns the {row index: [category names]} corrections saved at path, {} if none
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as content:
+        corrections = json.load(content)
+    names = corrections['categories']
+    return {int(row): [names[category_id] for category_id in ids] for row, ids in corrections['rows'].items()}
+
+
+def save_corrections(path, changed):
+    """
+    Merges the {row index: [category names]} of the changed rows into the corrections saved at path
+    """
+    corrections = load_corrections(path)
+    corrections.update(changed)
+
+    names = []
+    category_ids = {}
+    rows = {}
+    for row in sorted(corrections):
+        ids = []
+        for name in corrections[row]:
+            if name not in category_ids:
+                category_ids[name] = len(names)
+                names.append(name)
+            ids.append(category_ids[name])
+        rows[str(row)] = ids
+    _write_atomic(path, lambda temp: json.dump({'categories': names, 'rows': rows}, temp), 'utf-8')
+
+
+def corrected_rows(output_path, corrections):
+    """
+    Yields the rows of the annotated csv at output_path, the category cell of the
+    corrected rows being replaced by their {row index: [category names]} corrections
+    """
+    with open(output_path, 'r', encoding=ENCODING, newline='') as infile:
+        rows = _rows(infile)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield header
+        for index, row in enumerate(rows):
+            if index in corrections:
+                row[0] = format_categories(corrections[index])
+            yield row
+
+
+class _Echo:
+    # file-like object handing back the lines formatted by csv.writer
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """
+    Yields the csv lines of rows, preceded by the byte order mark, for a StreamingHttpResponse
+    """
+    writer = csv.writer(_Echo(), lineterminator='\n')
+    yield '\ufeff'
+    for row in rows:
+        yield writer.writerow(row)
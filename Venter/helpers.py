@@ -1,6 +1,9 @@
 """Helper functions for Venter modules."""
 import os
 from datetime import date
+
+from Backend.settings import MEDIA_ROOT
+
 def get_file_upload_path(instance, filename):
     """
     Returns a custom MEDIA path for files uploaded by a user
@@ -24,3 +27,19 @@ def get_user_profile_picture_path(instance, filename):
     """
     return os.path.join(
         f'User Profile Picture/{instance.organisation_name}/{instance.user.username}/{filename}')
+
+def get_output_directory_path(instance):
+    """
+    Returns the MEDIA directory holding the prediction outputs of an uploaded file
+    Eg: /media/xyz/user1/2019-02-06/output
+    """
+    return os.path.join(
+        MEDIA_ROOT, f'{instance.uploaded_by.organisation_name}/{instance.uploaded_by.user.username}/{instance.uploaded_date.date()}/output')
+
+def get_result_file_path(instance, extension):
+    """
+    Returns the path of a prediction output file of an uploaded file
+    Eg: /media/xyz/user1/2019-02-06/output/results__file1.json
+    """
+    custom_input_file_name = os.path.splitext(instance.filename)[0]
+    return os.path.join(get_output_directory_path(instance), f'results__{custom_input_file_name}.{extension}')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from Venter.ML_model.ICMC.model import artifacts
+
+
+class Command(BaseCommand):
+    """
+    Compiles the ICMC word index map and word vector pickles into the normalized float32 .npy
+    embedding, vocabulary file and checksum manifest loaded by the ICMC ImportGraph, along with
+    the float16 and int8 copies of the trained embedding of the checkpoint.
+
+    Usage: python manage.py compile_model_artifacts
+    """
+    help = 'Compiles the ICMC pickles into validated, memory-mappable model artifacts'
+
+    def handle(self, *args, **options):
+        for path in list(artifacts.compile_artifacts()) + artifacts.compile_quantized_embeddings():
+            self.stdout.write(self.style.SUCCESS('Saved %s' % path))
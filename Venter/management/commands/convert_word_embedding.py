@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Venter.ML_model import wordembedding
+
+
+class Command(BaseCommand):
+    """
+    Converts the MAX.bin word2vec file used by the sentence and keyword models into
+    gensim's native format, so that worker processes memory-map it instead of parsing it.
+
+    Usage: python manage.py convert_word_embedding
+    """
+    help = 'Converts MAX.bin into memory-mappable native KeyedVectors files'
+
+    def handle(self, *args, **options):
+        for path in wordembedding.convert_to_native():
+            self.stdout.write(self.style.SUCCESS('Saved %s' % path))
@@ -0,0 +1,30 @@
+# Generated by Django 2.1.2 on 2026-10-18 12:00
+
+import json
+
+from django.db import migrations, models
+
+
+def tokenize_keywords(apps, schema_editor):
+    from Venter.ML_model.textnormalizer import tokenize
+
+    Keyword = apps.get_model('Venter', 'Keyword')
+    for keyword in Keyword.objects.all():
+        keyword.tokens = json.dumps({'keyword': keyword.keyword, 'tokens': tokenize(keyword.keyword)})
+        keyword.save(update_fields=['tokens'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Venter', '0049_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keyword',
+            name='tokens',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(tokenize_keywords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.1.2 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Venter', '0050_keyword_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='prediction_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='predictionjob',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.2 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Venter', '0051_prediction_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='model_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
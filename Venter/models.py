@@ -1,3 +1,4 @@
+import json
 import os
 <<<<<<< HEAD
 from datetime import date, datetime
@@ -210,10 +211,40 @@ class Keyword(models.Model):
     keyword = models.CharField(
         max_length=200
     )
+    # JSON {"keyword": text, "tokens": [...]} of the keyword's non-stopword tokens and the text
+    # they were computed from, refreshed on every save and read by the keyword model
+    tokens = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+    )
 
     def __str__(self):
         return self.keyword
 
+    def save(self, *args, **kwargs):
+        """
+        Tokenizes the keyword as the keyword model does before saving it,
+        so that an edited keyword never keeps the tokens of its former text
+        """
+        from .ML_model.textnormalizer import tokenize
+        self.tokens = json.dumps({'keyword': self.keyword, 'tokens': tokenize(self.keyword)})
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'keyword' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'tokens'}
+        super().save(*args, **kwargs)
+
+    def get_tokens(self):
+        """
+        Returns the stored tokens as a tuple, tokenizing the keyword instead when they
+        are missing or were computed from another text (rows changed with QuerySet.update())
+        """
+        stored = json.loads(self.tokens) if self.tokens else None
+        if not isinstance(stored, dict) or stored['keyword'] != self.keyword:
+            from .ML_model.textnormalizer import tokenize
+            return tokenize(self.keyword)
+        return tuple(stored['tokens'])
+
     class Meta:
         """
         Declares a plural name for Domain model
@@ -266,6 +297,17 @@ class File(models.Model):
     output_file_json = models.FileField(blank=True, max_length=255)
     output_file_xlsx = models.FileField(blank=True, max_length=255)
     wordcloud_data = models.FileField(blank=True, max_length=255)
+    # identify the input content and model the outputs were predicted from, see Venter.predictioncache
+    prediction_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+    )
+    model_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+    )
     proposal = models.ForeignKey(
         Proposal,
         on_delete=models.SET_NULL,
@@ -308,3 +350,83 @@ class File(models.Model):
         """
         verbose_name_plural = 'File'
         ordering = ["-uploaded_date"]
+
+
+class PredictionJob(models.Model):
+    """
+    A background prediction run of an uploaded File, executed by the predict_runner Celery task.
+    Eg: file_1 is queued when first viewed, then running, then done once its outputs are saved
+
+    # Create a job instance
+    >>> PredictionJob.objects.create(file=file_1)
+
+    Timings------
+        1) model_secs: time spent running the ML model
+        2) materialize_secs: time spent writing the .json and .xlsx/.csv outputs
+    cache_hit is set when the outputs were copied from an identical earlier prediction instead
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATE_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    ACTIVE_STATES = (QUEUED, RUNNING)
+
+    file = models.ForeignKey(
+        File,
+        on_delete=models.CASCADE,
+        related_name='prediction_jobs',
+    )
+    state = models.CharField(
+        max_length=10,
+        choices=STATE_CHOICES,
+        default=QUEUED,
+    )
+    progress = models.PositiveSmallIntegerField(
+        default=0
+    )
+    task_id = models.CharField(
+        max_length=255,
+        blank=True,
+    )
+    error = models.TextField(
+        blank=True
+    )
+    created_date = models.DateTimeField(
+        default=datetime.now
+    )
+    started_date = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    finished_date = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    model_secs = models.FloatField(
+        null=True,
+        blank=True,
+    )
+    materialize_secs = models.FloatField(
+        null=True,
+        blank=True,
+    )
+    cache_hit = models.BooleanField(
+        default=False,
+    )
+
+    def __str__(self):
+        return f'{self.file.filename} ({self.state})'
+
+    class Meta:
+        """
+        Displays the latest job of a file first.
+        Declares a plural name for PredictionJob model
+        """
+        verbose_name_plural = 'Prediction Job'
+        ordering = ["-created_date", "-id"]
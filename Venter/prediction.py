@@ -0,0 +1,200 @@
+"""
+Prediction pipeline run outside of the web request, by the predict_runner Celery task.
+
+Runs the ML model of the uploaded file and materializes its outputs at the
+results__<file name>.json / .jsonl / .csv paths read by the views (the .xlsx
+output of CIVIS files is written on its first download), updating
+the PredictionJob state, progress and timings along the way. The outputs of
+an identical earlier prediction are copied instead, see predictioncache.
+"""
+import json
+import os
+import time
+import traceback
+from datetime import datetime
+
+import pandas as pd
+from django.conf import settings
+
+from Venter.helpers import get_output_directory_path, get_result_file_path
+from Venter import csvannotator, predictioncache, resultstore, wordcloud
+from Venter.models import Domain, Keyword, PredictionJob
+
+from .ML_model import modelregistry
+from .ML_model.keyword_model.modeldriver import KeywordSimilarityMapping
+from .ML_model.sentence_model.modeldriver import SimilarityMapping
+
+
+def set_progress(job, progress, **fields):
+    """
+    Saves the progress (0-100) of a job, along with any other changed field
+    """
+    job.progress = progress
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=['progress'] + list(fields))
+
+
+def get_domain_keyword_dict(proposal):
+    """
+    Returns the {domain name: {keyword: tokens}} dictionary of a proposal, fed to the keyword model,
+    the keywords being tokenized once when saved rather than on every prediction
+    """
+    domain_keyword_dict = {}
+    for domain_obj in Domain.objects.filter(proposal_name=proposal):
+        keyword_tokens = {}
+        for keyword_obj in Keyword.objects.filter(domain_name=domain_obj).order_by('keyword'):
+            keyword_tokens[keyword_obj.keyword] = keyword_obj.get_tokens()
+        domain_keyword_dict[domain_obj.domain_name] = keyword_tokens
+    return domain_keyword_dict
+
+
+def load_previous_results(previous):
+    """
+    Returns the .json output of an earlier predicted File, reused by the incremental mode
+    """
+    with open(previous.output_file_json.path, 'r') as content:
+        return json.load(content)
+
+
+def predict_civis(job, domain_keyword_dict=None, previous_results=None):
+    """
+    Runs the sentence/keyword model of a CIVIS file and saves the .json output and its segmented copy,
+    along with the word cloud frequencies, the .xlsx output being written on its first download, see resultexport.
+    previous_results, the output of an earlier prediction, is merged with the newly scored responses.
+    """
+    filemeta = job.file
+    model_choice = filemeta.model_choice
+
+    st = time.time()
+    if model_choice == 'sentence_model':
+        sm = SimilarityMapping(filemeta.input_file.path, previous_results)
+    elif model_choice == 'keyword_model':
+        if domain_keyword_dict is None:
+            domain_keyword_dict = get_domain_keyword_dict(filemeta.proposal)
+        sm = KeywordSimilarityMapping(filemeta.input_file.path, bool(filemeta.domain_present), domain_keyword_dict, previous_results)
+    dict_data = sm.driver()
+    set_progress(job, 70, model_secs=time.time() - st)
+
+    st = time.time()
+    output_file_path_json = get_result_file_path(filemeta, 'json')
+    output_file_path_xlsx = get_result_file_path(filemeta, 'xlsx')
+
+    with open(output_file_path_json, 'w') as temp:
+        json.dump(dict_data, temp)
+    # the noun frequencies of the word cloud are saved with the segmented results
+    frequencies = wordcloud.generate_frequencies(dict_data)
+    resultstore.write_segments(dict_data, get_result_file_path(filemeta, resultstore.EXTENSION), model_choice, frequencies)
+    print('JSON output saved.')
+    set_progress(job, 85)
+    print('Done.')
+
+    filemeta.output_file_json = output_file_path_json
+    filemeta.output_file_xlsx = output_file_path_xlsx
+    filemeta.has_prediction = bool(dict_data)
+    filemeta.save()
+    if not filemeta.has_prediction:
+        raise ValueError('The model returned no prediction for this file')
+    job.materialize_secs = time.time() - st
+
+
+def predict_icmc(job):
+    """
+    Runs the ICMC classification model on a complaint csv and saves the .json and .csv outputs
+    """
+    filemeta = job.file
+
+    st = time.time()
+    input_file_path = filemeta.input_file.path
+    csvfile = pd.read_csv(input_file_path, sep=',', header=0, encoding='utf-8-sig')
+    csvfile.columns = [col.strip() for col in csvfile.columns]
+
+    complaint_description = list(csvfile['complaint_description'])
+    ward_name = list(csvfile['ward_name'])
+    date_created = [x.split(' ')[0] for x in list(csvfile['complaint_created'])]
+
+    batches = []
+    for done, results in modelregistry.iter_top_3_cats_with_prob('ICMC', complaint_description):
+        batches.append(results)
+        set_progress(job, 5 + 65 * done // max(len(complaint_description), 1))
+    cats = modelregistry.get_model('ICMC').join_results(batches)
+    set_progress(job, 70, model_secs=time.time() - st)
+
+    st = time.time()
+    output_file_path_json = get_result_file_path(filemeta, 'json')
+    output_file_path_csv = get_result_file_path(filemeta, 'csv')
+
+    #the row dicts are rendered one at a time from the compact predictions
+    highest_confidence = cats.highest_percentages().tolist()
+    with open(output_file_path_json, 'w') as temp:
+        temp.write('[')
+        for position, (index, complaint, ward, date) in enumerate(zip(csvfile.index.tolist(), complaint_description, ward_name, date_created)):
+            row_dict = {}
+            row_dict['index'] = index
+            row_dict['problem_description'] = complaint
+            row_dict['category'] = cats.row(position)
+            row_dict['highest_confidence'] = highest_confidence[position]
+            row_dict['ward_name'] = ward
+            row_dict['date_created'] = date
+            temp.write((', ' if position else '') + json.dumps(row_dict))
+        temp.write(']')
+    print('JSON output saved.')
+    set_progress(job, 85)
+
+    #the input is read once, row by row, with the predicted category prepended
+    csvannotator.write_annotated(input_file_path, output_file_path_csv, cats.top_names())
+    print('Done.')
+
+    filemeta.output_file_json = output_file_path_json
+    filemeta.output_file_xlsx = output_file_path_csv
+    filemeta.has_prediction = bool(len(cats))
+    filemeta.save()
+    if not filemeta.has_prediction:
+        raise ValueError('The model returned no prediction for this file')
+    job.materialize_secs = time.time() - st
+
+
+def run_prediction(job):
+    """
+    Runs a queued PredictionJob to completion, recording failures on the job
+    """
+    set_progress(job, 5, state=PredictionJob.RUNNING, started_date=datetime.now())
+
+    output_directory_path = get_output_directory_path(job.file)
+    if not os.path.exists(output_directory_path):
+        os.makedirs(output_directory_path)
+
+    try:
+        filemeta = job.file
+        domain_keyword_dict = None
+        if not predictioncache.is_icmc(filemeta) and filemeta.model_choice == 'keyword_model':
+            domain_keyword_dict = get_domain_keyword_dict(filemeta.proposal)
+
+        # an identical file predicted by the same model version gets a copy of its outputs
+        model_key = predictioncache.model_key(filemeta, domain_keyword_dict)
+        key = predictioncache.prediction_key(filemeta, model_key)
+        source = predictioncache.find_source(filemeta, key)
+        if source is not None:
+            predictioncache.reuse(job, source)
+        elif predictioncache.is_icmc(filemeta):
+            predict_icmc(job)
+        else:
+            # an earlier file of the same responses sheet only leaves its new responses to score
+            previous_results = None
+            if settings.INCREMENTAL_PREDICTION:
+                previous = predictioncache.find_previous(filemeta, model_key)
+                if previous is not None:
+                    print('Reusing the categorized responses of %s.' % previous.filename)
+                    previous_results = load_previous_results(previous)
+            predict_civis(job, domain_keyword_dict, previous_results)
+        filemeta.prediction_key = key
+        filemeta.model_key = model_key
+        filemeta.save(update_fields=['prediction_key', 'model_key'])
+    except Exception:
+        job.state = PredictionJob.FAILED
+        job.error = traceback.format_exc()
+    else:
+        job.state = PredictionJob.DONE
+        job.progress = 100
+    job.finished_date = datetime.now()
+    job.save()
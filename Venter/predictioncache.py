@@ -0,0 +1,184 @@
+"""
+Content-addressed reuse of prediction outputs.
+
+The prediction of an uploaded file is identified by a key hashing the content of its
+input file, the model it runs (ICMC, or the CIVIS model_choice and domain_present),
+the version of that model and, for the keyword model, the keywords of its proposal.
+The key is saved on the File once predicted. When a file with the same key has already
+been predicted, run_prediction copies its .json (and ICMC .csv) outputs to the result
+paths of the new file instead of running the model, and flags the job as a cache hit.
+The key of the model alone is saved as well, so that a CIVIS file predicted by the same
+model can be found by find_previous() and its responses reused incrementally.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from django.conf import settings
+
+from Venter import resultstore
+from Venter.helpers import get_result_file_path
+from Venter.models import File, PredictionJob
+
+# bumped whenever the layout of the .json/.xlsx/.csv outputs changes
+OUTPUT_VERSION = 1
+CHECKSUM_CHUNK = 1 << 20
+# latest files looked at by find_previous
+PREVIOUS_CANDIDATES = 5
+SENTENCE_PATH = os.path.join(settings.BASE_DIR, 'Venter/ML_model/sentence_model/data/sentences/')
+ICMC_CHECKPOINT_INDEX = os.path.join(settings.BASE_DIR, 'Venter/ML_model/ICMC/model/model.ckpt.index')
+
+
+def file_digest(path):
+    """
+    Returns the sha256 hex digest of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(CHECKSUM_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_icmc(filemeta):
+    return str(filemeta.uploaded_by.organisation_name) == 'ICMC'
+
+
+def model_type(filemeta):
+    """
+    The model run on a file, along with the options changing its output
+    """
+    if is_icmc(filemeta):
+        return 'ICMC'
+    return '%s:domain_present=%s' % (filemeta.model_choice, bool(filemeta.domain_present))
+
+
+def model_version(filemeta):
+    """
+    Identifies the trained data of the model run on a file: the checkpoint and compiled
+    artifacts of ICMC, the word embedding (and category sentences) of the CIVIS models
+    """
+    # imported here so that the web processes never import the ML models
+    if is_icmc(filemeta):
+        from Venter.ML_model.ICMC.model.artifacts import MANIFEST_FILE
+
+        parts = [settings.ICMC_EMBEDDING_PRECISION]
+        for path in (ICMC_CHECKPOINT_INDEX, MANIFEST_FILE):
+            parts.append(file_digest(path) if os.path.exists(path) else '')
+        return ':'.join(parts)
+
+    from Venter.ML_model import wordembedding
+
+    parts = [wordembedding.embedding_version()]
+    if filemeta.model_choice == 'sentence_model':
+        for filename in sorted(os.listdir(SENTENCE_PATH)):
+            parts.append('%s=%s' % (filename, file_digest(os.path.join(SENTENCE_PATH, filename))))
+    return ':'.join(parts)
+
+
+def keyword_hash(domain_keyword_dict):
+    """
+    Hashes the {domain: {keyword: tokens}} dictionary of a proposal, see prediction.get_domain_keyword_dict
+    """
+    keywords = {domain: sorted(keyword_tokens) for domain, keyword_tokens in domain_keyword_dict.items()}
+    return hashlib.sha256(json.dumps(keywords, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def model_key(filemeta, domain_keyword_dict=None):
+    """
+    Returns the key of the model run on a file, whatever its content,
+    domain_keyword_dict being required by the keyword model
+    """
+    parts = [
+        OUTPUT_VERSION,
+        model_type(filemeta),
+        model_version(filemeta),
+        keyword_hash(domain_keyword_dict) if domain_keyword_dict is not None else '',
+    ]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+def prediction_key(filemeta, key_of_model):
+    """
+    Returns the key of the prediction of a file by the model of key_of_model, see model_key
+    """
+    parts = [key_of_model, file_digest(filemeta.input_file.path)]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+def output_paths(filemeta):
+    # the .xlsx output of CIVIS files is written from the .json one on its first download
+    if is_icmc(filemeta):
+        return [filemeta.output_file_json.path, filemeta.output_file_xlsx.path]
+    return [filemeta.output_file_json.path]
+
+
+def find_source(filemeta, key):
+    """
+    Returns the latest other File predicted with the same key whose outputs are still
+    in file storage, or None. Files whose categories were edited by their users are skipped.
+    """
+    candidates = File.objects.filter(prediction_key=key, has_prediction=True, file_saved_status=False) \
+        .exclude(pk=filemeta.pk).order_by('-uploaded_date')
+    for source in candidates:
+        if source.output_file_json and source.output_file_xlsx and all(os.path.exists(path) for path in output_paths(source)):
+            return source
+    return None
+
+
+def find_previous(filemeta, key_of_model):
+    """
+    Returns the latest other File of the same organisation and proposal predicted by the same
+    model whose .json output is still in file storage, or None. Its categorized responses are
+    reused by the incremental mode of the CIVIS models, see SimilarityMapping.
+    """
+    candidates = File.objects.filter(
+        model_key=key_of_model, has_prediction=True, file_saved_status=False, proposal=filemeta.proposal,
+        uploaded_by__organisation_name=filemeta.uploaded_by.organisation_name) \
+        .exclude(pk=filemeta.pk).order_by('-uploaded_date')
+    for previous in candidates[:PREVIOUS_CANDIDATES]:
+        if previous.output_file_json and os.path.exists(previous.output_file_json.path):
+            return previous
+    return None
+
+
+def reuse(job, source):
+    """
+    Copies the outputs of the source File to the result paths of the job's file
+    """
+    filemeta = job.file
+    output_file_path_json = get_result_file_path(filemeta, 'json')
+    output_file_path_xlsx = get_result_file_path(filemeta, 'csv' if is_icmc(filemeta) else 'xlsx')
+    shutil.copyfile(source.output_file_json.path, output_file_path_json)
+    if is_icmc(filemeta):
+        shutil.copyfile(source.output_file_xlsx.path, output_file_path_xlsx)
+    else:
+        # copied after the .json output, so that it is not segmented again without its word cloud frequencies
+        segments_path = get_result_file_path(source, resultstore.EXTENSION)
+        if os.path.exists(segments_path):
+            shutil.copyfile(segments_path, get_result_file_path(filemeta, resultstore.EXTENSION))
+    print('Outputs of %s reused.' % source.filename)
+
+    filemeta.output_file_json = output_file_path_json
+    filemeta.output_file_xlsx = output_file_path_xlsx
+    filemeta.has_prediction = True
+    filemeta.save()
+    job.cache_hit = True
+
+
+def get_metrics():
+    """
+    Returns the cache hits and misses of the completed prediction jobs,
+    along with the model time spent by the misses
+    """
+    done = PredictionJob.objects.filter(state=PredictionJob.DONE)
+    hits = done.filter(cache_hit=True).count()
+    misses = done.filter(cache_hit=False).count()
+    model_secs = sum(secs for secs in done.filter(cache_hit=False).values_list('model_secs', flat=True) if secs)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+        'miss_model_secs': model_secs,
+    }
@@ -0,0 +1,85 @@
+"""
+Streamed xlsx export of the CIVIS prediction results.
+
+The results__<file name>.xlsx download holds a sheet per domain, with a (response, score)
+pair of columns per category (the response column only for the keyword model), the
+Novel responses being scored -1. It is written on its first download rather than with
+every prediction, from the segmented results: the categories of a domain are walked side
+by side one page at a time, and the rows appended to a write-only openpyxl workbook, so
+memory stays flat whatever the number of responses.
+"""
+import os
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from Venter.helpers import get_result_file_path
+from Venter.resultstore import get_result_store
+
+NOVEL_SCORE = -1
+
+
+def iter_rows(store, domain, model_choice):
+    """
+    Yields the rows of the sheet of a domain: the category header, the response/score header,
+    then one row per rank, numbered from 0, holding the response of that rank of every category
+    """
+    categories = store.categories(domain)
+    scored = model_choice != 'keyword_model'
+    columns = ['response', 'score'] if scored else ['response']
+
+    header = [None]
+    for category in categories:
+        header.extend([category] + [None] * (len(columns) - 1))
+    yield header
+    yield [None] + columns * len(categories)
+
+    responses = [store.iter_responses(domain, category) for category in categories]
+    rank = 0
+    while True:
+        row = [rank]
+        remaining = False
+        for category, iterator in zip(categories, responses):
+            entry = next(iterator, None)
+            if entry is None:
+                row.extend([None] * len(columns))
+                continue
+            remaining = True
+            row.append(ILLEGAL_CHARACTERS_RE.sub('', entry['response']))
+            if scored:
+                row.append(NOVEL_SCORE if category == 'Novel' else entry['score'])
+        if not remaining:
+            return
+        yield row
+        rank += 1
+
+
+def write_xlsx(store, path, model_choice):
+    """
+    Writes the xlsx export of the results of store at path, see iter_rows
+    """
+    workbook = Workbook(write_only=True)
+    for domain in store.domains:
+        sheet = workbook.create_sheet(domain)
+        for row in iter_rows(store, domain, model_choice):
+            sheet.append(row)
+
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(descriptor)
+    workbook.save(temp_path)
+    # readable like the other outputs, mkstemp creating the file for its owner only
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+def get_xlsx_path(filemeta):
+    """
+    Returns the path of the xlsx export of a predicted CIVIS file, writing it on first use
+    or when the .json output was predicted again since
+    """
+    path = get_result_file_path(filemeta, 'xlsx')
+    json_path = get_result_file_path(filemeta, 'json')
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(json_path):
+        write_xlsx(get_result_store(filemeta), path, filemeta.model_choice)
+    return path
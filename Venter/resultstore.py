@@ -0,0 +1,266 @@
+"""
+Segmented storage of the CIVIS prediction results.
+
+The results__<file name>.json output holds every response of every domain, which the
+result pages used to load (and send back to the browser) whole. Alongside it, the same
+results are saved as results__<file name>.jsonl:
+    1) a first line indexing every domain: its categories in order, with the byte offset,
+       byte length and response count of each category segment, the byte lengths of its
+       pages, and the sizes of the Novel sub categories of the domain
+    2) per (domain, category) segment, one line per page of PAGE_SIZE responses, in the score
+       order of the models; the pages of the Novel category hold [sub category, response] pairs
+The segments of a domain being contiguous, a domain is read with one seek and one read, and
+a page of a category with one seek and the read of a single line, whatever the category size.
+The rows of the category chart of every domain are computed once, when the results are
+saved, and kept in the index. So are the noun frequency maps of the word cloud, saved
+after the responses as one line per (domain, category), see wordcloud.generate_frequencies.
+"""
+import json
+import os
+import tempfile
+
+from Venter.helpers import get_result_file_path
+
+FORMAT_VERSION = 2
+EXTENSION = 'jsonl'
+PAGE_SIZE = 50
+
+
+def build_statistics(counts, novel, model_choice):
+    """
+    Returns the rows of the category chart of a domain from its [(category, number of responses)]
+    and its Novel sub category sizes: the header, then one row per category holding its
+    response count (for the Novel row, the sizes of its sub categories)
+    """
+    header = ['Category']
+    if model_choice == 'sentence_model':
+        header.extend('Sub category ' + str(index+1) for index in range(len(novel)))
+    elif model_choice == 'keyword_model':
+        header.append('No. of Responses')
+    header.append({'role': 'style'})
+    domain_stats = [header]
+
+    for category, count in counts:
+        category = category.split('\n')[0]
+        if model_choice == 'keyword_model' and count == 0:
+            continue
+        if category == 'Novel':
+            column = ['Novel'] + novel + ['']
+        else:
+            column = [category, count] + [0] * (len(header) - 3) + ['']
+        domain_stats.append(column)
+    return domain_stats
+
+
+def category_items(category, responses):
+    """
+    Returns the responses of a category as the flat list of its page items
+    """
+    if category == 'Novel':
+        return [[str(key), response] for key, sub_category in responses.items() for response in sub_category]
+    return responses
+
+
+def category_responses(category, items):
+    """
+    Returns the responses of a category from the flat list of its page items
+    """
+    if category != 'Novel':
+        return items
+    responses = {}
+    for key, response in items:
+        responses.setdefault(key, []).append(response)
+    return responses
+
+
+def write_segments(dict_data, path, model_choice=None, frequencies=None):
+    """
+    Saves the {domain: {category: responses}} results of the CIVIS models at path,
+    along with the chart statistics of the model_choice model and the
+    {domain: {category: noun frequency map}} of the word cloud
+    """
+    index = {}
+    segments = []
+    offset = 0
+    for domain, domain_data in dict_data.items():
+        categories = []
+        novel = []
+        for category, responses in domain_data.items():
+            items = category_items(category, responses)
+            pages = [(json.dumps(items[start:start + PAGE_SIZE]) + '\n').encode('utf-8')
+                     for start in range(0, len(items), PAGE_SIZE)]
+            length = sum(len(page) for page in pages)
+            categories.append([category, offset, length, len(responses), [len(page) for page in pages]])
+            if category == 'Novel':
+                novel = [len(sub_category) for sub_category in responses.values()]
+            segments.extend(pages)
+            offset += length
+        index[domain] = {'categories': categories, 'novel': novel}
+        if model_choice is not None:
+            counts = [(category, count) for category, _, _, count, _ in categories]
+            index[domain]['statistics'] = build_statistics(counts, novel, model_choice)
+
+    for domain, domain_frequencies in (frequencies or {}).items():
+        words = {}
+        for category, frequency in domain_frequencies.items():
+            segment = (json.dumps(frequency) + '\n').encode('utf-8')
+            words[category] = [offset, len(segment)]
+            segments.append(segment)
+            offset += len(segment)
+        index[domain]['words'] = words
+
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as temp:
+        temp.write((json.dumps({'version': FORMAT_VERSION, 'domains': index}) + '\n').encode('utf-8'))
+        for segment in segments:
+            temp.write(segment)
+    # readable like the other outputs, mkstemp creating the file for its owner only
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+class ResultStore:
+    """
+    Read access to the segmented results of a file, only the index being read on opening
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as content:
+            header = content.readline()
+        self.data_offset = len(header)
+        header = json.loads(header.decode('utf-8'))
+        self.version = header['version']
+        self.index = header['domains']
+
+    @property
+    def domains(self):
+        return list(self.index)
+
+    def categories(self, domain):
+        return [category for category, _, _, _, _ in self.index[domain]['categories']]
+
+    def counts(self, domain):
+        """
+        Returns [(category, number of responses)] of a domain, in order
+        """
+        return [(category, count) for category, _, _, count, _ in self.index[domain]['categories']]
+
+    def _category(self, domain, category):
+        for entry in self.index[domain]['categories']:
+            if entry[0] == category:
+                return entry
+        raise KeyError(category)
+
+    @staticmethod
+    def _parse(category, data):
+        items = []
+        for page in data.splitlines():
+            items.extend(json.loads(page.decode('utf-8')))
+        return category_responses(category, items)
+
+    def load_domain(self, domain):
+        """
+        Returns the {category: responses} results of one domain
+        """
+        categories = self.index[domain]['categories']
+        if not categories:
+            return {}
+        start = categories[0][1]
+        stop = categories[-1][1] + categories[-1][2]
+        with open(self.path, 'rb') as content:
+            content.seek(self.data_offset + start)
+            data = content.read(stop - start)
+        return {category: self._parse(category, data[offset - start:offset - start + length])
+                for category, offset, length, _, _ in categories}
+
+    def load_category(self, domain, category):
+        """
+        Returns the responses of one category of a domain
+        """
+        _, offset, length, _, _ = self._category(domain, category)
+        with open(self.path, 'rb') as content:
+            content.seek(self.data_offset + offset)
+            return self._parse(category, content.read(length))
+
+    def _read_page(self, content, entry, page):
+        category, offset, _, _, pages = entry
+        if not pages and page == 0:
+            return [], None
+        if not 0 <= page < len(pages):
+            raise IndexError(page)
+        content.seek(self.data_offset + offset + sum(pages[:page]))
+        items = json.loads(content.read(pages[page]).decode('utf-8'))
+        if category == 'Novel':
+            items = [{'sub_category': key, 'response': response} for key, response in items]
+        return items, (page + 1 if page + 1 < len(pages) else None)
+
+    def load_page(self, domain, category, page=0):
+        """
+        Returns the responses of one page of a category of a domain (for the Novel category,
+        {'sub_category': key, 'response': response} items) and the number of the next page,
+        None on the last one.
+        Raises IndexError for a page out of range, an empty category having a single empty page
+        """
+        entry = self._category(domain, category)
+        with open(self.path, 'rb') as content:
+            return self._read_page(content, entry, page)
+
+    def iter_responses(self, domain, category):
+        """
+        Yields the responses of a category of a domain (as in load_page), one page being read at a time
+        """
+        entry = self._category(domain, category)
+        with open(self.path, 'rb') as content:
+            page = 0
+            while page is not None:
+                items, page = self._read_page(content, entry, page)
+                yield from items
+
+    def first_pages(self, domain):
+        """
+        Returns [(category, number of responses, first page, next page)] of a domain, in order
+        """
+        cards = []
+        with open(self.path, 'rb') as content:
+            for entry in self.index[domain]['categories']:
+                items, next_page = self._read_page(content, entry, 0)
+                cards.append((entry[0], entry[3], items, next_page))
+        return cards
+
+    def frequencies(self, domain, category):
+        """
+        Returns the noun frequency map of the word cloud of a category of a domain,
+        None when the results were saved without them
+        """
+        words = self.index[domain].get('words')
+        if words is None or category not in words:
+            return None
+        offset, length = words[category]
+        with open(self.path, 'rb') as content:
+            content.seek(self.data_offset + offset)
+            return json.loads(content.read(length).decode('utf-8'))
+
+    def statistics(self, domain, model_choice):
+        """
+        Returns the rows of the category chart of a domain, see build_statistics
+        """
+        domain_index = self.index[domain]
+        if 'statistics' in domain_index:
+            return domain_index['statistics']
+        return build_statistics(self.counts(domain), domain_index['novel'], model_choice)
+
+
+def get_result_store(filemeta):
+    """
+    Returns the ResultStore of a predicted CIVIS file, segmenting its .json output
+    on first use for the files predicted before the segmented format (or an earlier version of it)
+    """
+    path = get_result_file_path(filemeta, EXTENSION)
+    json_path = get_result_file_path(filemeta, 'json')
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(json_path):
+        store = ResultStore(path)
+        if store.version == FORMAT_VERSION:
+            return store
+    with open(json_path, 'r') as content:
+        write_segments(json.load(content), path, filemeta.model_choice)
+    return ResultStore(path)
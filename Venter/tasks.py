@@ -1,8 +1,59 @@
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.db import transaction
+from kombu.exceptions import OperationalError
+
 from Backend.celery import app
-from .ML_model.sentence_model.modeldriver import SimilarityMapping
+from Venter.models import File, PredictionJob
+
+
+@worker_process_init.connect
+def warm_classification_models(**kwargs):
+    """
+    Builds the WARM_CLASSIFICATION_MODELS in every worker process as it starts
+    """
+    if settings.WARM_CLASSIFICATION_MODELS:
+        from Venter.ML_model import modelregistry
+
+        modelregistry.warm(settings.WARM_CLASSIFICATION_MODELS)
+
+
+@app.task(ignore_result=True)
+def predict_runner(job_id):
+    """
+    Runs a queued PredictionJob on the Celery worker, the outputs being written
+    to the result files of the uploaded file instead of the task result backend
+    """
+    # imported here so that the web processes never load the ML models
+    from Venter.prediction import run_prediction
+
+    job = PredictionJob.objects.select_related('file').get(pk=job_id)
+    run_prediction(job)
+
+
+def enqueue_prediction(filemeta, retry=False):
+    """
+    Returns the queued or running PredictionJob of a file, creating and sending a new one
+    to the Celery worker if there is none. The web request never waits for the model.
+    A failed job is returned as is, unless the user asked to retry it.
+    """
+    with transaction.atomic():
+        # the row lock makes concurrent requests for the same file wait for each other's job
+        locked = File.objects.select_for_update().get(pk=filemeta.pk)
+        job = filemeta.prediction_jobs.first()
+        if job is not None and (locked.has_prediction or job.state in PredictionJob.ACTIVE_STATES
+                                or (job.state == PredictionJob.FAILED and not retry)):
+            return job
+        job = PredictionJob.objects.create(file=filemeta)
 
-@app.task
-def predict_runner(filepath):
-    sm = SimilarityMapping(filepath)
-    results = sm.driver()
-    return results
+    # sent once committed, so that the worker finds the job
+    try:
+        result = predict_runner.delay(job.pk)
+    except OperationalError as error:
+        job.state = PredictionJob.FAILED
+        job.error = f'Could not reach the prediction queue: {error}'
+        job.save()
+        return job
+    job.task_id = result.id
+    job.save(update_fields=['task_id'])
+    return job
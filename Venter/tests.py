@@ -1,20 +1,39 @@
 import ast
 import json
+import multiprocessing
+import operator
 import os
+import pickle
+import shutil
+import tempfile
+from unittest import mock
 
+import numpy as np
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.models import Permission, User
 from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import IntegrityError
-from django.test import RequestFactory, TestCase, override_settings
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 from django.test.client import Client
 from django.urls import reverse
+from gensim.models import KeyedVectors
+from scipy import sparse
 
 from Backend.settings import ADMINS, BASE_DIR, MEDIA_ROOT
+from Venter import csvannotator, predictioncache, resultexport, resultstore, tasks
+from Venter.ML_model import domainpool, wordembedding
+from Venter.ML_model.benchmarks.preprocessing import LAST_INDEX, MAX_PADDED_SENTENCE_LENGTH, legacy_process_query, make_complaints
+from Venter.ML_model.ICMC.model import artifacts, preprocessing
+from Venter.ML_model.keyword_model import wmdengine
+from Venter.ML_model.quantization import QuantizedMatrix
+from Venter.ML_model.sentence_model import categorycache, novelclustering, sentencemodel, similarityengine
+from Venter.ML_model.topcategories import TopCategories
 from Venter.forms import ContactForm, CSVForm, ExcelForm, ProfileForm, UserForm
 from Venter.models import (Category, Domain, File, Header, Keyword,
-                           Organisation, Profile, Proposal)
+                           Organisation, PredictionJob, Profile, Proposal)
+from Venter.tasks import enqueue_prediction
 from Venter.views import CategoryListView
 from Venter.wordcloud import generate_wordcloud
 
@@ -333,6 +352,132 @@ class WordCloudTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, './Venter/wordcloud.html')
 
+class PredictionJobTestCase(TestCase):
+    """
+        Test case for the background prediction jobs of uploaded files
+    """
+    fixtures = ["Venter/fixtures/fixture_new_1.json"]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.login(username="admin.civis", password="pass@1234")
+        self.file = File.objects.get(pk=212)
+
+    def test_prediction_status_without_job(self):
+        response = self.client.get(reverse('prediction_status', kwargs={"pk": self.file.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['state'], None)
+
+    def test_prediction_status_of_latest_job(self):
+        PredictionJob.objects.create(file=self.file, state=PredictionJob.FAILED)
+        PredictionJob.objects.create(file=self.file, state=PredictionJob.RUNNING, progress=70)
+
+        response = self.client.get(reverse('prediction_status', kwargs={"pk": self.file.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['state'], PredictionJob.RUNNING)
+        self.assertEqual(response.json()['progress'], 70)
+        self.assertFalse(response.json()['failed'])
+
+    def test_enqueue_reuses_active_job(self):
+        job = PredictionJob.objects.create(file=self.file, state=PredictionJob.QUEUED)
+        self.assertEqual(enqueue_prediction(self.file), job)
+        self.assertEqual(PredictionJob.objects.filter(file=self.file).count(), 1)
+
+    def test_failed_job_only_retried_on_request(self):
+        self.file.has_prediction = False
+        self.file.save()
+        job = PredictionJob.objects.create(file=self.file, state=PredictionJob.FAILED)
+        self.assertEqual(enqueue_prediction(self.file), job)
+        self.assertEqual(PredictionJob.objects.filter(file=self.file).count(), 1)
+
+        with mock.patch.object(tasks.predict_runner, 'delay', return_value=mock.Mock(id='task')) as delay:
+            response = self.client.post(reverse('retry_prediction', kwargs={"pk": self.file.pk}))
+        self.assertRedirects(response, reverse('predict_result', kwargs={"pk": self.file.pk}), fetch_redirect_response=False)
+        retried = PredictionJob.objects.filter(file=self.file).first()
+        self.assertNotEqual(retried, job)
+        self.assertEqual(retried.state, PredictionJob.QUEUED)
+        delay.assert_called_once_with(retried.pk)
+
+    def test_cache_metrics(self):
+        PredictionJob.objects.create(file=self.file, state=PredictionJob.DONE, model_secs=12.0)
+        PredictionJob.objects.create(file=self.file, state=PredictionJob.DONE, cache_hit=True)
+        PredictionJob.objects.create(file=self.file, state=PredictionJob.FAILED)
+
+        metrics = predictioncache.get_metrics()
+        self.assertEqual(metrics['hits'], 1)
+        self.assertEqual(metrics['misses'], 1)
+        self.assertEqual(metrics['hit_ratio'], 0.5)
+        self.assertEqual(metrics['miss_model_secs'], 12.0)
+
+    def test_keyword_hash_ignores_keyword_order(self):
+        keywords = {'parks': {'plant trees': ('plant', 'trees'), 'clean water': ('clean', 'water')}}
+        reordered = {'parks': {'clean water': ('clean', 'water'), 'plant trees': ('plant', 'trees')}}
+        self.assertEqual(predictioncache.keyword_hash(keywords), predictioncache.keyword_hash(reordered))
+        self.assertNotEqual(predictioncache.keyword_hash(keywords), predictioncache.keyword_hash({'parks': {'plant trees': ('plant', 'trees')}}))
+
+
+class PredictionCacheTestCase(TestCase):
+    """
+        Test case for the reuse of the outputs of identical earlier predictions
+    """
+    fixtures = ["Venter/fixtures/fixture_new_1.json"]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.media = override_settings(MEDIA_ROOT=self.directory)
+        self.media.enable()
+        for name in ('input.xlsx', 'results.json', 'results.xlsx'):
+            with open(os.path.join(self.directory, name), 'w') as outfile:
+                outfile.write(name)
+        self.file = File.objects.get(pk=212)
+        self.file.input_file.name = 'input.xlsx'
+        self.file.model_choice = 'keyword_model'
+
+    def tearDown(self):
+        self.media.disable()
+        shutil.rmtree(self.directory)
+
+    def predicted_copy(self, key):
+        source = File.objects.get(pk=212)
+        source.pk = None
+        source.input_file.name = 'input.xlsx'
+        source.output_file_json.name = 'results.json'
+        source.output_file_xlsx.name = 'results.xlsx'
+        source.prediction_key = key
+        source.save()
+        return source
+
+    def test_prediction_key_follows_input_content(self):
+        key = predictioncache.prediction_key(self.file, 'model')
+        self.assertEqual(predictioncache.prediction_key(self.file, 'model'), key)
+        self.assertNotEqual(predictioncache.prediction_key(self.file, 'other model'), key)
+        with open(self.file.input_file.path, 'a') as infile:
+            infile.write('one more response')
+        self.assertNotEqual(predictioncache.prediction_key(self.file, 'model'), key)
+
+    def test_model_key_follows_embedding_version(self):
+        with mock.patch.object(wordembedding, 'embedding_version', return_value='MAX.kv:1:1:200000:float32'):
+            key = predictioncache.model_key(self.file, {})
+            self.assertEqual(predictioncache.model_key(self.file, {}), key)
+        with mock.patch.object(wordembedding, 'embedding_version', return_value='MAX.kv:1:1:200000:int8'):
+            self.assertNotEqual(predictioncache.model_key(self.file, {}), key)
+
+    def test_find_source_hit_and_miss(self):
+        key = predictioncache.prediction_key(self.file, 'model')
+        self.assertIsNone(predictioncache.find_source(self.file, key))
+        source = self.predicted_copy(key)
+        self.assertEqual(predictioncache.find_source(self.file, key), source)
+        self.assertIsNone(predictioncache.find_source(self.file, predictioncache.prediction_key(self.file, 'other model')))
+
+        # the outputs edited by their user or removed from file storage are not reused
+        source.file_saved_status = True
+        source.save()
+        self.assertIsNone(predictioncache.find_source(self.file, key))
+        source.file_saved_status = False
+        source.save()
+        os.remove(source.output_file_json.path)
+        self.assertIsNone(predictioncache.find_source(self.file, key))
+
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
 class DashboardTestCase(TestCase):
 
@@ -1117,4 +1262,498 @@ class AddProposalTestCase(TestCase):
         self.assertEqual(response.context['final_submit'], True)
         self.assertEqual(response.context['one_save_operation'], True)
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, './Venter/add_proposal.html')     
+        self.assertTemplateUsed(response, './Venter/add_proposal.html')
+
+    def test_keyword_tokens_saved(self):
+        self.client.login(username='test_admin', password="adminadmin")
+        Proposal.objects.create(proposal_name='lmn')
+
+        valid_data = {
+            "proposal_name": 'lmn',
+            "domain_name": 'xyz',
+            "keyword_list": json.dumps(["plant more trees", " the water supply "]),
+            "final_submit": "true",
+            "one_save_operation": "True",
+        }
+        self.client.post(reverse('add_proposal'), valid_data)
+
+        keyword_obj = Keyword.objects.get(keyword='the water supply')
+        self.assertEqual(keyword_obj.get_tokens(), ('supply', 'water'))
+        self.assertEqual(Keyword.objects.get(keyword='plant more trees').get_tokens(), ('plant', 'trees'))
+
+        keyword_obj.keyword = 'clean water'
+        keyword_obj.save()
+        self.assertEqual(Keyword.objects.get(pk=keyword_obj.pk).get_tokens(), ('clean', 'water'))
+
+        # an update bypassing save() leaves stale tokens, which are not used
+        Keyword.objects.filter(pk=keyword_obj.pk).update(keyword='plant water trees')
+        self.assertEqual(Keyword.objects.get(pk=keyword_obj.pk).get_tokens(), ('plant', 'trees', 'water'))
+
+
+class SimilarityEngineTestCase(SimpleTestCase):
+    """
+            Test case for the batched sentence similarity engine
+    """
+    def setUp(self):
+        self.wordmodel = KeyedVectors(vector_size=3)
+        self.wordmodel.add(['water', 'pipeline', 'garden', 'road'], np.array([
+            [1.0, 0.0, 0.0],
+            [0.8, 0.6, 0.0],
+            [0.0, 1.0, 0.0],
+            [0.0, 0.0, 1.0]], dtype=np.float32))
+
+    def test_matches_pairwise_similarity(self):
+        scores = similarityengine.similarity_matrix(['the water pipeline'], ['water garden'], self.wordmodel)
+        expected = self.wordmodel.n_similarity(['water', 'pipeline'], ['water', 'garden'])
+        self.assertAlmostEqual(float(scores[0, 0]), float(expected), places=5)
+
+    def test_no_shared_token_scores_zero(self):
+        scores = similarityengine.similarity_matrix(['water pipeline', 'road'], ['garden', 'road'], self.wordmodel)
+        self.assertEqual(scores.shape, (2, 2))
+        self.assertEqual(float(scores[0, 0]), 0.0)
+        self.assertEqual(float(scores[0, 1]), 0.0)
+        self.assertEqual(float(scores[1, 0]), 0.0)
+        self.assertEqual(float(scores[1, 1]), 1.0)
+
+
+class CategoryCacheTestCase(SimpleTestCase):
+    """
+            Test case for the persistent cache of the category sentence embeddings
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.directory, 'cache')
+        self.category_file = os.path.join(self.directory, 'parks_c.txt')
+        with open(self.category_file, 'w', encoding='utf-8') as outfile:
+            outfile.write('water pipeline\ngarden road\n')
+        self.wordmodel = KeyedVectors(vector_size=3)
+        self.wordmodel.add(['water', 'pipeline', 'garden', 'road'], np.eye(4, 3, dtype=np.float32))
+        self.patches = [
+            mock.patch.object(categorycache, 'CACHE_PATH', self.cache_path),
+            mock.patch.dict(categorycache._embeddings, clear=True),
+            mock.patch.object(wordembedding, 'embedding_version', return_value='MAX.kv:1:1:200000:float32'),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        return categorycache.load_categories(self.category_file, self.wordmodel)
+
+    def test_entry_reused_until_invalidated(self):
+        categories, (tokens, vectors) = self.load()
+        self.assertEqual(categories, ['water pipeline', 'garden road'])
+        entries = os.listdir(self.cache_path)
+        self.assertEqual(len(entries), 1)
+
+        # a miss of the process cache reads the saved entry
+        categorycache._embeddings.clear()
+        cached_tokens, cached_vectors = self.load()[1]
+        self.assertEqual(cached_tokens, tokens)
+        self.assertTrue(np.array_equal(cached_vectors, vectors))
+        self.assertEqual(os.listdir(self.cache_path), entries)
+
+        # a changed category file replaces the stale entry
+        with open(self.category_file, 'a', encoding='utf-8') as outfile:
+            outfile.write('water garden\n')
+        self.assertEqual(len(self.load()[0]), 3)
+        changed_entries = os.listdir(self.cache_path)
+        self.assertEqual(len(changed_entries), 1)
+        self.assertNotEqual(changed_entries, entries)
+
+        # and so does a changed word embedding
+        wordembedding.embedding_version.return_value = 'MAX.kv:1:1:200000:int8'
+        self.load()
+        self.assertEqual(len(os.listdir(self.cache_path)), 1)
+        self.assertNotEqual(os.listdir(self.cache_path), changed_entries)
+
+    def test_crlf_category_file(self):
+        with open(self.category_file, 'wb') as outfile:
+            outfile.write(b'water pipeline\r\ngarden road\r\n')
+        categories, (tokens, _) = self.load()
+        self.assertEqual(categories, ['water pipeline', 'garden road'])
+        self.assertEqual(tokens, [('pipeline', 'water'), ('garden', 'road')])
+
+
+class WMDEngineTestCase(SimpleTestCase):
+    """
+            Test case for the pruned nearest keyword search of the keyword model
+    """
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.words = ['word%d' % index for index in range(40)]
+        self.wordmodel = KeyedVectors(vector_size=8)
+        self.wordmodel.add(self.words, random.randn(len(self.words), 8).astype(np.float32))
+        self.response_tokens = [tuple(random.choice(self.words, size=random.randint(1, 6), replace=False)) for _ in range(30)]
+        self.keyword_tokens = [tuple(random.choice(self.words, size=random.randint(1, 4), replace=False)) for _ in range(12)]
+
+    def test_matches_exhaustive_search(self):
+        nearest, distances, report = wmdengine.nearest_keywords(self.response_tokens, self.keyword_tokens, self.wordmodel)
+        for r, tokens in enumerate(self.response_tokens):
+            exhaustive = [self.wordmodel.wmdistance(tokens, keyword) for keyword in self.keyword_tokens]
+            self.assertEqual(nearest[r], int(np.argmin(exhaustive)))
+            self.assertAlmostEqual(distances[r], min(exhaustive))
+        self.assertLessEqual(report['exact_calls'], report['pairs'])
+
+    def test_lower_bounds_never_exceed_distance(self):
+        bounds = wmdengine.lower_bounds(self.response_tokens, self.keyword_tokens, self.wordmodel)
+        for r, tokens in enumerate(self.response_tokens):
+            for k, keyword in enumerate(self.keyword_tokens):
+                self.assertLessEqual(bounds[r, k], self.wordmodel.wmdistance(tokens, keyword) + wmdengine.LOWER_BOUND_TOLERANCE)
+
+
+class NovelClusteringTestCase(SimpleTestCase):
+    """
+            Test case for the best neighbour search of the Novel sub-categorization
+    """
+    def setUp(self):
+        self.vectors = np.array([
+            [1.0, 0.0],
+            [0.8, 0.6],
+            [0.0, 1.0],
+            [0.6, 0.8]], dtype=np.float32)
+        # responses 0, 1 and 3 share a token, response 2 shares none
+        self.incidence = sparse.csr_matrix(np.array([
+            [1, 0],
+            [1, 0],
+            [0, 1],
+            [1, 0]], dtype=np.float32))
+
+    def test_exact_best_neighbours(self):
+        best = novelclustering.exact_best_neighbours(self.vectors, self.incidence)
+        self.assertEqual(list(best), [1, 3, -1, 1])
+
+    def test_lsh_agrees_with_exact_on_small_input(self):
+        best = novelclustering.lsh_best_neighbours(self.vectors, self.incidence, tables=16, bits=1, bucket_size=4)
+        self.assertEqual(list(best), [1, 3, -1, 1])
+
+    def test_best_neighbours_of_new_responses(self):
+        best = novelclustering.exact_best_neighbours_of(self.vectors, self.incidence, np.arange(2, 4))
+        self.assertEqual(list(best), [-1, 1])
+
+    def test_split_previous(self):
+        previous_domain = {
+            'parks': [{'response': '1- more parks\n', 'score': 80}, {'response': '4- edited\n', 'score': 50}],
+            'Novel': {'0': ['2- a\n', '3- b\n']},
+        }
+        responses = ['1- more parks\n', '2- a\n', '3- b\n', '4- edited again\n', '5- new\n']
+        kept, novel_groups, new_responses = sentencemodel.split_previous(previous_domain, ['parks', 'roads'], responses)
+        self.assertEqual(kept, {'parks': [{'response': '1- more parks\n', 'score': 80}], 'roads': []})
+        self.assertEqual(novel_groups, [['2- a\n', '3- b\n']])
+        self.assertEqual(new_responses, ['4- edited again\n', '5- new\n'])
+
+
+class DomainPoolTestCase(SimpleTestCase):
+    """
+            Test case for the domain-parallel categorization pool
+    """
+    def test_map_domains_keeps_order(self):
+        arguments = [(domain, domain) for domain in range(5)]
+        self.assertEqual(domainpool.map_domains(operator.mul, arguments, workers=2), [0, 1, 4, 9, 16])
+
+    def test_map_domains_in_daemonic_process(self):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest('needs the fork start method')
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+
+        def run():
+            # a daemonic process, as the Celery prefork children, still starts the pool
+            results.put(domainpool.map_domains(operator.mul, [(domain, 2) for domain in range(3)], workers=2))
+
+        process = context.Process(target=run, daemon=True)
+        process.start()
+        self.assertEqual(results.get(timeout=30), [0, 2, 4])
+        process.join()
+
+    @override_settings(CATEGORIZATION_WORKERS=0)
+    def test_zero_workers_uses_every_core(self):
+        self.assertEqual(domainpool.get_workers(), multiprocessing.cpu_count())
+
+
+class ResultStoreTestCase(SimpleTestCase):
+    """
+            Test case for the segmented storage of the CIVIS results
+    """
+    def setUp(self):
+        self.dict_data = {
+            'water': {
+                'leaks\n': [{'response': '1- leaking pipes', 'score': 50}],
+                'pipes': [],
+                'Novel': {'0': ['2- more tankers', '3- tankers'], '1': ['4- meters']},
+            },
+            'parks': {'trees': [{'response': '1- plant trees', 'score': 80}]},
+        }
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results__test.jsonl')
+        resultstore.write_segments(self.dict_data, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_domain(self):
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(store.domains, ['water', 'parks'])
+        self.assertEqual(store.load_domain('water'), self.dict_data['water'])
+        self.assertEqual(store.load_domain('parks'), self.dict_data['parks'])
+        self.assertEqual(store.load_category('water', 'Novel'), self.dict_data['water']['Novel'])
+
+    def test_load_page(self):
+        responses = [{'response': '%d- tankers' % index, 'score': 100 - index} for index in range(resultstore.PAGE_SIZE + 1)]
+        self.dict_data['water']['pipes'] = responses
+        resultstore.write_segments(self.dict_data, self.path)
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(store.load_page('water', 'pipes'), (responses[:-1], 1))
+        self.assertEqual(store.load_page('water', 'pipes', 1), (responses[-1:], None))
+        self.assertRaises(IndexError, store.load_page, 'water', 'pipes', 2)
+        self.assertEqual(store.load_page('water', 'Novel'), ([
+            {'sub_category': '0', 'response': '2- more tankers'},
+            {'sub_category': '0', 'response': '3- tankers'},
+            {'sub_category': '1', 'response': '4- meters'}], None))
+        self.assertEqual(store.load_category('water', 'pipes'), responses)
+        self.assertEqual(store.first_pages('parks'), [('trees', 1, self.dict_data['parks']['trees'], None)])
+
+    def test_frequencies(self):
+        frequencies = {'water': {'leaks\n': {'pipes': 100}, 'pipes': {}}}
+        resultstore.write_segments(self.dict_data, self.path, 'sentence_model', frequencies)
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(store.frequencies('water', 'leaks\n'), {'pipes': 100})
+        self.assertEqual(store.frequencies('water', 'pipes'), {})
+        self.assertIsNone(store.frequencies('parks', 'trees'))
+        self.assertEqual(store.load_domain('water'), self.dict_data['water'])
+
+    def test_statistics(self):
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(store.statistics('water', 'sentence_model'), [
+            ['Category', 'Sub category 1', 'Sub category 2', {'role': 'style'}],
+            ['leaks', 1, 0, ''],
+            ['pipes', 0, 0, ''],
+            ['Novel', 2, 1, '']])
+        self.assertEqual(store.statistics('parks', 'keyword_model'), [
+            ['Category', 'No. of Responses', {'role': 'style'}],
+            ['trees', 1, '']])
+
+    def test_statistics_saved_with_results(self):
+        resultstore.write_segments(self.dict_data, self.path, 'sentence_model')
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(store.index['water']['statistics'], store.statistics('water', 'sentence_model'))
+        self.assertEqual(store.statistics('parks', 'keyword_model'), [
+            ['Category', {'role': 'style'}],
+            ['trees', 1, '']])
+
+
+class ResultExportTestCase(SimpleTestCase):
+    """
+            Test case for the streamed xlsx export of the CIVIS results
+    """
+    def setUp(self):
+        self.dict_data = {
+            'water': {
+                'leaks': [{'response': '1- leaking pipes', 'score': 50}, {'response': '5- leaks', 'score': 20}],
+                'pipes': [],
+                'Novel': {'0': ['2- more tankers']},
+            },
+        }
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results__test.jsonl')
+        resultstore.write_segments(self.dict_data, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sentence_model_rows(self):
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(list(resultexport.iter_rows(store, 'water', 'sentence_model')), [
+            [None, 'leaks', None, 'pipes', None, 'Novel', None],
+            [None, 'response', 'score', 'response', 'score', 'response', 'score'],
+            [0, '1- leaking pipes', 50, None, None, '2- more tankers', -1],
+            [1, '5- leaks', 20, None, None, None, None]])
+
+    def test_keyword_model_rows(self):
+        store = resultstore.ResultStore(self.path)
+        self.assertEqual(list(resultexport.iter_rows(store, 'water', 'keyword_model')), [
+            [None, 'leaks', 'pipes', 'Novel'],
+            [None, 'response', 'response', 'response'],
+            [0, '1- leaking pipes', None, '2- more tankers'],
+            [1, '5- leaks', None, None]])
+
+
+class CsvAnnotatorTestCase(SimpleTestCase):
+    """
+            Test case for the streamed annotation of the ICMC csv files and their category corrections
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.directory, 'complaints.csv')
+        self.output_path = os.path.join(self.directory, 'results__complaints.csv')
+        self.corrections_path = os.path.join(self.directory, 'results__complaints.corrections.json')
+        with open(self.input_path, 'w', encoding='utf-8-sig') as infile:
+            infile.write('ward_name,complaint_description\nA,"pot, holes"\n\nB,garbage\n')
+        csvannotator.write_annotated(self.input_path, self.output_path, ['Roads', 'Garbage'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_annotated(self):
+        with open(self.output_path, 'r', encoding='utf-8-sig') as outfile:
+            self.assertEqual(outfile.read(), "Predicted_Category,ward_name,complaint_description\n"
+                                             "['Roads'],A,\"pot, holes\"\n['Garbage'],B,garbage\n")
+
+    def test_corrections_applied_on_download(self):
+        csvannotator.save_corrections(self.corrections_path, {1: ['Roads', 'Garbage']})
+        csvannotator.save_corrections(self.corrections_path, {0: ['Garbage']})
+        corrections = csvannotator.load_corrections(self.corrections_path)
+        self.assertEqual(corrections, {0: ['Garbage'], 1: ['Roads', 'Garbage']})
+        rows = list(csvannotator.corrected_rows(self.output_path, corrections))
+        self.assertEqual(rows[1][0], "['Garbage']")
+        self.assertEqual(rows[2][0], "['Roads', 'Garbage']")
+        self.assertEqual(''.join(csvannotator.iter_csv(rows[:1])), '\ufeffPredicted_Category,ward_name,complaint_description\n')
+
+    def test_removed_categories_stay_removed(self):
+        csvannotator.save_corrections(self.corrections_path, {0: ['Roads', 'Water']})
+        # the user then removes the predicted category, which is not added back on download
+        csvannotator.save_corrections(self.corrections_path, {0: ['Water']})
+        rows = list(csvannotator.corrected_rows(self.output_path, csvannotator.load_corrections(self.corrections_path)))
+        self.assertEqual(ast.literal_eval(rows[1][0]), ['Water'])
+        self.assertEqual(ast.literal_eval(rows[2][0]), ['Garbage'])
+
+
+class PreprocessingTestCase(SimpleTestCase):
+    """
+            Test case for the batched encoding of the ICMC complaints
+    """
+    def setUp(self):
+        self.word_index_map = {word: index for index, word in enumerate(['road', 'garbage', 'water', 'pipe', 'leak', '!', 'ward'])}
+        self.complaints = make_complaints(self.word_index_map, 200) + [
+            '', '   ', 'unknown words only', ' '.join(['road'] * 50), 'water-pipe leak!!', ' garbage  ward ']
+
+    def test_matches_per_row_loop(self):
+        for flag in (0, 1):
+            expected = legacy_process_query(self.complaints, flag, self.word_index_map)
+            encoded = preprocessing.encode_queries(
+                self.complaints, flag, self.word_index_map, MAX_PADDED_SENTENCE_LENGTH, LAST_INDEX)
+            self.assertEqual(encoded.shape, (len(self.complaints), MAX_PADDED_SENTENCE_LENGTH))
+            self.assertTrue(np.array_equal(encoded, expected))
+
+
+class ModelArtifactsTestCase(SimpleTestCase):
+    """
+            Test case for the compiled ICMC word index map and embedding
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.word_index_map = {'road': 0, 'garbage': 1, 'water': 2}
+        self.word_vectors = [[3.0, 4.0], [0.0, 2.0], [1.0, 0.0], [0.0, 0.0]]
+        # the text protocol with dos line endings, as the original pickles were saved
+        for name, content in ((artifacts.WORD_INDEX_MAP_PICKLE_NAME, self.word_index_map),
+                              (artifacts.WORD_VECTORS_PICKLE_NAME, self.word_vectors)):
+            with open(os.path.join(self.directory, name), 'wb') as outfile:
+                outfile.write(pickle.dumps(content, protocol=0).replace(b'\n', b'\r\n'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compile_load_round_trip(self):
+        artifacts.compile_artifacts(self.directory)
+        word_index_map, word_vectors = artifacts.load_artifacts(self.directory)
+        self.assertEqual(word_index_map, self.word_index_map)
+        self.assertEqual(word_vectors.dtype, np.float32)
+        self.assertTrue(np.allclose(word_vectors, [[0.6, 0.8], [0.0, 1.0], [1.0, 0.0], [0.0, 0.0]]))
+        self.assertFalse(word_vectors.flags.writeable)
+
+    def test_load_compiles_missing_or_changed_files(self):
+        word_index_map, _ = artifacts.load_artifacts(self.directory)
+        self.assertEqual(word_index_map, self.word_index_map)
+        _, vocab_file, _ = artifacts.compile_artifacts(self.directory)
+        with open(vocab_file, 'a', encoding='utf-8') as vocab:
+            vocab.write('ward\t3\n')
+        word_index_map, _ = artifacts.load_artifacts(self.directory)
+        self.assertEqual(word_index_map, self.word_index_map)
+
+    def test_load_without_pickles(self):
+        os.remove(os.path.join(self.directory, artifacts.WORD_VECTORS_PICKLE_NAME))
+        self.assertRaises(ImproperlyConfigured, artifacts.load_artifacts, self.directory)
+
+    def test_reduced_precision_skips_float32_embedding(self):
+        word_index_map, word_vectors = artifacts.load_artifacts(self.directory, embedding=False)
+        self.assertEqual(word_index_map, self.word_index_map)
+        self.assertIsNone(word_vectors)
+
+        # the quantized copies are only written by compile_model_artifacts
+        self.assertRaises(ImproperlyConfigured, artifacts.load_quantized_embedding, 'int8', self.directory)
+        path = os.path.join(self.directory, artifacts.QUANTIZED_EMBEDDING_NAME + '.int8')
+        QuantizedMatrix.from_array(self.word_vectors, 'int8').save(path)
+        embedding = artifacts.load_quantized_embedding('int8', self.directory)
+        self.assertEqual(embedding.precision, 'int8')
+        self.assertTrue(np.allclose(embedding.take([0]), [[3.0, 4.0]], atol=0.02))
+
+class QuantizationTestCase(SimpleTestCase):
+    """
+            Test case for the reduced precision storage of the word embeddings
+    """
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.vectors = random.standard_normal((500, 50)).astype(np.float32)
+        self.vectors[3] = 0
+        self.queries = random.standard_normal((40, 50)).astype(np.float32)
+
+    def test_round_trip_error_bounds(self):
+        rows = np.arange(len(self.vectors))
+        half = QuantizedMatrix.from_array(self.vectors, 'float16')
+        self.assertEqual(half.nbytes, self.vectors.nbytes // 2)
+        # float16 keeps 11 significant bits, its subnormals a 2 ** -24 spacing
+        self.assertTrue(np.all(np.abs(half.take(rows) - self.vectors) <= np.abs(self.vectors) * 2.0 ** -11 + 2.0 ** -25))
+        codes = QuantizedMatrix.from_array(self.vectors, 'int8')
+        # the codes are rounded to the nearest multiple of the row scale
+        bound = codes.scales[:, np.newaxis] / 2 + 1e-6
+        self.assertTrue(np.all(np.abs(codes.take(rows) - self.vectors) <= bound))
+        self.assertFalse(codes.take([3]).any())
+        self.assertRaises(ValueError, QuantizedMatrix.from_array, self.vectors, 'int4')
+
+    def test_argmax_agrees_with_float32(self):
+        expected = np.dot(self.queries, self.vectors.T).argmax(axis=1)
+        for precision in ('float16', 'int8'):
+            matrix = QuantizedMatrix.from_array(self.vectors, precision)
+            scores = np.dot(self.queries, matrix.take(np.arange(len(self.vectors))).T)
+            self.assertGreaterEqual(np.mean(scores.argmax(axis=1) == expected), 0.95)
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'MAX.int8')
+            QuantizedMatrix.from_array(self.vectors, 'int8').save(path)
+            matrix = QuantizedMatrix.load(path)
+            self.assertEqual(matrix.precision, 'int8')
+            self.assertTrue(np.array_equal(
+                matrix.take([1, 2]), QuantizedMatrix.from_array(self.vectors, 'int8').take([1, 2])))
+        finally:
+            shutil.rmtree(directory)
+
+
+class TopCategoriesTestCase(SimpleTestCase):
+    """
+            Test case for the compact top 3 categories of the classification models
+    """
+    def setUp(self):
+        self.names = {0: 'Garbage', 1: 'Water', 2: 'Roads', 3: 'Lights'}
+        self.probs = np.array([
+            [0.125, 0.5, 0.25, 0.0625],
+            [0.75, 0.03125, 0.0625, 0.125]], dtype=np.float32)
+
+    def test_rows_are_sorted_percentages(self):
+        top = TopCategories.from_probabilities(self.probs, self.names)
+        self.assertEqual(top.ids.dtype, np.int16)
+        self.assertEqual(top.percentages.dtype, np.uint8)
+        self.assertEqual(list(top.row(0).items()), [('Water', 50), ('Roads', 25), ('Garbage', 12)])
+        self.assertEqual(top.top_names(), ['Water', 'Garbage'])
+        self.assertEqual(top.highest_percentages().tolist(), [50, 75])
+
+    def test_concatenate_batches(self):
+        top = TopCategories.concatenate([
+            TopCategories.from_probabilities(self.probs[:1], self.names),
+            TopCategories.from_probabilities(self.probs[1:], self.names)], self.names)
+        self.assertEqual(list(top), list(TopCategories.from_probabilities(self.probs, self.names)))
@@ -39,6 +39,18 @@ urlpatterns = [
     path('predict_result/<int:pk>', views.predict_result, name='predict_result'),
     # ex: /venter/predict_csv/5/
     path('predict_csv/<int:pk>', views.predict_csv, name='predict_csv'),
+    # ex: /venter/prediction_status/5/
+    path('prediction_status/<int:pk>', views.prediction_status, name='prediction_status'),
+    # ex: /venter/retry_prediction/5/
+    path('retry_prediction/<int:pk>', views.retry_prediction, name='retry_prediction'),
+    # ex: /venter/domain_statistics/5/?domain_name=water
+    path('domain_statistics/<int:pk>', views.domain_statistics, name='domain_statistics'),
+    # ex: /venter/category_responses/5/?domain_name=water&category=Novel&cursor=1
+    path('category_responses/<int:pk>', views.category_responses, name='category_responses'),
+    # ex: /venter/download_xlsx/5/
+    path('download_xlsx/<int:pk>', views.download_xlsx, name='download_xlsx'),
+    # ex: /venter/download_csv/5/
+    path('download_csv/<int:pk>', views.download_csv, name='download_csv'),
     # ex: /venter/download_table/5/
     path('download_table/<int:pk>', views.download_table, name='download_table'),
     # ex: /venter/wordcloud/5/
@@ -1,11 +1,7 @@
 import datetime
 import json
-import os
 import re
-from ast import literal_eval
-from collections import defaultdict
 
-import jsonpickle
 import pandas as pd
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -14,7 +10,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.core.mail import mail_admins
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
@@ -24,16 +21,15 @@ from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.views.generic.list import ListView
 from nltk import tokenize
 
-from Backend.settings import ADMINS, MEDIA_ROOT, STATIC_ROOT, BASE_DIR
+from Backend.settings import ADMINS
 from Venter.forms import (ContactForm, CSVForm, DomainForm, SentenceModelForm,
                           KeywordForm, ProfileForm, ProposalForm, UserForm, KeywordModelForm)
-from Venter.models import Category, Domain, File, Keyword, Profile, Proposal
-# from Venter import tasks
-from Venter.wordcloud import generate_keywords, generate_wordcloud
-
-from .ML_model.ICMC.model.ClassificationService import ClassificationService
-from .ML_model.keyword_model.modeldriver import KeywordSimilarityMapping
-from .ML_model.sentence_model.modeldriver import SimilarityMapping
+from Venter.helpers import get_result_file_path
+from Venter.models import Category, Domain, File, Keyword, PredictionJob, Profile, Proposal
+from Venter.resultexport import get_xlsx_path
+from Venter.resultstore import get_result_store
+from Venter import csvannotator, tasks
+from Venter.wordcloud import category_sentences, generate_keywords, mapNounFrequency
 
 
 @login_required
@@ -496,232 +492,42 @@ class FileListView(LoginRequiredMixin, ListView):
 def predict_result(request, pk):
     """
     View logic for running CIVIS Prediction Model on files uploaded by CIVIS users.
-    If the input file is being predicted for the first time:
-        1) Two output files (.json and .xlsx files are created in file storage)
-        2) Input file path is feed into the SimilarityMapping method of ML model
-        3) dict_data stores the result json response returned from the ML model
-        4) prediction_results.html template is rendered
+    If the input file has no prediction yet:
+        1) A PredictionJob is queued on the Celery worker (or the running one is reused),
+           which creates the two output files (.json and .xlsx files in file storage)
+        2) prediction_pending.html template is rendered, polling prediction_status until the job is done
     If the input file has already been predicted once:
-        1) dict_data stores the result json data from the results.json file already created from the ML model
-        2) prediction_results.html template is rendered
+        1) the index of the segmented results (results.jsonl) lists the domains, the chart statistics
+           of each being fetched from domain_statistics
+        2) prediction_results.html template is rendered, AJAX card view requests rendering the first
+           page of every category of a single domain, the next ones being fetched from category_responses
     """
 
     filemeta = File.objects.get(pk=pk)
     if not filemeta.has_prediction:
-        output_directory_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output')
-        if not os.path.exists(output_directory_path):
-            os.makedirs(output_directory_path)
+        job = tasks.enqueue_prediction(filemeta)
+        return render(request, './Venter/prediction_pending.html', {'filemeta': filemeta, 'job': job})
 
-        temp1 = filemeta.filename
-        temp2 = os.path.splitext(temp1)
-        custom_input_file_name = temp2[0]
-        
-        output_json_file_name = 'results__'+custom_input_file_name+'.json'
-        output_xlsx_file_name = 'results__'+custom_input_file_name+'.xlsx'
- 
-        output_file_path_json = os.path.join(output_directory_path, output_json_file_name)
-        output_file_path_xlsx = os.path.join(output_directory_path, output_xlsx_file_name)
-
-        dict_data = {}
-        domain_list = []
-
-        # prediction_result = tasks.predict_runner.delay(filemeta.input_file.path)
-        # dict_data = prediction_result.get()
-
-        model_choice = filemeta.model_choice
-        if model_choice == 'sentence_model':
-            sm = SimilarityMapping(filemeta.input_file.path)
-        elif model_choice == 'keyword_model':
-            if filemeta.domain_present:
-                domain_present = True
-            else:
-                domain_present = False
-
-            proposal = filemeta.proposal
-            domain_queryset = Domain.objects.filter(proposal_name = proposal).values_list('domain_name', flat=True)
-            domain_set = set(domain_queryset)
-            domain_list = list(domain_set)
-
-            domain_queryset_2 = Domain.objects.filter(proposal_name = proposal)
-            keyword_global_list = []
-            for domain_obj in domain_queryset_2:
-                keyword_queryset = Keyword.objects.filter(domain_name = domain_obj).values_list('keyword', flat=True)
-                keyword_set = set(keyword_queryset)
-                keyword_list = list(keyword_set)
-                keyword_global_list.append(keyword_list)
-
-            domain_keyword_dict = {}
-            domain_keyword_dict = dict(zip(domain_list, keyword_global_list))
-
-            # domain_keyword_dict = {
-            # 'hw': ['bedbugs', 'cctv', 'pipeline', 'Open spaces', 'gutter', 'garbage',
-            #             'rats', 'mice', 'robbery', 'theft', 'passage', 'galli', 'lane',
-            #             'light', 'bathrooms not clean', 'toilets not clean', 'playarea', 'mosquito', 'fogging','water'],
-            # }
-
-            sm = KeywordSimilarityMapping(filemeta.input_file.path, domain_present, domain_keyword_dict)
-    
-        dict_data = sm.driver()
-
-        if model_choice == 'sentence_model':
-            dirPath = os.path.join(BASE_DIR, "Venter/ML_model/sentence_model/data/comments")
-        elif model_choice == 'keyword_model':
-            dirPath = os.path.join(BASE_DIR, "Venter/ML_model/keyword_model/data/keyword data")
-        fileList = os.listdir(dirPath)
-        for fileName in fileList:
-            os.remove(dirPath+"/"+fileName)
-
-        if dict_data:
-            filemeta.has_prediction = True
-
-        with open(output_file_path_json, 'w') as temp:
-            json.dump(dict_data, temp)
-
-        print('JSON output saved.')
-        print('Done.')
-
-        filemeta.output_file_json = output_file_path_json
-
-        download_output = pd.ExcelWriter(output_file_path_xlsx, engine='xlsxwriter')
-
-        for domain, cat_dict in dict_data.items():
-            domain_columns = list(cat_dict.keys())
-            subdomain_columns = ['response', 'score']
-            temp_column_index = 0
-            codes = []
-            subcodes = []
-
-            for dc in domain_columns:
-                codes.append(temp_column_index)
-                codes.append(temp_column_index)
-                subcodes.append(0)
-                subcodes.append(1)
-                temp_column_index += 1
-            multiIndex = pd.MultiIndex(levels = [domain_columns, subdomain_columns], labels = [codes, subcodes])
-
-            df = pd.DataFrame(columns=multiIndex)
-
-            temp_responses = []
-            temp_scores = []
-
-            for cat_as_key, res_dict_list in cat_dict.items():
-                temp_df_res = []
-                temp_df_score = []
-
-                if cat_as_key!='Novel':
-                    for res_dict in res_dict_list:
-                        temp_df_res.append(res_dict['response'])
-                        temp_df_score.append(res_dict['score'])
-                else:
-                    for res_list in res_dict_list.values():
-                        temp_df_res.extend(res_list)
-                    for response in temp_df_res:
-                        temp_df_score.append(-1)
-
-                temp_responses.append(temp_df_res)
-                temp_scores.append(temp_df_score)
-
-            del temp_df_res, temp_df_score
-
-            len_holder = sorted(temp_responses, key=len, reverse=True)
-            len_holder = len(len_holder[0])
-            weighted_temp_responses = []
-            weighted_temp_scores = []
-
-            for temp_df_res, temp_df_score in zip(temp_responses, temp_scores):
-                for x in range(len_holder - len(temp_df_score)):
-                    temp_df_res.append('')
-                    temp_df_score.append('')
-                weighted_temp_responses.append(temp_df_res)
-                weighted_temp_scores.append(temp_df_score)
-
-            del temp_responses, temp_scores, temp_df_res, temp_df_score
-            for cat_as_key, temp_df_res, temp_df_score in zip(cat_dict.keys(), weighted_temp_responses, weighted_temp_scores):
-                    df[cat_as_key, 'response'] = temp_df_res
-                    df[cat_as_key, 'score'] = temp_df_score
-            if model_choice == "keyword_model":
-                for cat_as_key in cat_dict.keys():
-                    df.drop([(cat_as_key, 'score')], axis=1, inplace=True)
-            df.to_excel(download_output, sheet_name=domain)
-        download_output.save()
-
-        filemeta.output_file_xlsx = output_file_path_xlsx
-        filemeta.save()
-    else:
-        temp1 = filemeta.filename
-        temp2 = os.path.splitext(temp1)
-        custom_input_file_name = temp2[0]
-        
-        output_json_file_name = 'results__'+custom_input_file_name+'.json'
-        results = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')
-
-        with open(results, 'r') as content:
-            dict_data = json.load(content)
-
-    dict_keys = dict_data.keys()
-    domain_list = list(dict_keys)
-    domain_data = {}
-
-    for domain_name in domain_list:
-        domain_data = dict_data[domain_name]
-        temp = ['Category']
-        model_choice = filemeta.model_choice
-        if model_choice == 'sentence_model':
-            if 'Novel' in domain_data.keys():
-                index = 0
-                for subCat in domain_data['Novel']:
-                    temp.append('Sub category ' + str(index+1))
-                    index += 1
-        elif model_choice == 'keyword_model':
-            temp.append('No. of Responses')            
-        temp.append({'role': 'style'})
-        domain_stats = []
-        domain_stats.append(temp)
-
-        for category, responselist in domain_data.items():
-            category = category.split('\n')[0]
-            if model_choice == 'sentence_model':
-                column = [category, len(responselist), '']
-                if category == 'Novel':
-                        column = ['Novel']
-                        for subCat in domain_data[category]:
-                            column.append(len(domain_data[category][subCat]))
-                        column.append('')
-                else:
-                    for i in range(len(domain_stats[0]) - len(column)):
-                        column.insert(2, 0)
-                domain_stats.append(column)
-            elif model_choice == 'keyword_model':
-                if(len(responselist)!=0):
-                    column = [category, len(responselist), '']
-                    if category == 'Novel':
-                        column = ['Novel']
-                        for subCat in domain_data[category]:
-                            column.append(len(domain_data[category][subCat]))
-                        column.append('')
-                    else:
-                        for i in range(len(domain_stats[0]) - len(column)):
-                            column.insert(2, 0)
-                    domain_stats.append(column)
-
-        dict_data[domain_name]['Statistics'] = jsonpickle.encode(domain_stats)
+    # only the index of the segmented results is read, plus the first pages shown in the card view
+    store = get_result_store(filemeta)
+    domain_list = store.domains
 
     if request.is_ajax():
         domain = request.GET.get('domain_name')
-        cardview_data = dict_data[domain]
-            
+        cards = store.first_pages(domain)
+
         if 'category' in request.GET:
             category = request.GET.get('category')
-            print(type(category))
         else:
-            for key in cardview_data.items():
-                category = key
-                break
-                
-        return render(request, './Venter/domain_data.html', {'cardview_data':cardview_data, 'category': category, 'filemeta': filemeta})
+            category = cards[0][0] if cards else ''
 
+        return render(request, './Venter/domain_data.html', {
+            'cards': cards, 'domain_name': domain, 'category': category, 'filemeta': filemeta
+        })
+
+    # the category chart of every domain is drawn from domain_statistics
     return render(request, './Venter/prediction_result.html', {
-        'domain_list': domain_list, 'dict_data': json.dumps(dict_data), 'filemeta': filemeta
+        'domain_list': domain_list, 'filemeta': filemeta
     })
 
 @login_required
@@ -729,131 +535,32 @@ def predict_result(request, pk):
 def predict_csv(request, pk):
     """
     View logic for running ICMC Prediction Model on files uploaded by ICMC users.
-    If the input file is being predicted for the first time:
-        1) Two output files (.json and .csv files are created in file storage)
-        2) Input file path is feed into the get_top_3_cats_with_prob method of ML model
-        3) dict_data stores the result json response returned from the ML model
-        4) prediction_table.html template is rendered
+    If the input file has no prediction yet:
+        1) A PredictionJob is queued on the Celery worker (or the running one is reused),
+           which creates the two output files (.json and .csv files in file storage)
+        2) prediction_pending.html template is rendered, polling prediction_status until the job is done
     If the input file has already been predicted once:
-        1) dict_data stores the result json data from the results.json file already created from the ML model
+        1) dict_data stores the result json data from the results.json file already created from the ML model,
+           the categories corrected by the user being read from the corrections sidecar, see csvannotator
         2) prediction_table.html template is rendered
     """
     filemeta = File.objects.get(pk=pk)
 
     if not filemeta.has_prediction:
-        output_directory_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output')
-        if not os.path.exists(output_directory_path):
-            os.makedirs(output_directory_path)
-
-        temp1 = filemeta.filename
-        temp2 = os.path.splitext(temp1)
-        custom_input_file_name = temp2[0]
-        
-        output_json_file_name = 'results__'+custom_input_file_name+'.json'
-        output_csv_file_name = 'results__'+custom_input_file_name+'.csv'
-
-        output_file_path_json = os.path.join(output_directory_path, output_json_file_name)
-        output_file_path_csv = os.path.join(output_directory_path, output_csv_file_name)
-        
-        input_file_path = filemeta.input_file.path
-        csvfile = pd.read_csv(input_file_path, sep=',', header=0, encoding='utf-8-sig')
-        csvfile.columns = [col.strip() for col in csvfile.columns]
-
-        complaint_description = list(csvfile['complaint_description'])
-        ward_name = list(csvfile['ward_name'])
-        ward_list = list(set(ward_name))
-
-        date_created = []
-
-        for x in list(csvfile['complaint_created']):
-            y = x.split(' ')[0]
-            date_created.append(y)
-        date_list = list(set(date_created))
-
-        dict_list = []
-        unsorted_dict_list = []
-
-        if str(request.user.profile.organisation_name) == 'ICMC':
-            model = ClassificationService()
-        elif str(request.user.profile.organisation_name) == "SpeakUp":
-            pass
-
-        cats = model.get_top_3_cats_with_prob(complaint_description)
-
-        for row, complaint, scores, ward, date in zip(csvfile.iterrows(), complaint_description, cats, ward_name, date_created):
-            row_dict = {}
-            index, data = row
-            row_dict['index'] = index
-
-            if str(request.user.profile.organisation_name) == "ICMC":
-                row_dict['problem_description'] = complaint
-                row_dict['category'] = scores
-                row_dict['highest_confidence'] = list(row_dict['category'].values())[0]
-                row_dict['ward_name'] = ward
-                row_dict['date_created'] = date
-            else:
-                continue
-                # data = data.dropna(subset=["text"])
-                # complaint_description = data['text']
-                # cats = model.get_top_3_cats_with_prob(complaint_description)
-            dict_list.append(row_dict)
-        unsorted_dict_list = dict_list
-        dict_list = sorted(dict_list, key=lambda k: k['highest_confidence'], reverse=True)
-
-        if dict_list:
-            filemeta.has_prediction = True
-
-        with open(output_file_path_json, 'w') as temp:
-            json.dump(unsorted_dict_list, temp)
-        print('JSON output saved.')
-        print('Done.')
-
-        with open(input_file_path, 'r', encoding="utf-8-sig") as f1:
-            with open(output_file_path_csv, 'w', encoding="utf-8-sig") as f2:
-                for line in f1:
-                    f2.write(line)
-
-        output_csv_file = pd.read_csv(output_file_path_csv, sep=',', header=0)
-        original_category_list = []
-        temp_cat_list = []
-        for item in unsorted_dict_list:
-            temp_cat_list = list(item['category'].keys())
-            del temp_cat_list[1:]
-            original_category_list.append(temp_cat_list)
-
-        output_csv_file.insert(0, "Predicted_Category", original_category_list)
-        output_csv_file.to_csv(output_file_path_csv, index=False)
-
-        filemeta.output_file_json = output_file_path_json
-        filemeta.output_file_xlsx = output_file_path_csv
-        filemeta.save()
-    else:
-        # dict_list = json.load(filemeta.output_file_json)
-        temp1 = filemeta.filename
-        temp2 = os.path.splitext(temp1)
-        custom_input_file_name = temp2[0]
-        
-        output_json_file_name = 'results__'+custom_input_file_name+'.json'
-        results =  os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')
-
-        with open(results,'r') as content:
-            dict_list=json.load(content)
+        job = tasks.enqueue_prediction(filemeta)
+        return render(request, './Venter/prediction_pending.html', {'filemeta': filemeta, 'job': job})
 
-        if filemeta.file_saved_status:
-            temp_list = []
-            custom_category_list = []
-            output_file_path_xlsx = filemeta.output_file_xlsx.path
-            output_xlsx_csv_file = pd.read_csv(output_file_path_xlsx, sep=',', header=0, encoding='utf-8-sig')
-            temp_list = output_xlsx_csv_file['Predicted_Category']
+    with open(get_result_file_path(filemeta, 'json'),'r') as content:
+        dict_list=json.load(content)
 
-            for item in temp_list:
-                item = literal_eval(item)
-                custom_category_list.append(item)
+    if filemeta.file_saved_status:
+        corrections = csvannotator.load_corrections(get_result_file_path(filemeta, csvannotator.CORRECTIONS_EXTENSION))
+        for item in dict_list:
+            if item['index'] in corrections:
+                item['category'] = corrections[item['index']]
+                item['corrected'] = True
 
-            for item, cat in zip(dict_list, custom_category_list):
-                item['category'] = cat
-                
-        dict_list = sorted(dict_list, key=lambda k: k['highest_confidence'], reverse=True)
+    dict_list = sorted(dict_list, key=lambda k: k['highest_confidence'], reverse=True)
 
     # preparing ward list and date list for multi-filter widget
     input_file_path = filemeta.input_file.path
@@ -878,50 +585,145 @@ def predict_csv(request, pk):
         category_list = list(category_queryset)
     return render(request, './Venter/prediction_table.html', {'dict_list': dict_list, 'category_list': category_list, 'filemeta': filemeta, 'ward_list': ward_list, 'date_list': date_list})
 
+@login_required
+@require_http_methods(["GET"])
+def prediction_status(request, pk):
+    """
+    View logic returning the state of the latest PredictionJob of a file as JSON.
+    Polled by prediction_pending.html template until the state is 'done' or 'failed'.
+    """
+    filemeta = get_object_or_404(File, pk=pk)
+    job = filemeta.prediction_jobs.first()
+    if job is None:
+        return JsonResponse({'state': None, 'has_prediction': filemeta.has_prediction})
+    return JsonResponse({
+        'state': job.state,
+        'progress': job.progress,
+        'has_prediction': filemeta.has_prediction,
+        'model_secs': job.model_secs,
+        'materialize_secs': job.materialize_secs,
+        'failed': job.state == PredictionJob.FAILED,
+    })
+
+@login_required
+@require_http_methods(["POST"])
+def retry_prediction(request, pk):
+    """
+    View logic queuing the prediction of a file again once its last PredictionJob failed,
+    on the user's request from prediction_pending.html template. Failed jobs are never retried otherwise.
+    """
+    filemeta = get_object_or_404(File, pk=pk)
+    tasks.enqueue_prediction(filemeta, retry=True)
+    view_name = 'predict_result' if str(filemeta.uploaded_by.organisation_name) == 'CIVIS' else 'predict_csv'
+    return HttpResponseRedirect(reverse(view_name, kwargs={"pk": filemeta.pk}))
+
+@login_required
+@require_http_methods(["GET"])
+def domain_statistics(request, pk):
+    """
+    View logic returning the category chart statistics of one domain of a CIVIS prediction as JSON.
+    Fetched per domain by prediction_result.html and chart_editor.html templates,
+    the statistics being read from the index of the segmented results.
+    """
+    filemeta = get_object_or_404(File, pk=pk)
+    if not filemeta.has_prediction:
+        raise Http404('File has no prediction')
+    store = get_result_store(filemeta)
+    domain_name = request.GET.get('domain_name')
+    if domain_name not in store.domains:
+        raise Http404('Unknown domain')
+    return JsonResponse({
+        'domain_name': domain_name,
+        'statistics': store.statistics(domain_name, filemeta.model_choice),
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def category_responses(request, pk):
+    """
+    View logic returning one page of the responses of a category of a CIVIS prediction as JSON,
+    in the score order of the model. Fetched by domain_data.html template as the card view is scrolled:
+        1) cursor is the page number returned as next_cursor by the previous page (0 for the first one)
+        2) the page is read from its offset in the segmented results, next_cursor being null on the last page
+    """
+    filemeta = get_object_or_404(File, pk=pk)
+    if not filemeta.has_prediction:
+        raise Http404('File has no prediction')
+    store = get_result_store(filemeta)
+    domain_name = request.GET.get('domain_name')
+    category = request.GET.get('category')
+    if domain_name not in store.domains or category not in store.categories(domain_name):
+        raise Http404('Unknown category')
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        responses, next_cursor = store.load_page(domain_name, category, cursor)
+    except (ValueError, IndexError):
+        raise Http404('Invalid cursor')
+    return JsonResponse({
+        'domain_name': domain_name,
+        'category': category,
+        'responses': responses,
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def download_xlsx(request, pk):
+    """
+    View logic to download the .xlsx output of files uploaded by CIVIS users (from dashboard.html)
+        1) the .xlsx output is written from the segmented results on its first download, see resultexport
+        2) it is then streamed to the user in chunks by a FileResponse (a StreamingHttpResponse)
+    """
+    filemeta = get_object_or_404(File, pk=pk)
+    if not filemeta.has_prediction or str(filemeta.uploaded_by.organisation_name) != 'CIVIS':
+        raise Http404('File has no xlsx output')
+    return FileResponse(open(get_xlsx_path(filemeta), 'rb'), as_attachment=True, filename='results.xlsx')
+
 @login_required
 @require_http_methods(["POST"])
 def download_table(request, pk):
     """
-    View logic to prepare a .csv output file for files uploaded by ICMC users
-        1) category_rec stores a two-dimensional list for all the custom categories selected by the user
-        2) If 'Predicted_Category' column exists in results.csv file, it is dropped
-        3) New category list is populated in the results.csv file and results.csv file is saved in the database
-        4) Predicted_table template is rendered and user downloads the results.csv file(from dashboard.html)
+    View logic to save the categories selected by ICMC users on prediction_table.html
+        1) corrected_category maps the index of every changed row to its categories, the predicted
+           percentages being stripped from the categories kept from the prediction
+        2) the changed rows are merged into the corrections sidecar of the results.csv file, see csvannotator,
+           the results.csv file itself being left untouched
+        3) prediction_table.html template is rendered again, the user downloading the corrected results.csv file
+           from dashboard.html
     """
     filemeta = File.objects.get(pk=pk)
-    sorted_category_list = json.loads(request.POST['sorted_category'])
+    corrected_category = json.loads(request.POST['corrected_category'])
 
     status = request.POST['file_saved_status']
-    new_sorted_category_list = []
-
-    for temp1 in sorted_category_list:
-        # temp1 = [re.split(r"([\(])", x)[0] for x in sublist]
-        temp2 = [x.lstrip() for x in temp1]
-        temp3 = [x.rstrip() for x in temp2]
-        new_sorted_category_list.append(temp3)
-
-    temp1 = filemeta.filename
-    temp2 = os.path.splitext(temp1)
-    custom_input_file_name = temp2[0]
-    
-    output_json_file_name = 'results__'+custom_input_file_name+'.csv'
-    output_csv_file_path =  os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')   
+    changed = {}
 
-    # output_csv_file_path = filemeta.output_file_xlsx.path
-    csv_file = pd.read_csv(output_csv_file_path, sep=',', header=0, encoding='utf-8-sig')
+    for index, categories in corrected_category.items():
+        changed[int(index)] = [re.sub(r'\s*\(\d+\)%$', '', x.strip()) for x in categories]
 
     if status == "True":
         filemeta.file_saved_status = True
-        if 'Predicted_Category' in csv_file.columns:
-            csv_file = csv_file.drop("Predicted_Category", axis=1)
-        csv_file.insert(0, "Predicted_Category", new_sorted_category_list)
+        csvannotator.save_corrections(get_result_file_path(filemeta, csvannotator.CORRECTIONS_EXTENSION), changed)
 
-    csv_file.to_csv(output_csv_file_path, index=False, encoding='utf-8-sig')
-
-    filemeta.output_file_xlsx = output_csv_file_path
     filemeta.save()
     return HttpResponseRedirect(reverse('predict_csv', kwargs={"pk": filemeta.pk}))
 
+@login_required
+@require_http_methods(["GET"])
+def download_csv(request, pk):
+    """
+    View logic to download the results.csv file of files uploaded by ICMC users (from dashboard.html)
+        1) the results.csv file is read row by row, the categories corrected by the user replacing the predicted ones
+        2) the rows are streamed to the user as they are read by a StreamingHttpResponse
+    """
+    filemeta = get_object_or_404(File, pk=pk)
+    if not filemeta.has_prediction or str(filemeta.uploaded_by.organisation_name) == 'CIVIS':
+        raise Http404('File has no csv output')
+    corrections = csvannotator.load_corrections(get_result_file_path(filemeta, csvannotator.CORRECTIONS_EXTENSION))
+    rows = csvannotator.corrected_rows(filemeta.output_file_xlsx.path, corrections)
+    response = StreamingHttpResponse(csvannotator.iter_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="results.csv"'
+    return response
+
 
 @login_required
 @require_http_methods(["GET", "POST"])
@@ -936,21 +738,7 @@ def wordcloud(request, pk):
     if request.method == 'POST':
         if str(request.user.profile.organisation_name) == 'CIVIS':
             domain_name = request.POST['wordcloud_domain_name']
-
-            temp1 = filemeta.filename
-            temp2 = os.path.splitext(temp1)
-            custom_input_file_name = temp2[0]
-            
-            output_json_file_name = 'results__'+custom_input_file_name+'.json'
-            results = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')
-
-            with open(results, 'r') as content:
-                dict_data =json.load(content)
-
-            domain_data = dict_data[domain_name]
-            for category, category_dict in domain_data.items():
-                wordcloud_category_list.append(category)
-            wordcloud_category_list = wordcloud_category_list[:-1]
+            wordcloud_category_list = get_result_store(filemeta).categories(domain_name)[:-1]
         return render(request, './Venter/wordcloud.html', {'category_list': wordcloud_category_list, 'filemeta': filemeta, 'domain_name': domain_name})
     else:
         if str(request.user.profile.organisation_name) == 'ICMC':
@@ -963,94 +751,46 @@ def wordcloud(request, pk):
 def wordcloud_contents(request, pk):
     """
         View logic to display wordcloud for a set of responses belonging to a particular category
-        1) For the category selected, the input json file is feed into the wordcloud algorithm
+        1) For the category selected, the noun frequencies saved with the CIVIS prediction are read,
+           those of ICMC being computed from the (corrected) categories of the .json output
         2) The output dict 'words' is passed as a context variable to the wordcloud template
     """
     filemeta = File.objects.get(pk=pk)
-    wordcloud_directory_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/wordcloud')
-    if not os.path.exists(wordcloud_directory_path):
-        os.makedirs(wordcloud_directory_path)
-
-    temp1 = filemeta.filename
-    temp2 = os.path.splitext(temp1)
-    custom_input_file_name = temp2[0]
-    
-    wordcloud_data_file_name = 'wordcloud__'+custom_input_file_name+'.json'
-    
+
     if str(request.user.profile.organisation_name) == 'ICMC':
-        wordcloud_category_list = []
+        category_name = request.POST['category_name']
 
-        temp1 = filemeta.filename
-        temp2 = os.path.splitext(temp1)
-        custom_input_file_name = temp2[0]
-        
-        output_json_file_name = 'results__'+custom_input_file_name+'.csv'
-        output_file_path =  os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')   
-
-        # output_csv_file_path = filemeta.output_file_xlsx.path
-
-        output_file = pd.read_csv(output_file_path, sep=',', header=0)
-        temp_dict = defaultdict(list)
-        for predicted_category_str, complaint_description in zip(output_file['Predicted_Category'], output_file['complaint_description']):
-            predicted_category_list = literal_eval(predicted_category_str)
-            if predicted_category_list:
-                final_cat = predicted_category_list[0]
-                final_cat = re.split(r"\(", final_cat)[0]
-                final_cat = final_cat.strip(' ')
-
-                if final_cat not in temp_dict:
-                    response_list = []
-                    response_list.append(complaint_description)
-                    temp_dict[final_cat] = response_list
-                else:
-                    response_list = []
-                    response_list.append(complaint_description)
-                    temp_dict[final_cat].append(complaint_description)
-            else:
-                pass
-        wordcloud_input_dict = dict(temp_dict)
+        with open(get_result_file_path(filemeta, 'json'), 'r') as content:
+            dict_list = json.load(content)
 
-        keys = ["garbage", "recreation park", "dumpster on road", "traffic near K.G road", "plant trees on pavement", "road conditions", "water pond"]
-        values = [10, 90, 30, 20, 54, 45, 100]
-        words = {}
-        words = dict(zip(keys, values))
+        # the categories corrected by the user are kept aside, see csvannotator. As they change
+        # after the prediction, the noun frequencies are computed from the .json output on request
+        corrections = csvannotator.load_corrections(get_result_file_path(filemeta, csvannotator.CORRECTIONS_EXTENSION))
+        sentences = []
+        for item in dict_list:
+            categories = corrections.get(item['index'], list(item['category']))
+            if categories and categories[0].strip() == category_name.strip():
+                sentences.append(str(item['problem_description']))
+        words = mapNounFrequency(sentences)
 
         category_queryset = Category.objects.filter(organisation_name='ICMC').values_list('category', flat=True)
         wordcloud_category_list = list(category_queryset)
-        return render(request, './Venter/wordcloud.html', {'category_list': wordcloud_category_list, 'filemeta': filemeta, 'words': words})
+        return render(request, './Venter/wordcloud.html', {'category_list': wordcloud_category_list, 'filemeta': filemeta, 'words': words, 'category_name': category_name})
     elif str(request.user.profile.organisation_name) == 'CIVIS':
         category_name = request.POST['category_name']
         domain_name = request.POST['domain_name']
         wordcloud_category_list = json.loads(request.POST['category_list'])
 
-        temp1 = filemeta.filename
-        temp2 = os.path.splitext(temp1)
-        custom_input_file_name = temp2[0]
-        
-        output_json_file_name = 'results__'+custom_input_file_name+'.json'
-        output_file_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')   
-        
-        if bool(filemeta.wordcloud_data) is True:
-            wordcloud_data_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/wordcloud/{wordcloud_data_file_name}')
-            with open(wordcloud_data_path, 'r') as content:
-                output_dict = json.load(content)
-        else:
-            wordcloud_data_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/wordcloud')
-            wordcloud_data_path_json = os.path.join(wordcloud_data_path, wordcloud_data_file_name)
-            output_dict = generate_wordcloud(output_file_path)
-
-            with open(wordcloud_data_path_json, 'w') as temp:
-                json.dump(output_dict, temp)
-
-            filemeta.wordcloud_data = wordcloud_data_path_json
-            filemeta.save()
-
-        domain_items_list = output_dict[domain_name]
+        # the noun frequencies of every category are computed with the prediction, see wordcloud.generate_frequencies
+        store = get_result_store(filemeta)
         words = {}
 
-        for domain_item in domain_items_list:
-            if list(domain_item.keys())[0].split('\n')[0].strip() == category_name.strip():
-                words = list(domain_item.values())[0]
+        for category in store.categories(domain_name):
+            if category != 'Novel' and category.split('\n')[0].strip() == category_name.strip():
+                words = store.frequencies(domain_name, category)
+                if words is None:
+                    # results predicted before the word cloud stage
+                    words = mapNounFrequency(category_sentences(store.load_category(domain_name, category)))
 
         for word, freq in words.items():
             if(word == 'items'):
@@ -1069,70 +809,8 @@ def chart_editor(request, pk):
         View logic to display chart editor for the selected domain
     """
     filemeta = File.objects.get(pk=pk)
-    dict_data = {}
-    domain_list = []
+    store = get_result_store(filemeta)
 
-    temp1 = filemeta.filename
-    temp2 = os.path.splitext(temp1)
-    custom_input_file_name = temp2[0]
-    
-    output_json_file_name = 'results__'+custom_input_file_name+'.json'
-    results = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output/{output_json_file_name}')
-
-    with open(results, 'r') as content:
-        dict_data=json.load(content)
-    # dict_data = json.load(filemeta.output_file_json)
-
-    filemeta = File.objects.get(pk=pk)
-    output_directory_path = os.path.join(MEDIA_ROOT, f'{filemeta.uploaded_by.organisation_name}/{filemeta.uploaded_by.user.username}/{filemeta.uploaded_date.date()}/output')
-
-    if not os.path.exists(output_directory_path):
-        os.makedirs(output_directory_path)
-
-    temp1 = filemeta.filename
-    temp2 = os.path.splitext(temp1)
-    custom_input_file_name = temp2[0]
-    output_json_file_name = 'results__'+custom_input_file_name+'.json'
-    output_xlsx_file_name = 'results__'+custom_input_file_name+'.xlsx'
-
-    output_file_path_json = os.path.join(output_directory_path, output_json_file_name)
-    output_file_path_xlsx = os.path.join(output_directory_path, output_xlsx_file_name)
-
-    filemeta.output_file_json = output_file_path_json
-    filemeta.output_file_xlsx = output_file_path_xlsx
-    filemeta.save()
-
-    dict_keys = dict_data.keys()
-    domain_list = list(dict_keys)
-    domain_data = {}
-
-    for domain_name in domain_list:
-        domain_data = dict_data[domain_name]
-        temp = ['Category']
-        model_choice = filemeta.model_choice
-        if model_choice == 'sentence_model':
-            if 'Novel' in domain_data.keys():
-                index = 0
-                for subCat in domain_data['Novel']:
-                    temp.append('Sub category ' + str(index+1))
-                    index += 1
-        elif model_choice == 'keyword_model':
-            temp.append('No. of Responses')
-        temp.append({'role': 'style'})
-        domain_stats = []
-        domain_stats.append(temp)
-
-        for category, responselist in domain_data.items():
-            column = [category, len(responselist), '']
-            if category == 'Novel':
-                column = ['Novel']
-                for subCat in domain_data[category]:
-                    column.append(len(domain_data[category][subCat]))
-                column.append('')
-            else:
-                for i in range(len(domain_stats[0]) - len(column)):
-                    column.insert(2, 0)
-            domain_stats.append(column)
-        dict_data[domain_name]['Statistics'] = jsonpickle.encode(domain_stats)
-        domain_name = request.POST['input_domain_name']
-    return render(request, './Venter/chart_editor.html', {'filemeta': filemeta, 'domain_list': domain_list, 'dict_data': json.dumps(dict_data), 'domain_name': domain_name})
+    domain_list = store.domains
+    domain_name = request.POST['input_domain_name']
+    return render(request, './Venter/chart_editor.html', {'filemeta': filemeta, 'domain_list': domain_list, 'domain_name': domain_name})
@@ -4,40 +4,55 @@ File created 20:47,
 May 28, 2019
 '''
 
+from functools import lru_cache
+
 import nltk
 import json 
 import inflect
 
+from .ML_model import domainpool, textnormalizer
+
+NOUN_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=1)
+def get_inflect_engine():
+    return inflect.engine()
+
+
+@lru_cache(maxsize=NOUN_CACHE_SIZE)
+def normalize_noun(entity):
+    '''
+    Returns the lowercased plural form of a noun, so that its singular and plural occurences are counted together
+    '''
+    p = get_inflect_engine()
+    if not p.singular_noun(entity):
+        return p.plural(entity).lower()
+    return entity.lower()
+
+
 def mapNounFrequency(sentenceList):
     '''
     This function tags entities for a given list of sentences and returns a
-    frequency map preserving the likeliness of singular and plural occurences
+    frequency map preserving the likeliness of singular and plural occurences.
+    The sentences are tagged in one batch by nltk.pos_tag_sents
     '''
     fMap = {}
 
     if sentenceList == []:
         return fMap
-    
-    p = inflect.engine()
-
-    for sentence in sentenceList:
-        is_noun = lambda pos: pos[:2] == 'NN'
-        tokenized = nltk.word_tokenize(sentence)
-        entities = [word for (word, pos) in nltk.pos_tag(tokenized) if is_noun(pos)]
-        for entity in entities.copy():
-            entities.remove(entity)
-            if not p.singular_noun(entity):
-                entities.append(p.plural(entity).lower())
-            else:
-                entities.append(entity.lower())
-        entities = set(entities)
+
+    is_noun = lambda pos: pos[:2] == 'NN'
+    tagged = nltk.pos_tag_sents([textnormalizer.word_tokens(sentence) for sentence in sentenceList])
+    for tags in tagged:
+        entities = set(normalize_noun(word) for (word, pos) in tags if is_noun(pos))
         for entity in entities:
             if entity in fMap:
                 fMap[entity] += 1
             else:
                 fMap[entity] = 1
 
-    if len(entities)==0:
+    if len(fMap)==0:
         return fMap
     frequency = list(fMap.values())
     normalizer = max(frequency)
@@ -46,6 +61,37 @@ def mapNounFrequency(sentenceList):
     return fMap
 
 
+def category_sentences(responses):
+    '''
+    Returns the text of the scored responses of a category, without their row number
+    '''
+    return [scoredresponse['response'].split('-')[-1].strip() for scoredresponse in responses]
+
+
+def domain_frequencies(domain_data):
+    '''
+    Returns the {category: noun frequency map} of the categorized responses of one domain,
+    the Novel category aside
+    '''
+    words = {}
+    for cats, responses in domain_data.items():
+        if cats == 'Novel' or cats == 'Statistics':
+            continue
+        words[cats] = mapNounFrequency(category_sentences(responses))
+    return words
+
+
+def generate_frequencies(data, workers=None):
+    '''
+    Prediction stage computing the {domain: {category: noun frequency map}} of the CIVIS results,
+    saved with the segmented results and read by the wordcloud view.
+    The domains are processed by workers processes (CATEGORIZATION_WORKERS by default)
+    '''
+    domains = list(data)
+    frequencies = domainpool.map_domains(domain_frequencies, [(data[domain],) for domain in domains], workers)
+    return dict(zip(domains, frequencies))
+
+
 def generate_wordcloud(path):
     '''
     main/ driver function
@@ -60,17 +106,7 @@ def generate_wordcloud(path):
     data = json.loads(data)
 
     for domains in data:
-        words[domains] = []
-        for cats in data[domains]:
-            if cats == 'Novel' or cats == 'Statistics':
-                continue
-            temp = {}
-            temp[cats] = {}
-            words[domains].append(temp)
-            tempargs = []
-            for scoredresponse in data[domains][cats]:
-                tempargs.append(scoredresponse['response'].split('-')[-1].strip())
-            temp[cats] = mapNounFrequency(tempargs)
+        words[domains] = [{cats: frequency} for cats, frequency in domain_frequencies(data[domains]).items()]
     return words
 
 def generate_keywords(sentences):
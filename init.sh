@@ -4,4 +4,16 @@ set -e
 echo "Starting SSH ..."
 service ssh start
 
+# Predictions run on a Celery worker. docker-compose.yml runs the broker and the worker
+# as services of their own (START_PREDICTION_WORKER=false), a single container starts both here.
+if [ "${START_PREDICTION_WORKER:-true}" = "true" ]; then
+    if [ "${REDIS_HOST:-localhost}" = "localhost" ]; then
+        echo "Starting Redis ..."
+        service redis-server start
+    fi
+    echo "Starting Celery worker ..."
+    cd /app && celery -A Backend worker --loglevel=info --detach --logfile=/app/celery.log --pidfile=/tmp/celery.pid
+fi
+
 python /app/manage.py runserver 0.0.0.0:8000
+